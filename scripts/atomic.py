@@ -0,0 +1,51 @@
+"""Атомарная запись файлов через временный файл в том же каталоге."""
+from __future__ import annotations
+
+import os
+import stat
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Any, Iterator, Optional, Tuple
+
+_NEW_FILE_MODE = 0o666
+_ATTEMPTS = 100
+
+
+def _create_temp(path: Path) -> Tuple[int, Path]:
+    # В отличие от tempfile.mkstemp (права 0600), права нового файла задаёт umask, как при обычном open().
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0)
+    for _ in range(_ATTEMPTS):
+        temp_path = path.with_name(f".{path.name}.{os.urandom(4).hex()}.tmp")
+        try:
+            return os.open(temp_path, flags, _NEW_FILE_MODE), temp_path
+        except FileExistsError:
+            continue
+    raise FileExistsError(f"Не удалось создать временный файл для {path}")
+
+
+@contextmanager
+def atomic_write(
+    path: Path,
+    mode: str = "wb",
+    *,
+    encoding: Optional[str] = None,
+    newline: Optional[str] = None,
+) -> Iterator[IO[Any]]:
+    """Открывает временный файл, который после успешного завершения блока заменяет ``path``.
+
+    Существующий файл сохраняет свои права доступа, новый получает права по
+    umask. При ошибке временный файл удаляется, а ``path`` не меняется.
+    """
+
+    fd, temp_path = _create_temp(path)
+    try:
+        with os.fdopen(fd, mode, encoding=encoding, newline=newline) as output:
+            yield output
+        try:
+            os.chmod(temp_path, stat.S_IMODE(path.stat().st_mode))
+        except FileNotFoundError:
+            pass
+        os.replace(temp_path, path)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
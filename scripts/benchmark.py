@@ -0,0 +1,278 @@
+"""Замер производительности обработки плагинов на локальном имитаторе GitHub API.
+
+Для каждого размера конфигурации (по умолчанию 1, 10 и 100 плагинов) генерируется
+``plugins.json`` и набор релизов на :class:`~scripts.fake_github.FakeGitHub`, после
+чего утилита ``plugin_release`` запускается в отдельном процессе по этапам:
+
+* ``startup`` — запуск интерпретатора, импорт ``plugin_release`` и загрузка
+  конфигурации (медиана нескольких запусков, без обращений к серверу); этап
+  завершается с ошибкой, если при этом загружены модули из ``DEFERRED_MODULES``;
+* ``cold`` — пустые кэши и состояние, сборка и публикация всех плагинов;
+* ``warm`` — повторный запуск без изменений (условные запросы и проверка состояния);
+* ``force`` — повторная сборка с ``--force`` (повторное использование архивов и ассетов).
+
+Для каждого этапа выводятся время, число запросов, объём переданных данных и
+пиковое потребление памяти дочерним процессом. С ``--max-startup`` замер
+завершается с ошибкой, если запуск стал медленнее заданного времени. Пример::
+
+    python -m scripts.benchmark --sizes 1,10 --latency 0.02 --json report.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .fake_github import FakeGitHub
+
+LOGGER = logging.getLogger(__name__)
+
+STAGES = ("startup", "cold", "warm", "force")
+_STAGE_ARGS = {"cold": [], "warm": [], "force": ["--force"]}
+# Модули, которые plugin_release должен импортировать только при использовании.
+DEFERRED_MODULES = ("tarfile", "zipfile", "shutil", "subprocess", "tempfile", "urllib.request")
+_STARTUP_CODE = (
+    "import sys; from pathlib import Path; "
+    "from scripts.plugin_release import load_plugins_config; "
+    "load_plugins_config(Path(sys.argv[1])); "
+    "loaded = [name for name in sys.argv[2:] if name in sys.modules]; "
+    "sys.exit('Загружены при запуске: ' + ', '.join(loaded) if loaded else 0)"
+)
+_MIRROR_REPO = "bench/mirror"
+
+
+@dataclass
+class StageResult:
+    plugins: int
+    stage: str
+    exit_code: int
+    wall_seconds: float
+    requests: int
+    bytes_sent: int
+    bytes_received: int
+    peak_rss_kb: Optional[int]
+
+
+def generate_config(path: Path, server: FakeGitHub, count: int) -> None:
+    """Создаёт конфигурацию из ``count`` плагинов и соответствующие релизы на сервере."""
+
+    plugins = []
+    for index in range(count):
+        name = f"bench-{index:03d}"
+        server.add_release(
+            "upstream",
+            name,
+            "v1.0.0",
+            {f"{name}-win32.zip": f"{name}32.exe", f"{name}-win64.zip": f"{name}64.exe"},
+        )
+        plugins.append(
+            {
+                "name": name,
+                "branch": f"plugin/{name}",
+                "source": {
+                    "type": "github",
+                    "owner": "upstream",
+                    "repo": name,
+                    "tag_prefix": "v",
+                    "asset_patterns": [
+                        {"arch": "x86", "pattern": r"win32\.zip$", "archive_member": r"32\.exe$", "rename_to": f"{name}.exe"},
+                        {"arch": "x64", "pattern": r"win64\.zip$", "archive_member": r"64\.exe$", "rename_to": f"{name}.exe"},
+                    ],
+                },
+            }
+        )
+    path.write_text(json.dumps({"plugins": plugins}, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+def _run_child(command: List[str], cwd: Path, env: Dict[str, str]) -> tuple[int, Optional[int]]:
+    """Запускает процесс и возвращает код завершения и пиковый RSS в килобайтах."""
+
+    with open(os.devnull, "wb") as devnull:
+        process = subprocess.Popen(command, cwd=cwd, env=env, stdout=devnull, stderr=subprocess.STDOUT)
+        if not hasattr(os, "wait4"):
+            return process.wait(), None
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        return process.returncode, usage.ru_maxrss
+
+
+def _measure_startup(
+    count: int, config_path: Path, workdir: Path, env: Dict[str, str], args: argparse.Namespace
+) -> StageResult:
+    """Медиана времени запуска; первый запуск прогревает кэш файловой системы и не учитывается."""
+
+    command = [sys.executable, "-c", _STARTUP_CODE, str(config_path), *DEFERRED_MODULES]
+    warmup = subprocess.run(
+        command, cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+    )
+    exit_code = warmup.returncode
+    if exit_code:
+        LOGGER.error("Этап startup завершился с ошибкой: %s", warmup.stderr.strip())
+    timings = []
+    peak_rss: Optional[int] = None
+    for _ in range(args.startup_runs):
+        started = time.perf_counter()
+        code, rss = _run_child(command, workdir, env)
+        timings.append(time.perf_counter() - started)
+        exit_code = exit_code or code
+        if rss is not None:
+            peak_rss = max(peak_rss or 0, rss)
+    elapsed = statistics.median(timings)
+    if args.max_startup is not None and elapsed > args.max_startup:
+        LOGGER.error("Запуск занимает %.3f с, допустимо не больше %.3f с", elapsed, args.max_startup)
+        exit_code = exit_code or 1
+    return StageResult(
+        plugins=count,
+        stage="startup",
+        exit_code=exit_code,
+        wall_seconds=round(elapsed, 3),
+        requests=0,
+        bytes_sent=0,
+        bytes_received=0,
+        peak_rss_kb=peak_rss,
+    )
+
+
+def run_size(count: int, workdir: Path, args: argparse.Namespace) -> List[StageResult]:
+    workdir.mkdir(parents=True, exist_ok=True)
+    results = []
+    with FakeGitHub(
+        workdir / "server",
+        latency=args.latency,
+        rate_limit=args.rate_limit,
+        binary_size=args.binary_size,
+    ) as server:
+        config_path = workdir / "plugins.json"
+        generate_config(config_path, server, count)
+        repo_root = Path(__file__).resolve().parent.parent
+        env = {
+            **os.environ,
+            "GITHUB_TOKEN": "benchmark",
+            "PYTHONPATH": os.pathsep.join(filter(None, [str(repo_root), os.environ.get("PYTHONPATH")])),
+        }
+        command = [
+            sys.executable,
+            "-m",
+            "scripts.plugin_release",
+            "--all",
+            "--config",
+            str(config_path),
+            "--ignore-branch",
+            "--publish",
+            "--repo",
+            _MIRROR_REPO,
+            "--api-url",
+            server.url,
+            "--jobs",
+            str(args.jobs),
+        ]
+        for stage in args.stages:
+            if stage == "startup":
+                results.append(_measure_startup(count, config_path, workdir, env, args))
+                LOGGER.info("%s плагинов, этап startup: %.3f с", count, results[-1].wall_seconds)
+                continue
+            server.reset_stats()
+            started = time.perf_counter()
+            exit_code, peak_rss = _run_child(command + _STAGE_ARGS[stage], workdir, env)
+            elapsed = time.perf_counter() - started
+            stats = server.stats.as_dict()
+            results.append(
+                StageResult(
+                    plugins=count,
+                    stage=stage,
+                    exit_code=exit_code,
+                    wall_seconds=round(elapsed, 3),
+                    requests=stats["total_requests"],
+                    bytes_sent=stats["bytes_sent"],
+                    bytes_received=stats["bytes_received"],
+                    peak_rss_kb=peak_rss,
+                )
+            )
+            LOGGER.info("%s плагинов, этап %s: %.2f с", count, stage, elapsed)
+    return results
+
+
+def _format_table(results: List[StageResult]) -> str:
+    header = f"{'плагины':>8} {'этап':<7} {'код':>3} {'время, с':>9} {'запросы':>8} {'отдано, МБ':>11} {'принято, МБ':>12} {'RSS, МБ':>8}"
+    lines = [header]
+    for item in results:
+        rss = f"{item.peak_rss_kb / 1024:.1f}" if item.peak_rss_kb is not None else "-"
+        lines.append(
+            f"{item.plugins:>8} {item.stage:<7} {item.exit_code:>3} {item.wall_seconds:>9.2f} {item.requests:>8} "
+            f"{item.bytes_sent / 1048576:>11.1f} {item.bytes_received / 1048576:>12.1f} {rss:>8}"
+        )
+    return "\n".join(lines)
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Замер производительности на локальном имитаторе GitHub API")
+    parser.add_argument("--sizes", default="1,10,100", help="Количество плагинов в конфигурациях через запятую")
+    parser.add_argument(
+        "--stages",
+        default=",".join(STAGES),
+        help=f"Этапы замера через запятую ({', '.join(STAGES)})",
+    )
+    parser.add_argument("--latency", type=float, default=0.0, help="Задержка ответа сервера в секундах")
+    parser.add_argument("--rate-limit", type=int, default=5000, help="Лимит запросов имитатора")
+    parser.add_argument(
+        "--binary-size",
+        type=int,
+        default=1024 * 1024,
+        help="Размер синтетического бинарника в байтах",
+    )
+    parser.add_argument("--jobs", type=int, default=4, help="Значение --jobs для plugin_release")
+    parser.add_argument(
+        "--startup-runs",
+        type=int,
+        default=5,
+        help="Количество запусков на этапе startup (учитывается медиана)",
+    )
+    parser.add_argument(
+        "--max-startup",
+        type=float,
+        help="Допустимое время запуска в секундах; при превышении замер завершается с ошибкой",
+    )
+    parser.add_argument("--workdir", help="Рабочий каталог (по умолчанию временный)")
+    parser.add_argument("--json", dest="json_path", help="Сохранить результаты в JSON-файл")
+    args = parser.parse_args(argv)
+    try:
+        args.sizes = [int(value) for value in args.sizes.split(",") if value.strip()]
+    except ValueError:
+        parser.error("--sizes должен содержать целые числа через запятую")
+    args.stages = [value.strip() for value in args.stages.split(",") if value.strip()]
+    unknown = set(args.stages) - set(STAGES)
+    if unknown:
+        parser.error(f"Неизвестные этапы: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv: List[str] | None = None) -> int:
+    args = parse_args(argv if argv is not None else sys.argv[1:])
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+
+    results: List[StageResult] = []
+    with tempfile.TemporaryDirectory(prefix="plugin-bench-") as temporary:
+        root = Path(args.workdir) if args.workdir else Path(temporary)
+        for count in args.sizes:
+            results.extend(run_size(count, root / f"plugins-{count}", args))
+
+    print(_format_table(results))
+    if args.json_path:
+        Path(args.json_path).write_text(
+            json.dumps([asdict(item) for item in results], ensure_ascii=False, indent=2),
+            encoding="utf-8",
+        )
+    return 1 if any(item.exit_code for item in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,192 @@
+"""Обновление каталога плагинов в README по конфигурации и состоянию обработанных версий.
+
+Разделы каталога ограничены маркерами, запись каждого плагина — строка с
+маркером версии в конце::
+
+    <!-- catalogue:DevOps -->
+    - [k9s 0.24.2](https://github.com/derailed/k9s/releases/tag/v0.24.2) — описание <!-- plugin:k9s version=0.24.2 -->
+    <!-- /catalogue:DevOps -->
+
+Файл просматривается один раз построчно, заново формируются только записи,
+версия в маркере которых отличается от версии в состоянии; остальные строки,
+в том числе написанные вручную, не меняются. Плагины с обработанной версией,
+которых ещё нет в README, добавляются в конец раздела из поля ``category``
+конфигурации. Если ничего не изменилось, файл не перезаписывается::
+
+    python -m scripts.plugin_release readme --readme README.md
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import re
+import sys
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from .atomic import atomic_write
+from .config_loader import ConfigurationError, load_plugins_config
+from .models import PluginConfig
+from .state import StateStore
+
+LOGGER = logging.getLogger(__name__)
+
+_ENTRY_MARKER = re.compile(r"\s*<!-- plugin:(?P<name>[^\s>]+) version=(?P<version>[^\s>]*) -->\s*$")
+_SECTION_START = re.compile(r"<!-- catalogue:(?P<section>.+?) -->\s*$")
+_SECTION_END = re.compile(r"<!-- /catalogue:(?P<section>.+?) -->\s*$")
+_DESCRIPTION_SEPARATOR = " — "
+
+
+def release_url(plugin: PluginConfig, version: str) -> str:
+    source = plugin.source
+    return f"https://github.com/{source.owner}/{source.repo}/releases/tag/{source.tag_prefix}{version}"
+
+
+def render_entry(plugin: PluginConfig, version: str, description: Optional[str] = None) -> str:
+    """Строка каталога; ``description`` сохраняет описание, написанное в README вручную."""
+
+    title = plugin.release_name_template.format(name=plugin.name, version=version)
+    line = f"- [{title}]({release_url(plugin, version)})"
+    description = description if description is not None else plugin.plugin_description
+    if description:
+        line += f"{_DESCRIPTION_SEPARATOR}{description}"
+    return f"{line} <!-- plugin:{plugin.name} version={version} -->"
+
+
+def _existing_description(line: str) -> Optional[str]:
+    _, separator, description = line.partition(_DESCRIPTION_SEPARATOR)
+    return description.strip() if separator and description.strip() else None
+
+
+def update_catalogue(
+    text: str,
+    plugins: Mapping[str, PluginConfig],
+    versions: Mapping[str, str],
+    *,
+    full: bool = False,
+) -> Tuple[str, List[str]]:
+    """Возвращает новый текст README и имена плагинов, записи которых изменились.
+
+    ``full`` заново формирует все записи с маркерами, а не только те, у
+    которых изменилась версия.
+    """
+
+    lines = text.splitlines(keepends=True)
+    present = set()
+    for line in lines:
+        match = _ENTRY_MARKER.search(line)
+        if match:
+            present.add(match.group("name"))
+    missing: Dict[str, List[PluginConfig]] = {}
+    for name in sorted(set(plugins) - present):
+        candidate = plugins[name]
+        if name not in versions:
+            continue
+        if not candidate.category:
+            LOGGER.warning("Плагин %s не добавлен в README: не задано поле category", name)
+            continue
+        missing.setdefault(candidate.category, []).append(candidate)
+
+    result: List[str] = []
+    changed: List[str] = []
+    section_start = 0
+    for line in lines:
+        newline = line[len(line.rstrip("\r\n")) :] or "\n"
+        match = _ENTRY_MARKER.search(line)
+        if match:
+            name = match.group("name")
+            plugin = plugins.get(name)
+            version = versions.get(name)
+            if plugin is not None and version is not None and (full or match.group("version") != version):
+                body = line[: match.start()]
+                rendered = render_entry(plugin, version, _existing_description(body)) + newline
+                if rendered != line:
+                    changed.append(name)
+                line = rendered
+            result.append(line)
+            continue
+        start = _SECTION_START.match(line.strip())
+        if start:
+            section_start = len(result) + 1
+            result.append(line)
+            continue
+        end = _SECTION_END.match(line.strip())
+        if end:
+            additions = missing.pop(end.group("section"), [])
+            if additions:
+                # Новые записи идут после последней непустой строки раздела.
+                position = len(result)
+                while position > section_start and not result[position - 1].strip():
+                    position -= 1
+                rendered_lines = [render_entry(plugin, versions[plugin.name]) + newline for plugin in additions]
+                result[position:position] = rendered_lines
+                changed.extend(plugin.name for plugin in additions)
+        result.append(line)
+    for section, additions in missing.items():
+        LOGGER.warning(
+            "В README нет раздела <!-- catalogue:%s -->, не добавлены плагины: %s",
+            section,
+            ", ".join(plugin.name for plugin in additions),
+        )
+    return "".join(result), changed
+
+
+def write_if_changed(path: Path, text: str) -> bool:
+    """Атомарно перезаписывает файл, только если содержимое отличается."""
+
+    try:
+        if path.read_text(encoding="utf-8") == text:
+            return False
+    except FileNotFoundError:
+        pass
+    with atomic_write(path, "w", encoding="utf-8", newline="") as output:
+        output.write(text)
+    return True
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="plugin_release readme",
+        description="Обновление версий плагинов в каталоге README по состоянию обработанных релизов",
+    )
+    parser.add_argument("--readme", default="README.md", help="Путь до README")
+    parser.add_argument("--config", default="data/plugins.json", help="Путь до файла конфигурации")
+    parser.add_argument("--state-dir", default="state", help="Каталог состояния обработанных версий")
+    parser.add_argument("--full", action="store_true", help="Сформировать заново все записи с маркерами")
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Не записывать файл, а завершиться с ненулевым кодом, если README устарел",
+    )
+    parser.add_argument("--verbose", action="store_true", help="Подробный вывод логов")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv if argv is not None else sys.argv[1:])
+    level = logging.DEBUG if args.verbose else logging.INFO
+    logging.basicConfig(level=level, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+
+    readme = Path(args.readme)
+    try:
+        plugins = load_plugins_config(Path(args.config))
+        text = readme.read_text(encoding="utf-8")
+    except (ConfigurationError, OSError) as error:
+        LOGGER.error("%s", error)
+        return 1
+    versions = {name: state.version for name, state in StateStore.open(Path(args.state_dir)).latest_all().items()}
+    updated, changed = update_catalogue(text, plugins, versions, full=args.full)
+    if args.check:
+        if updated != text:
+            LOGGER.error("README устарел, требуют обновления записи: %s", ", ".join(changed))
+            return 1
+        return 0
+    if write_if_changed(readme, updated):
+        LOGGER.info("README обновлён, изменены записи: %s", ", ".join(changed))
+    else:
+        LOGGER.info("README не изменился")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""Файлы контрольных сумм, опубликованные в релизах исходных проектов.
+
+Поддерживаются файлы вида ``checksums.txt``, ``SHA256SUMS``, ``*.sha256`` и
+``*.sha512`` в формате ``sha256sum`` (``<хэш>  <имя>``, в том числе с ``*``
+перед именем) и в формате BSD (``SHA256 (<имя>) = <хэш>``). Алгоритм
+определяется по длине хэша или по названию в строке BSD-формата.
+"""
+from __future__ import annotations
+
+import logging
+import re
+import threading
+from pathlib import PurePosixPath
+from typing import Dict, List
+
+from .downloader import AssetDownloader, DownloadError
+
+LOGGER = logging.getLogger(__name__)
+
+_CHECKSUM_ASSET = re.compile(
+    r"(?:^|[._-])(?:checksums?|sha(?:1|256|512)sums?)(?:\.txt)?$|\.(?:sha1|sha256|sha512)(?:sum)?$",
+    re.IGNORECASE,
+)
+_SINGLE_SUFFIX = re.compile(r"\.(?:sha1|sha256|sha512)(?:sum)?$", re.IGNORECASE)
+_ALGORITHM_BY_LENGTH = {40: "sha1", 64: "sha256", 128: "sha512"}
+_HEX = re.compile(r"[0-9a-fA-F]+$")
+_BSD_LINE = re.compile(r"(?P<algorithm>SHA1|SHA256|SHA512)\s*\((?P<name>.+)\)\s*=\s*(?P<digest>[0-9a-fA-F]+)$")
+
+Checksums = Dict[str, Dict[str, str]]
+
+
+def is_checksum_asset(name: str) -> bool:
+    return bool(_CHECKSUM_ASSET.search(name))
+
+
+def parse_checksums(text: str, source_name: str = "") -> Checksums:
+    """Разбирает файл контрольных сумм в словарь ``имя файла -> {алгоритм: хэш}``.
+
+    Строка без имени файла (типично для ``tool.zip.sha256``) относится к файлу,
+    имя которого получается из ``source_name`` отбрасыванием суффикса.
+    """
+
+    result: Checksums = {}
+    default_name = _SINGLE_SUFFIX.sub("", source_name) if _SINGLE_SUFFIX.search(source_name) else None
+    for raw_line in text.splitlines():
+        line = raw_line.strip()
+        if not line or line.startswith("#"):
+            continue
+        bsd = _BSD_LINE.match(line)
+        if bsd:
+            algorithm, name, digest = bsd.group("algorithm").lower(), bsd.group("name"), bsd.group("digest")
+        else:
+            digest, _, name = line.partition(" ")
+            name = name.strip().lstrip("*")
+            algorithm = _ALGORITHM_BY_LENGTH.get(len(digest))
+            if not name:
+                name = default_name or ""
+        if not name or not algorithm or not _HEX.match(digest) or _ALGORITHM_BY_LENGTH.get(len(digest)) != algorithm:
+            continue
+        result.setdefault(PurePosixPath(name).name, {})[algorithm] = digest.lower()
+    return result
+
+
+class ReleaseChecksums:
+    """Контрольные суммы из файлов контрольных сумм одного релиза.
+
+    Файлы скачиваются лениво, при первом запросе сумм ассета: для ассета
+    ``tool.zip`` берётся его собственный файл (``tool.zip.sha256`` и подобные),
+    а если такого нет — общие файлы релиза (``checksums.txt``, ``SHA256SUMS``).
+    Файлы сумм других ассетов не скачиваются.
+    """
+
+    def __init__(self, release: dict, downloader: AssetDownloader) -> None:
+        self._release = release
+        self._downloader = downloader
+        assets = [asset for asset in release.get("assets", []) if is_checksum_asset(asset.get("name", ""))]
+        names = {asset.get("name", "") for asset in release.get("assets", [])}
+        self._per_asset: Dict[str, List[dict]] = {}
+        self._shared: List[dict] = []
+        for asset in assets:
+            name = asset.get("name", "")
+            target = _SINGLE_SUFFIX.sub("", name) if _SINGLE_SUFFIX.search(name) else None
+            if target is not None and target in names:
+                self._per_asset.setdefault(target, []).append(asset)
+            else:
+                self._shared.append(asset)
+        self._loaded: Dict[str, Checksums] = {}
+        self._lock = threading.Lock()
+
+    def _parsed(self, asset: dict) -> Checksums:
+        """Скачивает (через кэш бинарников) и разбирает файл контрольных сумм один раз.
+
+        Если файл есть, но его не удалось скачать, выбрасывается
+        :class:`DownloadError`: молча пропускать проверку небезопасно.
+        """
+
+        name = asset.get("name", "")
+        with self._lock:
+            if name in self._loaded:
+                return self._loaded[name]
+        # Одновременный запрос того же файла из другой архитектуры дождётся
+        # блокировки ключа в кэше бинарников и получит файл из кэша.
+        blob = self._downloader.fetch(asset)
+        try:
+            text = blob.path.read_text(encoding="utf-8", errors="replace")
+        except OSError as error:
+            raise DownloadError(f"Не удалось прочитать файл контрольных сумм {name}: {error}") from error
+        finally:
+            self._downloader.release(blob)
+        parsed = parse_checksums(text, name)
+        with self._lock:
+            if name not in self._loaded:
+                LOGGER.info("Контрольные суммы релиза %s: %s", self._release.get("tag_name", ""), name)
+            return self._loaded.setdefault(name, parsed)
+
+    def expected(self, asset_name: str) -> Dict[str, str]:
+        result: Dict[str, str] = {}
+        for asset in self._per_asset.get(asset_name) or self._shared:
+            result.update(self._parsed(asset).get(asset_name, {}))
+        return result
@@ -0,0 +1,104 @@
+"""Выбор способа сжатия записей архива плагина.
+
+MobaXterm читает только zip, поэтому выбор ограничен записью без сжатия и
+deflate с разными уровнями. Уже упакованные данные (UPX, сжатые ресурсы,
+вложенные архивы) определяются по энтропии выборки и хранятся без сжатия:
+повторное сжатие тратит процессор почти без выигрыша в размере. Остальные
+записи сжимаются уровнем из профиля ``fast``, ``balanced`` или ``small`` либо
+заданным в конфигурации плагина или архитектуры.
+"""
+from __future__ import annotations
+
+import logging
+import math
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from .models import AssetPattern, CompressionSettings
+
+LOGGER = logging.getLogger(__name__)
+
+# Уровень deflate и порог энтропии (бит на байт) для профилей.
+PROFILES: Dict[str, Tuple[int, float]] = {
+    "fast": (1, 7.2),
+    "balanced": (6, 7.5),
+    "small": (9, 7.9),
+}
+
+SAMPLE_BLOCK = 64 * 1024
+SAMPLE_BLOCKS = 4
+
+
+def block_entropy(data: bytes) -> float:
+    """Энтропия Шеннона распределения байтов блока в битах на байт."""
+
+    if not data:
+        return 0.0
+    total = len(data)
+    return -sum(count / total * math.log2(count / total) for count in Counter(data).values())
+
+
+def sample_entropy(sample: bytes) -> float:
+    """Средняя энтропия блоков выборки; блоки примерно соответствуют окну deflate."""
+
+    blocks = [sample[offset : offset + SAMPLE_BLOCK] for offset in range(0, len(sample), SAMPLE_BLOCK)]
+    if not blocks:
+        return 0.0
+    return sum(block_entropy(block) * len(block) for block in blocks) / len(sample)
+
+
+def read_sample(path: Path, size: Optional[int] = None) -> bytes:
+    """Выборка из нескольких блоков, равномерно распределённых по файлу."""
+
+    size = path.stat().st_size if size is None else size
+    if size <= SAMPLE_BLOCK * SAMPLE_BLOCKS:
+        return path.read_bytes()
+    step = (size - SAMPLE_BLOCK) // (SAMPLE_BLOCKS - 1)
+    with path.open("rb") as stream:
+        chunks = []
+        for index in range(SAMPLE_BLOCKS):
+            stream.seek(index * step)
+            chunks.append(stream.read(SAMPLE_BLOCK))
+    return b"".join(chunks)
+
+
+@dataclass(frozen=True)
+class CompressionPolicy:
+    """Политика сжатия записей одного архива."""
+
+    level: int = PROFILES["balanced"][0]
+    store_entropy: Optional[float] = PROFILES["balanced"][1]
+
+    @classmethod
+    def for_asset(cls, settings: CompressionSettings, pattern: Optional[AssetPattern] = None) -> "CompressionPolicy":
+        """Политика для архитектуры: уровень шаблона важнее уровня плагина, тот — профиля."""
+
+        level, store_entropy = PROFILES[settings.profile]
+        if settings.level is not None:
+            level = settings.level
+        if pattern is not None and pattern.compression_level is not None:
+            level = pattern.compression_level
+        if settings.store_entropy is not None:
+            store_entropy = settings.store_entropy
+        return cls(level=level, store_entropy=store_entropy)
+
+    def describe(self) -> Dict[str, Any]:
+        """Описание для манифеста сборки: изменение политики приводит к пересборке."""
+
+        return {"method": "adaptive", "level": self.level, "store_entropy": self.store_entropy}
+
+    def choose(self, sample: bytes) -> Tuple[int, Optional[int]]:
+        """Метод сжатия zip и уровень для записи, данные которой начинаются с ``sample``."""
+
+        from zipfile import ZIP_DEFLATED, ZIP_STORED
+
+        if self.level == 0:
+            return ZIP_STORED, None
+        if self.store_entropy is not None and len(sample) >= SAMPLE_BLOCK:
+            entropy = sample_entropy(sample)
+            if entropy >= self.store_entropy:
+                LOGGER.debug("Энтропия выборки %.2f бит/байт, запись хранится без сжатия", entropy)
+                return ZIP_STORED, None
+        return ZIP_DEFLATED, self.level
@@ -0,0 +1,226 @@
+"""Замер времени и степени сжатия по уровням deflate на бинарниках из кэша.
+
+Помогает выбрать профиль и уровни сжатия (см. :mod:`scripts.compression`)::
+
+    python -m scripts.plugin_release bench --levels 0,1,6,9
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import sys
+import tarfile
+import time
+import zlib
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import IO, ContextManager, Dict, Iterator, List, Optional, Tuple
+from zipfile import ZIP_STORED, ZipFile, is_zipfile
+
+from .checksums import is_checksum_asset
+from .compression import PROFILES, SAMPLE_BLOCK, SAMPLE_BLOCKS, CompressionPolicy, sample_entropy
+from .models import CompressionSettings
+
+LOGGER = logging.getLogger(__name__)
+
+_BENCH_CHUNK = 1024 * 1024
+
+
+@dataclass
+class LevelResult:
+    """Результат сжатия одного бинарника одним уровнем."""
+
+    level: int
+    size: int
+    seconds: float
+
+
+@dataclass
+class BenchResult:
+    """Результаты замера по одному бинарнику."""
+
+    name: str
+    size: int
+    entropy: float
+    levels: List[LevelResult]
+    decisions: Dict[str, str]
+
+
+@contextmanager
+def _zip_members(path: Path) -> Iterator[Optional[Tuple[str, IO[bytes]]]]:
+    """Крупнейший файл zip-архива и поток его содержимого; ``None``, если файлов нет."""
+
+    with ZipFile(path) as upstream:
+        files = [info for info in upstream.infolist() if not info.is_dir()]
+        if not files:
+            yield None
+            return
+        largest = max(files, key=lambda info: info.file_size)
+        with upstream.open(largest) as stream:
+            yield largest.filename, stream
+
+
+@contextmanager
+def _tar_members(path: Path) -> Iterator[Optional[Tuple[str, IO[bytes]]]]:
+    """Крупнейший файл tar-архива и поток его содержимого; ``None``, если файлов нет."""
+
+    with tarfile.open(path, "r:*") as upstream:
+        files = [member for member in upstream.getmembers() if member.isfile()]
+        if not files:
+            yield None
+            return
+        largest = max(files, key=lambda member: member.size)
+        stream = upstream.extractfile(largest)
+        if stream is None:
+            raise tarfile.TarError(f"{largest.name} в {path} не является файлом")
+        with stream:
+            yield largest.name, stream
+
+
+@contextmanager
+def _open_payload(path: Path) -> Iterator[Tuple[str, IO[bytes]]]:
+    """Открывает то, что попадёт в архив плагина: сам файл или крупнейший член архива."""
+
+    members: ContextManager[Optional[Tuple[str, IO[bytes]]]] = nullcontext()
+    if is_zipfile(path):
+        members = _zip_members(path)
+    elif tarfile.is_tarfile(path):
+        members = _tar_members(path)
+    with members as member:
+        if member is not None:
+            name, stream = member
+            yield f"{path.name}:{name}", stream
+            return
+    with path.open("rb") as stream:
+        yield path.name, stream
+
+
+def _compress_size(data: bytes, level: int) -> Tuple[int, float]:
+    started = time.perf_counter()
+    if level == 0:
+        size = len(data)
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        size = 0
+        for offset in range(0, len(data), _BENCH_CHUNK):
+            size += len(compressor.compress(data[offset : offset + _BENCH_CHUNK]))
+        size += len(compressor.flush())
+    return size, time.perf_counter() - started
+
+
+def bench_file(path: Path, levels: List[int]) -> BenchResult:
+    """Сжимает бинарник каждым уровнем в памяти и сравнивает с решением профилей."""
+
+    with _open_payload(path) as (name, stream):
+        data = stream.read()
+    sample = data[: SAMPLE_BLOCK * SAMPLE_BLOCKS]
+    decisions = {}
+    for profile in PROFILES:
+        method, level = CompressionPolicy.for_asset(CompressionSettings(profile=profile)).choose(sample)
+        decisions[profile] = "store" if method == ZIP_STORED else f"deflate-{level}"
+    results = []
+    for level in levels:
+        size, seconds = _compress_size(data, level)
+        results.append(LevelResult(level=level, size=size, seconds=seconds))
+    return BenchResult(
+        name=name,
+        size=len(data),
+        entropy=sample_entropy(sample),
+        levels=results,
+        decisions=decisions,
+    )
+
+
+def cached_blobs(cache_dir: Path) -> List[Path]:
+    """Бинарники из кэша загрузчика ассетов (кроме файлов контрольных сумм)."""
+
+    blobs = []
+    for meta_path in sorted(cache_dir.glob("*/meta.json")):
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        blob_path = meta_path.parent / meta.get("name", "")
+        if blob_path.is_file() and not is_checksum_asset(blob_path.name):
+            blobs.append(blob_path)
+    return blobs
+
+
+def _format_table(results: List[BenchResult], levels: List[int]) -> str:
+    header = f"{'бинарник':<40} {'МБ':>7} {'энтр.':>5} " + " ".join(f"{f'ур. {level}':>14}" for level in levels)
+    lines = [header, " " * 55 + " ".join(f"{'%  МБ/с':>14}" for _ in levels)]
+    totals = {level: [0, 0.0] for level in levels}
+    for item in results:
+        cells = []
+        for result in item.levels:
+            ratio = result.size / item.size * 100 if item.size else 100.0
+            speed = item.size / 1048576 / result.seconds if result.seconds else float("inf")
+            cells.append(f"{ratio:>6.1f} {speed:>7.0f}")
+            totals[result.level][0] += result.size
+            totals[result.level][1] += result.seconds
+        lines.append(f"{item.name[-40:]:<40} {item.size / 1048576:>7.1f} {item.entropy:>5.2f} " + " ".join(cells))
+        lines.append(" " * 4 + ", ".join(f"{profile}: {decision}" for profile, decision in item.decisions.items()))
+    source = sum(item.size for item in results)
+    if source:
+        cells = [
+            f"{totals[level][0] / source * 100:>6.1f} {source / 1048576 / totals[level][1] if totals[level][1] else 0:>7.0f}"
+            for level in levels
+        ]
+        lines.append(f"{'всего':<40} {source / 1048576:>7.1f} {'':>5} " + " ".join(cells))
+    return "\n".join(lines)
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="plugin_release bench",
+        description="Замер времени и степени сжатия по уровням deflate на бинарниках из кэша",
+    )
+    parser.add_argument("paths", nargs="*", help="Файлы для замера (по умолчанию все бинарники кэша)")
+    parser.add_argument(
+        "--download-cache-dir",
+        default=".cache/assets",
+        help="Каталог кэша скачанных бинарников",
+    )
+    parser.add_argument("--levels", default="0,1,3,6,9", help="Уровни сжатия через запятую (0 — без сжатия)")
+    parser.add_argument("--limit", type=int, help="Ограничить количество бинарников")
+    parser.add_argument("--json", dest="json_path", help="Сохранить результаты в JSON-файл")
+    args = parser.parse_args(argv)
+    try:
+        args.levels = [int(value) for value in args.levels.split(",") if value.strip()]
+    except ValueError:
+        parser.error("--levels должен содержать целые числа через запятую")
+    if not args.levels or any(level < 0 or level > 9 for level in args.levels):
+        parser.error("Уровни сжатия должны быть от 0 до 9")
+    return args
+
+
+def main(argv: List[str] | None = None) -> int:
+    args = parse_args(argv if argv is not None else sys.argv[1:])
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+
+    paths = [Path(value) for value in args.paths] or cached_blobs(Path(args.download_cache_dir))
+    if args.limit is not None:
+        paths = paths[: args.limit]
+    if not paths:
+        LOGGER.error("Нет бинарников для замера: кэш %s пуст", args.download_cache_dir)
+        return 1
+
+    results = []
+    for path in paths:
+        try:
+            results.append(bench_file(path, args.levels))
+        except (OSError, tarfile.TarError, zlib.error, KeyError) as error:
+            LOGGER.warning("Не удалось замерить %s: %s", path, error)
+    print(_format_table(results, args.levels))
+    if args.json_path:
+        Path(args.json_path).write_text(
+            json.dumps([asdict(item) for item in results], ensure_ascii=False, indent=2),
+            encoding="utf-8",
+        )
+    return 0 if results else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
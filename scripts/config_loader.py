@@ -2,26 +2,40 @@
 from __future__ import annotations
 
 import json
+import re
 from pathlib import Path
 from typing import Dict, Iterable
 
-from .models import AssetPattern, PluginConfig, PluginSource
+from .compression import PROFILES
+from .models import AssetPattern, CompressionSettings, PluginConfig, PluginSource
 
 
 class ConfigurationError(RuntimeError):
     """Ошибка чтения конфигурации."""
 
 
+def _check_level(value: object, field_name: str) -> None:
+    if value is not None and (not isinstance(value, int) or isinstance(value, bool) or not 0 <= value <= 9):
+        raise ConfigurationError(f"Поле '{field_name}' должно быть целым числом от 0 до 9.")
+
+
 def _load_asset_patterns(items: Iterable[dict]) -> Iterable[AssetPattern]:
     for item in items:
         if "arch" not in item or "pattern" not in item:
             raise ConfigurationError("Каждый шаблон должен содержать поля 'arch' и 'pattern'.")
-        yield AssetPattern(
-            arch=item["arch"],
-            pattern=item["pattern"],
-            rename_to=item.get("rename_to"),
-            archive_member=item.get("archive_member"),
-        )
+        _check_level(item.get("compression_level"), "compression_level")
+        try:
+            yield AssetPattern(
+                arch=item["arch"],
+                pattern=item["pattern"],
+                rename_to=item.get("rename_to"),
+                archive_member=item.get("archive_member"),
+                compression_level=item.get("compression_level"),
+            )
+        except re.error as error:
+            raise ConfigurationError(
+                f"Некорректное регулярное выражение для архитектуры {item['arch']}: {error}"
+            ) from error
 
 
 def _load_source(raw_source: dict) -> PluginSource:
@@ -44,6 +58,17 @@ def _load_source(raw_source: dict) -> PluginSource:
     )
 
 
+def _load_compression(raw: dict) -> CompressionSettings:
+    profile = raw.get("profile", "balanced")
+    if profile not in PROFILES:
+        raise ConfigurationError(f"Неизвестный профиль сжатия '{profile}', допустимы: {', '.join(PROFILES)}.")
+    _check_level(raw.get("level"), "compression.level")
+    store_entropy = raw.get("store_entropy")
+    if store_entropy is not None and (isinstance(store_entropy, bool) or not isinstance(store_entropy, (int, float))):
+        raise ConfigurationError("Поле 'compression.store_entropy' должно быть числом (бит на байт, до 8).")
+    return CompressionSettings(profile=profile, level=raw.get("level"), store_entropy=store_entropy)
+
+
 def load_plugins_config(config_path: Path) -> Dict[str, PluginConfig]:
     """Загружает конфигурацию плагинов."""
 
@@ -56,7 +81,11 @@ def load_plugins_config(config_path: Path) -> Dict[str, PluginConfig]:
     for item in raw.get("plugins", []):
         if "name" not in item or "branch" not in item or "source" not in item:
             raise ConfigurationError("Каждый плагин должен содержать поля 'name', 'branch', 'source'.")
-        source = _load_source(item["source"])
+        try:
+            source = _load_source(item["source"])
+            compression = _load_compression(item.get("compression", {}))
+        except ConfigurationError as error:
+            raise ConfigurationError(f"Плагин {item['name']}: {error}") from error
         config = PluginConfig(
             name=item["name"],
             branch=item["branch"],
@@ -68,6 +97,8 @@ def load_plugins_config(config_path: Path) -> Dict[str, PluginConfig]:
             ),
             plugin_description=item.get("plugin_description", ""),
             binary_subdir=item.get("binary_subdir", "bin"),
+            category=item.get("category"),
+            compression=compression,
         )
         plugins[config.name] = config
     return plugins
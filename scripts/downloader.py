@@ -0,0 +1,496 @@
+"""Скачивание ассетов релизов с докачкой, параллельными сегментами и кэшем."""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+from . import metrics
+from .http_pool import ConnectionPool
+
+LOGGER = logging.getLogger(__name__)
+
+_CHUNK_SIZE = 1024 * 1024
+_PROGRESS_FLUSH_BYTES = 8 * 1024 * 1024
+_DIGEST_BUFFER_BYTES = 64 * 1024 * 1024
+
+
+class DownloadError(RuntimeError):
+    """Ошибка скачивания или проверки ассета."""
+
+
+@dataclass
+class CachedBlob:
+    """Скачанный и проверенный ассет в кэше."""
+
+    path: Path
+    size: int
+    sha256: str
+    digests: Dict[str, str] = field(default_factory=dict)
+
+
+class _OrderedDigest:
+    """Контрольные суммы по данным, поступающим из нескольких сегментов.
+
+    Хэши обновляются строго по порядку байтов файла. Данные, пришедшие раньше
+    своей очереди, ждут в памяти; когда буфер заполнен, сегмент, опередивший
+    остальные, приостанавливается, пока первый сегмент не догонит его. С диска
+    читаются только ``on_disk`` — части, скачанные предыдущим прерванным
+    запуском, которых в потоке нет.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        algorithms: Iterable[str] = ("sha256",),
+        on_disk: Iterable[Tuple[int, int]] = (),
+        buffer_limit: int = _DIGEST_BUFFER_BYTES,
+    ) -> None:
+        self._path = path
+        self._hashers = {algorithm: hashlib.new(algorithm) for algorithm in sorted({"sha256", *algorithms})}
+        self._position = 0
+        self._on_disk = sorted((start, end) for start, end in on_disk if end > start)
+        self._pending: Dict[int, bytes] = {}
+        self._buffered = 0
+        self._buffer_limit = buffer_limit
+        self._aborted = False
+        self._condition = threading.Condition()
+        with self._condition:
+            self._drain()
+
+    def _catch_up(self, end: int) -> None:
+        with self._path.open("rb") as stream:
+            stream.seek(self._position)
+            while self._position < end:
+                chunk = stream.read(min(_CHUNK_SIZE, end - self._position))
+                if not chunk:
+                    raise DownloadError(f"Файл {self._path} короче ожидаемого: {self._position} из {end} байт")
+                self._update(chunk)
+
+    def _update(self, data: bytes) -> None:
+        for hasher in self._hashers.values():
+            hasher.update(data)
+        self._position += len(data)
+
+    def _drain(self) -> None:
+        while True:
+            chunk = self._pending.pop(self._position, None)
+            if chunk is not None:
+                self._buffered -= len(chunk)
+                self._update(chunk)
+                continue
+            end = next((end for start, end in self._on_disk if start <= self._position < end), None)
+            if end is None:
+                break
+            self._catch_up(end)
+        self._condition.notify_all()
+
+    def feed(self, offset: int, data: bytes) -> None:
+        with self._condition:
+            # Сегмент, данные которого идут следующими, не ждёт никогда, поэтому
+            # ожидание остальных всегда заканчивается.
+            while (
+                offset != self._position
+                and self._buffered
+                and self._buffered + len(data) > self._buffer_limit
+                and not self._aborted
+            ):
+                self._condition.wait()
+            if self._aborted:
+                raise DownloadError(f"Загрузка {self._path} прервана")
+            if offset == self._position:
+                self._update(data)
+            else:
+                self._pending[offset] = data
+                self._buffered += len(data)
+            self._drain()
+
+    def abort(self) -> None:
+        """Будит сегменты, ожидающие места в буфере, после сбоя другого сегмента."""
+
+        with self._condition:
+            self._aborted = True
+            self._condition.notify_all()
+
+    def hexdigests(self, size: int) -> Dict[str, str]:
+        with self._condition:
+            self._drain()
+            if self._position != size:
+                raise DownloadError(f"Контрольная сумма {self._path} посчитана по {self._position} из {size} байт")
+            return {algorithm: hasher.hexdigest() for algorithm, hasher in self._hashers.items()}
+
+
+class AssetDownloader:
+    """Загрузчик ассетов с контентно-адресуемым кэшем.
+
+    Ключ кэша вычисляется по SHA-256 ассета или по его ссылке, размеру и
+    времени изменения (см. :meth:`cache_key`); файл хранится в каталоге ``<cache_dir>/<ключ>/`` под исходным именем.
+    Крупные файлы скачиваются параллельными HTTP Range-сегментами, прогресс
+    сегментов сохраняется рядом с частичным файлом, поэтому прерванная
+    загрузка продолжается с места остановки. Размер кэша ограничивается
+    ``max_cache_bytes``: при превышении удаляются давно не использованные файлы.
+
+    Файл, возвращённый :meth:`fetch`, закреплён и не удаляется из кэша, пока
+    вызывающий код не вызовет :meth:`release`.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path,
+        pool: ConnectionPool,
+        *,
+        token: Optional[str] = None,
+        max_cache_bytes: int = 2 * 1024**3,
+        segment_size: int = 16 * 1024 * 1024,
+        max_segments: int = 4,
+        digest_buffer_bytes: int = _DIGEST_BUFFER_BYTES,
+    ) -> None:
+        self._cache_dir = cache_dir
+        self._pool = pool
+        self._token = token
+        self._max_cache_bytes = max_cache_bytes
+        self._segment_size = segment_size
+        self._max_segments = max_segments
+        self._digest_buffer_bytes = digest_buffer_bytes
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self._pins: Dict[str, int] = {}
+
+    @staticmethod
+    def cache_key(asset: dict) -> str:
+        """Ключ по данным, которые одинаково отдают REST и GraphQL.
+
+        ``id`` ассета есть только в REST, поэтому ключ строится по SHA-256 из
+        ``digest``, а без него — по ссылке на скачивание, размеру и времени
+        последнего изменения ассета.
+        """
+
+        digest = expected_sha256(asset)
+        if digest:
+            identity = f"sha256:{digest}"
+        else:
+            identity = f"{asset.get('browser_download_url', '')}:{asset.get('size', '')}:{asset.get('updated_at', '')}"
+        return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _pin(self, key: str) -> None:
+        with self._locks_guard:
+            self._pins[key] = self._pins.get(key, 0) + 1
+
+    def _pinned(self, key: str) -> bool:
+        with self._locks_guard:
+            return bool(self._pins.get(key))
+
+    def release(self, blob: CachedBlob) -> None:
+        """Снимает закрепление файла, полученного из :meth:`fetch`."""
+
+        key = blob.path.parent.name
+        with self._locks_guard:
+            count = self._pins.get(key, 0) - 1
+            if count > 0:
+                self._pins[key] = count
+            else:
+                self._pins.pop(key, None)
+
+    def _headers(self, extra: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        headers = {"User-Agent": "mobaxterm-plugin-updater", "Accept": "application/octet-stream"}
+        if self._token:
+            headers["Authorization"] = f"Bearer {self._token}"
+        if extra:
+            headers.update(extra)
+        return headers
+
+    def _entry_dir(self, asset: dict) -> Path:
+        return self._cache_dir / self.cache_key(asset)
+
+    @staticmethod
+    def _blob_name(asset: dict, url: str) -> str:
+        return Path(asset.get("name") or url.rsplit("/", 1)[-1]).name or "asset"
+
+    def lookup(self, asset: dict) -> Optional[CachedBlob]:
+        """Возвращает ассет из кэша, не обращаясь к сети."""
+
+        entry_dir = self._entry_dir(asset)
+        try:
+            meta = json.loads((entry_dir / "meta.json").read_text(encoding="utf-8"))
+            blob_path = entry_dir / meta["name"]
+            if meta.get("size") != blob_path.stat().st_size:
+                return None
+        except (OSError, ValueError, KeyError):
+            return None
+        digests = {"sha256": meta["sha256"], **meta.get("digests", {})}
+        return CachedBlob(path=blob_path, size=meta["size"], sha256=meta["sha256"], digests=digests)
+
+    def fetch(self, asset: dict, expected: Optional[Mapping[str, str]] = None) -> CachedBlob:
+        """Возвращает путь к проверенному ассету, скачивая его при необходимости.
+
+        ``expected`` — ожидаемые контрольные суммы по алгоритмам (например, из
+        файла ``checksums.txt`` релиза) в дополнение к ``digest`` ассета.
+        Контрольные суммы считаются по потоку во время скачивания; файл с
+        несовпадающей суммой не попадает в кэш. Возвращённый файл закреплён
+        в кэше до вызова :meth:`release`.
+        """
+
+        url = asset.get("browser_download_url")
+        if not url:
+            raise DownloadError("У релиза отсутствует ссылка на скачивание бинарника")
+        expected = dict(expected or {})
+        api_digest = expected_sha256(asset)
+        if api_digest:
+            expected.setdefault("sha256", api_digest)
+        key = self.cache_key(asset)
+        with self._key_lock(key):
+            cached = self.lookup(asset)
+            if cached:
+                try:
+                    cached = self._complete_digests(cached, expected)
+                    _verify(url, cached.digests, expected)
+                except DownloadError as error:
+                    if self._pinned(key):
+                        # Файл читает другой поток, удалять его нельзя.
+                        raise
+                    LOGGER.warning("Ассет %s в кэше не прошёл проверку и будет скачан заново: %s", url, error)
+                    _remove_entry(cached.path.parent)
+                    cached = None
+            if cached:
+                LOGGER.info("Ассет %s взят из кэша", asset.get("name", url))
+                metrics.active().inc("download_cache_hits_total")
+                os.utime(cached.path.parent / "meta.json")
+                self._pin(key)
+                return cached
+            metrics.active().inc("download_cache_misses_total")
+            blob = self._download(url, asset, expected)
+            self._pin(key)
+        self._evict()
+        return blob
+
+    def _complete_digests(self, blob: CachedBlob, expected: Mapping[str, str]) -> CachedBlob:
+        """Досчитывает суммы по алгоритмам, которых ещё нет в метаданных кэша."""
+
+        missing = [algorithm for algorithm in expected if algorithm not in blob.digests]
+        if not missing:
+            return blob
+        digest = _OrderedDigest(blob.path, algorithms=missing, on_disk=[(0, blob.size)])
+        blob.digests.update(digest.hexdigests(blob.size))
+        _write_meta(blob.path.parent, blob)
+        return blob
+
+    def _download(self, url: str, asset: dict, expected: Mapping[str, str]) -> CachedBlob:
+        entry_dir = self._entry_dir(asset)
+        entry_dir.mkdir(parents=True, exist_ok=True)
+        blob_name = self._blob_name(asset, url)
+        blob_path = entry_dir / blob_name
+        part_path = entry_dir / "blob.part"
+        progress_path = entry_dir / "blob.progress"
+
+        expected_size = asset.get("size")
+        size, ranges_supported = self._probe(url, expected_size)
+        if expected_size is not None and size is not None and size != expected_size:
+            raise DownloadError(f"Размер {url} ({size}) не совпадает с заявленным ({expected_size})")
+
+        LOGGER.info("Загрузка %s", url)
+        if size is None or not ranges_supported:
+            digests = self._download_stream(url, part_path, expected)
+            size = part_path.stat().st_size
+        else:
+            digests = self._download_segments(url, part_path, progress_path, size, expected)
+
+        actual_size = part_path.stat().st_size
+        if size is not None and actual_size != size:
+            raise DownloadError(f"Файл {url} скачан не полностью: {actual_size} из {size} байт")
+        try:
+            _verify(url, digests, expected)
+        except DownloadError:
+            part_path.unlink(missing_ok=True)
+            progress_path.unlink(missing_ok=True)
+            raise
+
+        os.replace(part_path, blob_path)
+        progress_path.unlink(missing_ok=True)
+        blob = CachedBlob(path=blob_path, size=actual_size, sha256=digests["sha256"], digests=digests)
+        _write_meta(entry_dir, blob, url=url)
+        return blob
+
+    def _probe(self, url: str, expected_size: Optional[int]) -> Tuple[Optional[int], bool]:
+        if expected_size is not None and expected_size < self._segment_size:
+            return expected_size, False
+        with self._pool.request("GET", url, headers=self._headers({"Range": "bytes=0-0"})) as response:
+            response.read()
+            if response.status == 206:
+                total = response.headers.get("Content-Range", "").rpartition("/")[2]
+                return (int(total) if total.isdigit() else expected_size), True
+            if response.status >= 400:
+                raise DownloadError(f"Не удалось скачать файл {url}: HTTP Error {response.status}")
+            length = response.headers.get("Content-Length")
+            return (int(length) if length and length.isdigit() else expected_size), False
+
+    def _download_stream(self, url: str, part_path: Path, algorithms: Iterable[str]) -> Dict[str, str]:
+        offset = part_path.stat().st_size if part_path.exists() else 0
+        headers = self._headers({"Range": f"bytes={offset}-"} if offset else None)
+        with self._pool.request("GET", url, headers=headers) as response:
+            if response.status == 416:
+                response.read()
+                return _OrderedDigest(part_path, algorithms, on_disk=[(0, offset)]).hexdigests(offset)
+            if response.status >= 400:
+                raise DownloadError(f"Не удалось скачать файл {url}: HTTP Error {response.status}")
+            if response.status != 206:
+                offset = 0
+            digest = _OrderedDigest(part_path, algorithms, on_disk=[(0, offset)])
+            with part_path.open("r+b" if offset else "wb") as output:
+                output.seek(offset)
+                position = offset
+                while True:
+                    chunk = response.read(_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    output.write(chunk)
+                    digest.feed(position, chunk)
+                    position += len(chunk)
+        metrics.active().inc("download_bytes_total", position - offset)
+        return digest.hexdigests(position)
+
+    def _download_segments(
+        self,
+        url: str,
+        part_path: Path,
+        progress_path: Path,
+        size: int,
+        algorithms: Iterable[str],
+    ) -> Dict[str, str]:
+        segments = _split(size, max(self._segment_size, -(-size // self._max_segments)))
+        progress = _load_progress(progress_path, segments)
+        if not part_path.exists() or part_path.stat().st_size != size:
+            progress = [0] * len(segments)
+            with part_path.open("wb") as output:
+                output.truncate(size)
+        digest = _OrderedDigest(
+            part_path,
+            algorithms,
+            on_disk=[(start, start + done) for (start, _), done in zip(segments, progress)],
+            buffer_limit=self._digest_buffer_bytes,
+        )
+        lock = threading.Lock()
+        flushed = [sum(progress)]
+
+        def save_progress(force: bool = False) -> None:
+            with lock:
+                done = sum(progress)
+                if force or done - flushed[0] >= _PROGRESS_FLUSH_BYTES:
+                    progress_path.write_text(json.dumps({"segments": segments, "done": progress}), encoding="utf-8")
+                    flushed[0] = done
+
+        def fetch_segment(index: int) -> None:
+            start, end = segments[index]
+            position = start + progress[index]
+            if position > end:
+                return
+            resumed_at = position
+            headers = self._headers({"Range": f"bytes={position}-{end}"})
+            try:
+                with self._pool.request("GET", url, headers=headers) as response, part_path.open("r+b") as output:
+                    if response.status != 206:
+                        raise DownloadError(f"Сервер не поддержал докачку {url}: HTTP Error {response.status}")
+                    output.seek(position)
+                    while position <= end:
+                        chunk = response.read(min(_CHUNK_SIZE, end + 1 - position))
+                        if not chunk:
+                            break
+                        output.write(chunk)
+                        digest.feed(position, chunk)
+                        position += len(chunk)
+                        progress[index] = position - start
+                        save_progress()
+                if position <= end:
+                    raise DownloadError(f"Загрузка сегмента {start}-{end} файла {url} прервана")
+            except BaseException:
+                digest.abort()
+                raise
+            finally:
+                metrics.active().inc("download_bytes_total", position - resumed_at)
+
+        try:
+            with ThreadPoolExecutor(max_workers=len(segments)) as executor:
+                list(executor.map(fetch_segment, range(len(segments))))
+        finally:
+            save_progress(force=True)
+        return digest.hexdigests(size)
+
+    def _evict(self) -> None:
+        entries: List[Tuple[float, int, Path]] = []
+        total = 0
+        for meta_path in self._cache_dir.glob("*/meta.json"):
+            try:
+                last_used = meta_path.stat().st_mtime
+                size = sum(item.stat().st_size for item in meta_path.parent.iterdir())
+            except FileNotFoundError:
+                continue
+            entries.append((last_used, size, meta_path.parent))
+            total += size
+        for _, size, entry_dir in sorted(entries):
+            if total <= self._max_cache_bytes:
+                break
+            # Блокировка ключа не даёт другому потоку в это время взять файл
+            # из кэша; занятые и закреплённые записи пропускаются.
+            lock = self._key_lock(entry_dir.name)
+            if not lock.acquire(blocking=False):
+                continue
+            try:
+                if self._pinned(entry_dir.name):
+                    continue
+                LOGGER.debug("Удаление из кэша %s", entry_dir)
+                _remove_entry(entry_dir)
+                total -= size
+            finally:
+                lock.release()
+
+
+def _remove_entry(entry_dir: Path) -> None:
+    import shutil
+
+    shutil.rmtree(entry_dir, ignore_errors=True)
+
+
+def _split(size: int, segment_size: int) -> List[Tuple[int, int]]:
+    return [(start, min(start + segment_size, size) - 1) for start in range(0, size, segment_size)]
+
+
+def _load_progress(progress_path: Path, segments: List[Tuple[int, int]]) -> List[int]:
+    try:
+        raw = json.loads(progress_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return [0] * len(segments)
+    if [tuple(item) for item in raw.get("segments", [])] != segments:
+        return [0] * len(segments)
+    return [int(value) for value in raw.get("done", [])]
+
+
+def _verify(url: str, digests: Mapping[str, str], expected: Mapping[str, str]) -> None:
+    for algorithm, value in expected.items():
+        actual = digests.get(algorithm)
+        if actual is not None and actual != value.lower():
+            raise DownloadError(f"Контрольная сумма {algorithm} {url} не совпадает: {actual} != {value.lower()}")
+
+
+def _write_meta(entry_dir: Path, blob: CachedBlob, url: Optional[str] = None) -> None:
+    meta_path = entry_dir / "meta.json"
+    if url is None:
+        url = json.loads(meta_path.read_text(encoding="utf-8")).get("url")
+    meta = {"url": url, "name": blob.path.name, "size": blob.size, "sha256": blob.sha256, "digests": blob.digests}
+    meta_path.write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+
+
+def expected_sha256(asset: dict) -> Optional[str]:
+    """SHA-256 ассета из поля ``digest`` ответа GitHub, если оно есть."""
+
+    digest = asset.get("digest") or ""
+    algorithm, _, value = digest.partition(":")
+    return value.lower() if algorithm == "sha256" and value else None
@@ -0,0 +1,508 @@
+"""Локальный сервер, имитирующий GitHub API для тестов и замеров производительности."""
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, quote, urlsplit
+from zipfile import ZIP_DEFLATED, ZipFile, ZipInfo
+
+LOGGER = logging.getLogger(__name__)
+
+_RANGE_PATTERN = re.compile(r"bytes=(\d*)-(\d*)$")
+
+
+@dataclass
+class FakeAsset:
+    """Ассет релиза. Содержимое либо генерируется (zip с бинарником), либо загружено клиентом."""
+
+    id: int
+    name: str
+    size: int = 0
+    sha256: str = ""
+    path: Optional[Path] = None
+    updated_at: str = field(default_factory=lambda: time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()))
+
+
+@dataclass
+class FakeRelease:
+    id: int
+    owner: str
+    repo: str
+    tag_name: str
+    target_commitish: str = "main"
+    draft: bool = False
+    prerelease: bool = False
+    name: str = ""
+    body: str = ""
+    created_at: float = field(default_factory=time.time)
+    assets: List[FakeAsset] = field(default_factory=list)
+
+
+@dataclass
+class FakeGitHubStats:
+    """Счётчики запросов и переданных байт."""
+
+    requests: Counter = field(default_factory=Counter)
+    statuses: Counter = field(default_factory=Counter)
+    bytes_sent: int = 0
+    bytes_received: int = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": dict(self.requests),
+            "statuses": {str(status): count for status, count in self.statuses.items()},
+            "total_requests": sum(self.requests.values()),
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+        }
+
+
+def _synthetic_binary(seed: str, size: int) -> bytes:
+    """Детерминированные данные, сжимающиеся примерно как исполняемый файл."""
+
+    generator = random.Random(seed)
+    blocks = []
+    for _ in range(size // 8192 + 1):
+        blocks.append(generator.getrandbits(4096 * 8).to_bytes(4096, "little"))
+        blocks.append(bytes(4096))
+    return b"".join(blocks)[:size]
+
+
+class FakeGitHub:
+    """Имитация GitHub API: релизы, загрузка ассетов, скачивание с Range и GraphQL.
+
+    Поддерживаются задержка ответов, заголовки лимитов ``X-RateLimit-*`` с
+    ответом 403 при исчерпании лимита и синтетические бинарники заданного
+    размера. Сервер запускается в фоновом потоке::
+
+        with FakeGitHub(data_dir) as server:
+            server.add_release("owner", "repo", "v1.0.0", {"tool-win64.zip": "tool.exe"})
+            api = GitHubAPI(api_url=server.url)
+    """
+
+    def __init__(
+        self,
+        data_dir: Path,
+        *,
+        latency: float = 0.0,
+        rate_limit: int = 5000,
+        binary_size: int = 1024 * 1024,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        self.data_dir = data_dir
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.binary_size = binary_size
+        self.stats = FakeGitHubStats()
+        self._remaining = rate_limit
+        self._reset_at = int(time.time()) + 3600
+        self._releases: List[FakeRelease] = []
+        self._ids = iter(range(1, 1 << 31))
+        self._lock = threading.RLock()
+        self._server = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+        data_dir.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.socket.getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeGitHub":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-github", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeGitHub":
+        return self.start()
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.stop()
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.stats = FakeGitHubStats()
+
+    def add_release(
+        self,
+        owner: str,
+        repo: str,
+        tag_name: str,
+        assets: Dict[str, str],
+        *,
+        target_commitish: str = "main",
+        prerelease: bool = False,
+        binary_size: Optional[int] = None,
+        checksum_file: Optional[str] = None,
+    ) -> FakeRelease:
+        """Добавляет релиз исходного проекта; ``assets`` задаёт ``имя zip -> имя бинарника внутри``.
+
+        Если указан ``checksum_file``, в релиз добавляется файл контрольных сумм
+        SHA-256 в формате ``sha256sum`` с этим именем.
+        """
+
+        with self._lock:
+            release = FakeRelease(
+                id=next(self._ids),
+                owner=owner,
+                repo=repo,
+                tag_name=tag_name,
+                target_commitish=target_commitish,
+                prerelease=prerelease,
+            )
+            for asset_name, member in assets.items():
+                release.assets.append(
+                    self._generate_asset(release, asset_name, member, binary_size or self.binary_size)
+                )
+            if checksum_file:
+                lines = "".join(f"{asset.sha256}  {asset.name}\n" for asset in release.assets)
+                release.assets.append(self._store_asset(checksum_file, lines.encode("utf-8")))
+            self._releases.append(release)
+            return release
+
+    def _generate_asset(self, release: FakeRelease, asset_name: str, member: str, size: int) -> FakeAsset:
+        asset_id = next(self._ids)
+        buffer = io.BytesIO()
+        with ZipFile(buffer, "w", compression=ZIP_DEFLATED) as archive:
+            info = ZipInfo(member, date_time=(2020, 1, 1, 0, 0, 0))
+            info.compress_type = ZIP_DEFLATED
+            archive.writestr(info, _synthetic_binary(f"{release.owner}/{release.repo}/{member}", size))
+        return self._store_asset(asset_name, buffer.getvalue(), asset_id)
+
+    def _store_asset(self, asset_name: str, payload: bytes, asset_id: Optional[int] = None) -> FakeAsset:
+        asset_id = asset_id or next(self._ids)
+        path = self.data_dir / f"{asset_id}-{asset_name}"
+        path.write_bytes(payload)
+        return FakeAsset(
+            id=asset_id,
+            name=asset_name,
+            size=len(payload),
+            sha256=hashlib.sha256(payload).hexdigest(),
+            path=path,
+        )
+
+    # --- представление объектов в формате REST API -------------------------------------------
+
+    def _asset_json(self, release: FakeRelease, asset: FakeAsset) -> Dict[str, Any]:
+        download = f"{self.url}/download/{release.owner}/{release.repo}/{quote(release.tag_name)}/{quote(asset.name)}"
+        return {
+            "id": asset.id,
+            "name": asset.name,
+            "size": asset.size,
+            "digest": f"sha256:{asset.sha256}" if asset.sha256 else None,
+            "updated_at": asset.updated_at,
+            "url": f"{self.url}/repos/{release.owner}/{release.repo}/releases/assets/{asset.id}",
+            "browser_download_url": download,
+            "content_type": "application/zip",
+        }
+
+    def _release_json(self, release: FakeRelease) -> Dict[str, Any]:
+        base = f"{self.url}/repos/{release.owner}/{release.repo}/releases/{release.id}"
+        return {
+            "id": release.id,
+            "tag_name": release.tag_name,
+            "target_commitish": release.target_commitish,
+            "name": release.name or release.tag_name,
+            "body": release.body,
+            "draft": release.draft,
+            "prerelease": release.prerelease,
+            "html_url": f"{self.url}/{release.owner}/{release.repo}/releases/tag/{quote(release.tag_name)}",
+            "url": base,
+            "upload_url": f"{self.url}/uploads/repos/{release.owner}/{release.repo}/releases/{release.id}/assets"
+            "{?name,label}",
+            "assets": [self._asset_json(release, asset) for asset in release.assets],
+        }
+
+    def _repo_releases(self, owner: str, repo: str) -> List[FakeRelease]:
+        releases = [item for item in self._releases if item.owner == owner and item.repo == repo]
+        return sorted(releases, key=lambda item: (item.created_at, item.id), reverse=True)
+
+    def _find_release(self, owner: str, repo: str, release_id: int) -> Optional[FakeRelease]:
+        for release in self._releases:
+            if release.owner == owner and release.repo == repo and release.id == release_id:
+                return release
+        return None
+
+    def _find_asset(self, asset_id: int) -> Tuple[Optional[FakeRelease], Optional[FakeAsset]]:
+        for release in self._releases:
+            for asset in release.assets:
+                if asset.id == asset_id:
+                    return release, asset
+        return None, None
+
+    # --- обработка запросов -------------------------------------------------------------------
+
+    def _consume_budget(self) -> Optional[Dict[str, str]]:
+        with self._lock:
+            if self._remaining <= 0:
+                return None
+            self._remaining -= 1
+            return self._rate_headers()
+
+    def _rate_headers(self) -> Dict[str, str]:
+        return {
+            "X-RateLimit-Limit": str(self.rate_limit),
+            "X-RateLimit-Remaining": str(self._remaining),
+            "X-RateLimit-Reset": str(self._reset_at),
+            "X-RateLimit-Resource": "core",
+        }
+
+    def handle_api(self, method: str, path: str, query: Dict[str, List[str]], body: bytes, headers: Any):
+        """Возвращает (статус, заголовки, тело) для запроса к API."""
+
+        parts = [part for part in path.split("/") if part]
+        with self._lock:
+            if method == "POST" and parts == ["graphql"]:
+                return self._graphql(json.loads(body or b"{}"))
+            if len(parts) >= 4 and parts[0] == "repos" and parts[3] == "releases":
+                owner, repo, rest = parts[1], parts[2], parts[4:]
+                if method == "GET" and not rest:
+                    return self._list_releases(owner, repo, query, headers)
+                if method == "POST" and not rest:
+                    return self._create_release(owner, repo, json.loads(body or b"{}"))
+                if method == "GET" and len(rest) == 2 and rest[0] == "tags":
+                    release = next((r for r in self._repo_releases(owner, repo) if r.tag_name == rest[1]), None)
+                    return (200, {}, self._release_json(release)) if release else _not_found()
+                if method == "GET" and len(rest) == 2 and rest[1] == "assets" and rest[0].isdigit():
+                    release = self._find_release(owner, repo, int(rest[0]))
+                    if not release:
+                        return _not_found()
+                    return 200, {}, [self._asset_json(release, asset) for asset in release.assets]
+                if method == "DELETE" and len(rest) == 2 and rest[0] == "assets" and rest[1].isdigit():
+                    release, asset = self._find_asset(int(rest[1]))
+                    if not release or not asset:
+                        return _not_found()
+                    release.assets.remove(asset)
+                    return 204, {}, None
+        return _not_found()
+
+    def _list_releases(self, owner: str, repo: str, query: Dict[str, List[str]], headers: Any):
+        per_page = int(query.get("per_page", ["30"])[0])
+        page = int(query.get("page", ["1"])[0])
+        releases = self._repo_releases(owner, repo)
+        chunk = releases[(page - 1) * per_page : page * per_page]
+        payload = [self._release_json(release) for release in chunk]
+        response_headers: Dict[str, str] = {}
+        if page * per_page < len(releases):
+            next_url = f"{self.url}/repos/{owner}/{repo}/releases?per_page={per_page}&page={page + 1}"
+            response_headers["Link"] = f'<{next_url}>; rel="next"'
+        etag = '"' + hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()[:32] + '"'
+        response_headers["ETag"] = etag
+        if headers.get("If-None-Match") == etag:
+            return 304, response_headers, None
+        return 200, response_headers, payload
+
+    def _create_release(self, owner: str, repo: str, payload: Dict[str, Any]):
+        tag = payload.get("tag_name")
+        if not tag or any(r.tag_name == tag for r in self._repo_releases(owner, repo)):
+            return 422, {}, {"message": "Validation Failed"}
+        release = FakeRelease(
+            id=next(self._ids),
+            owner=owner,
+            repo=repo,
+            tag_name=tag,
+            target_commitish=payload.get("target_commitish", "main"),
+            name=payload.get("name", ""),
+            body=payload.get("body", ""),
+            draft=bool(payload.get("draft")),
+            prerelease=bool(payload.get("prerelease")),
+        )
+        self._releases.append(release)
+        return 201, {}, self._release_json(release)
+
+    def _graphql(self, payload: Dict[str, Any]):
+        variables = payload.get("variables") or {}
+        per_repo = int(variables.get("releases", 10))
+        data: Dict[str, Any] = {}
+        index = 0
+        while f"owner{index}" in variables:
+            releases = self._repo_releases(variables[f"owner{index}"], variables[f"name{index}"])[:per_repo]
+            data[f"r{index}"] = {
+                "releases": {
+                    "nodes": [
+                        {
+                            "tagName": release.tag_name,
+                            "isDraft": release.draft,
+                            "isPrerelease": release.prerelease,
+                            "url": self._release_json(release)["html_url"],
+                            "releaseAssets": {
+                                "nodes": [
+                                    {
+                                        "name": asset.name,
+                                        "size": asset.size,
+                                        "downloadUrl": self._asset_json(release, asset)["browser_download_url"],
+                                        "updatedAt": asset.updated_at,
+                                        "digest": f"sha256:{asset.sha256}" if asset.sha256 else None,
+                                    }
+                                    for asset in release.assets
+                                ]
+                            },
+                        }
+                        for release in releases
+                    ]
+                }
+            } if releases else None
+            index += 1
+        return 200, {"X-RateLimit-Resource": "graphql"}, {"data": data}
+
+    def store_upload(self, owner: str, repo: str, release_id: int, name: str, stream: Any, length: int):
+        with self._lock:
+            release = self._find_release(owner, repo, release_id)
+            if not release:
+                return _not_found()
+            if any(asset.name == name for asset in release.assets):
+                return 422, {}, {"message": "Validation Failed", "errors": [{"code": "already_exists"}]}
+        hasher = hashlib.sha256()
+        remaining = length
+        while remaining:
+            chunk = stream.read(min(1024 * 1024, remaining))
+            if not chunk:
+                break
+            hasher.update(chunk)
+            remaining -= len(chunk)
+        with self._lock:
+            self.stats.bytes_received += length - remaining
+            asset = FakeAsset(id=next(self._ids), name=name, size=length - remaining, sha256=hasher.hexdigest())
+            release.assets.append(asset)
+            return 201, {}, self._asset_json(release, asset)
+
+    def find_download(self, owner: str, repo: str, tag: str, name: str) -> Optional[FakeAsset]:
+        with self._lock:
+            for release in self._repo_releases(owner, repo):
+                if release.tag_name == tag:
+                    return next((asset for asset in release.assets if asset.name == name and asset.path), None)
+        return None
+
+
+def _not_found():
+    return 404, {}, {"message": "Not Found"}
+
+
+def _make_handler(server: FakeGitHub):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format: str, *args: Any) -> None:  # noqa: A002 - сигнатура BaseHTTPRequestHandler
+            LOGGER.debug("fake-github: " + format, *args)
+
+        def _send(self, status: int, headers: Dict[str, str], payload: Any, *, budget: bool = True) -> None:
+            body = b"" if payload is None else json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            if payload is not None:
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+            for key, value in headers.items():
+                self.send_header(key, value)
+            self.send_header("Content-Length", str(len(body)))
+            # Запрос учитывается до отправки ответа: клиент, дочитавший ответ, видит его в статистике.
+            self._account(status, len(body))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _account(self, status: int, sent: int) -> None:
+            route = urlsplit(self.path).path.split("/")[1] if self.path.count("/") else self.path
+            with server._lock:  # noqa: SLF001 - обработчик является частью сервера
+                server.stats.requests[f"{self.command} /{route}"] += 1
+                server.stats.statuses[status] += 1
+                server.stats.bytes_sent += sent
+
+        def _dispatch(self) -> None:
+            if server.latency:
+                time.sleep(server.latency)
+            parts = urlsplit(self.path)
+            query = parse_qs(parts.query)
+            if parts.path == "/_stats":
+                self._send(200, {}, server.stats.as_dict())
+                return
+            if self.command == "GET" and parts.path.startswith("/download/"):
+                self._download(parts.path)
+                return
+
+            length = int(self.headers.get("Content-Length") or 0)
+            if self.command == "POST" and parts.path.startswith("/uploads/"):
+                rate = server._consume_budget()  # noqa: SLF001
+                if rate is None:
+                    self.rfile.read(length)
+                    self._send(403, server._rate_headers(), {"message": "API rate limit exceeded"})  # noqa: SLF001
+                    return
+                segments = [segment for segment in parts.path.split("/") if segment]
+                status, headers, payload = server.store_upload(
+                    segments[2], segments[3], int(segments[5]), query.get("name", [""])[0], self.rfile, length
+                )
+                self._send(status, {**rate, **headers}, payload)
+                return
+
+            body = self.rfile.read(length) if length else b""
+            rate = server._consume_budget()  # noqa: SLF001
+            if rate is None:
+                self._send(403, server._rate_headers(), {"message": "API rate limit exceeded"})  # noqa: SLF001
+                return
+            status, headers, payload = server.handle_api(self.command, parts.path, query, body, self.headers)
+            if status == 304:
+                with server._lock:  # noqa: SLF001
+                    server._remaining += 1  # noqa: SLF001 - GitHub не учитывает 304 в лимите
+                    rate = server._rate_headers()  # noqa: SLF001
+            self._send(status, {**rate, **headers}, payload)
+
+        def _download(self, path: str) -> None:
+            segments = [segment for segment in path.split("/") if segment]
+            asset = server.find_download(*segments[1:5]) if len(segments) == 5 else None
+            if asset is None or asset.path is None:
+                self._send(404, {}, {"message": "Not Found"})
+                return
+            size = asset.size
+            start, end, status = 0, size - 1, 200
+            match = _RANGE_PATTERN.match(self.headers.get("Range", ""))
+            if match and (match.group(1) or match.group(2)):
+                if match.group(1):
+                    start = int(match.group(1))
+                    end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+                else:
+                    start = max(0, size - int(match.group(2)))
+                if start >= size:
+                    self.send_response(416)
+                    self.send_header("Content-Range", f"bytes */{size}")
+                    self.send_header("Content-Length", "0")
+                    self._account(416, 0)
+                    self.end_headers()
+                    return
+                status = 206
+            self.send_response(status)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Accept-Ranges", "bytes")
+            if status == 206:
+                self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            self.send_header("Content-Length", str(end - start + 1))
+            self._account(status, end - start + 1)
+            self.end_headers()
+            with asset.path.open("rb") as stream:
+                stream.seek(start)
+                remaining = end - start + 1
+                while remaining:
+                    chunk = stream.read(min(1024 * 1024, remaining))
+                    if not chunk:
+                        break
+                    self.wfile.write(chunk)
+                    remaining -= len(chunk)
+
+        do_GET = _dispatch
+        do_POST = _dispatch
+        do_DELETE = _dispatch
+
+    return Handler
@@ -0,0 +1,225 @@
+"""Чтение метаданных git-репозитория без запуска процесса ``git``.
+
+Поддерживаются обычные репозитории, рабочие деревья (``git worktree``), у
+которых ``.git`` — файл со ссылкой ``gitdir:``, и упакованные ссылки
+``packed-refs``. Прочитанные файлы кэшируются и перечитываются только при
+изменении времени модификации или размера. Если метаданные прочитать не
+удалось (нестандартная конфигурация, ``include`` и т. п.), вызывающий код
+должен обратиться к ``git`` напрямую.
+"""
+from __future__ import annotations
+
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+_SECTION_PATTERN = re.compile(r'\[\s*([A-Za-z0-9.-]+)(?:\s+"((?:[^"\\]|\\.)*)")?\s*\]')
+_SHA_PATTERN = re.compile(r"[0-9a-f]{40}(?:[0-9a-f]{24})?$")
+
+ConfigData = Dict[Tuple[str, Optional[str]], Dict[str, str]]
+
+
+class GitMetadataError(RuntimeError):
+    """Метаданные репозитория не удалось прочитать без git."""
+
+
+class _FileCache:
+    """Кэш разобранных файлов с проверкой времени модификации и размера."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[Path, str], Tuple[int, int, Any]] = {}
+
+    def load(self, path: Path, parser: Callable[[str], Any]) -> Any:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        key = (path, parser.__name__)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+                return cached[2]
+        value = parser(path.read_text(encoding="utf-8", errors="surrogateescape"))
+        with self._lock:
+            self._entries[key] = (stat.st_mtime_ns, stat.st_size, value)
+        return value
+
+
+_CACHE = _FileCache()
+
+
+def _unquote(value: str) -> str:
+    result = []
+    quoted = False
+    index = 0
+    while index < len(value):
+        char = value[index]
+        if char == '"':
+            quoted = not quoted
+        elif char == "\\" and index + 1 < len(value):
+            index += 1
+            result.append({"n": "\n", "t": "\t", "b": "\b"}.get(value[index], value[index]))
+        elif char in "#;" and not quoted:
+            break
+        else:
+            result.append(char)
+        index += 1
+    return "".join(result).strip()
+
+
+def parse_config(text: str) -> ConfigData:
+    """Разбирает файл конфигурации git в словарь ``(секция, подсекция) -> {ключ: значение}``.
+
+    Имена секций и ключей приводятся к нижнему регистру, подсекции сохраняют
+    регистр, как в самом git. Для повторяющихся ключей остаётся последнее значение.
+    """
+
+    data: ConfigData = {}
+    section: Optional[Dict[str, str]] = None
+    for raw_line in text.splitlines():
+        line = raw_line.strip()
+        if not line or line[0] in "#;":
+            continue
+        if line.startswith("["):
+            match = _SECTION_PATTERN.match(line)
+            if not match:
+                raise GitMetadataError(f"Не удалось разобрать секцию конфигурации git: {line}")
+            name, subsection = match.group(1).lower(), match.group(2)
+            if subsection is None and "." in name:
+                # Устаревшая запись вида [remote.origin].
+                name, _, subsection = name.partition(".")
+            elif subsection is not None:
+                subsection = re.sub(r"\\(.)", r"\1", subsection)
+            if name == "include" or name == "includeif":
+                raise GitMetadataError("Конфигурация git использует include, требуется git")
+            section = data.setdefault((name, subsection), {})
+            line = line[match.end() :].strip()
+            if not line:
+                continue
+        if section is None:
+            raise GitMetadataError("Параметр конфигурации git вне секции")
+        key, separator, value = line.partition("=")
+        section[key.strip().lower()] = _unquote(value) if separator else "true"
+    return data
+
+
+def parse_packed_refs(text: str) -> Dict[str, str]:
+    refs: Dict[str, str] = {}
+    for line in text.splitlines():
+        if not line or line[0] in "#^":
+            continue
+        sha, _, ref = line.partition(" ")
+        refs[ref.strip()] = sha
+    return refs
+
+
+def _first_line(text: str) -> str:
+    return text.strip()
+
+
+def _read_line(path: Path) -> Optional[str]:
+    return _CACHE.load(path, _first_line)
+
+
+class GitRepository:
+    """Метаданные репозитория: текущая ветка, коммит HEAD и параметры конфигурации."""
+
+    def __init__(self, git_dir: Path, common_dir: Optional[Path] = None) -> None:
+        self.git_dir = git_dir
+        self.common_dir = common_dir or git_dir
+
+    @classmethod
+    def discover(cls, start: Optional[Path] = None) -> "GitRepository":
+        """Находит репозиторий, содержащий каталог ``start`` (по умолчанию текущий)."""
+
+        env_dir = os.getenv("GIT_DIR")
+        if env_dir:
+            return cls._from_git_dir(Path(env_dir).resolve())
+        current = (start or Path.cwd()).resolve()
+        for directory in (current, *current.parents):
+            dot_git = directory / ".git"
+            if dot_git.is_dir():
+                return cls._from_git_dir(dot_git)
+            if dot_git.is_file():
+                pointer = _read_line(dot_git) or ""
+                if not pointer.startswith("gitdir:"):
+                    raise GitMetadataError(f"Не удалось разобрать {dot_git}")
+                git_dir = Path(pointer[len("gitdir:") :].strip())
+                return cls._from_git_dir((directory / git_dir).resolve())
+        raise GitMetadataError(f"Каталог {current} не находится внутри git-репозитория")
+
+    @classmethod
+    def _from_git_dir(cls, git_dir: Path) -> "GitRepository":
+        if not (git_dir / "HEAD").is_file():
+            raise GitMetadataError(f"{git_dir} не является каталогом git")
+        common = _read_line(git_dir / "commondir")
+        return cls(git_dir, (git_dir / common).resolve() if common else git_dir)
+
+    def head(self) -> str:
+        value = _read_line(self.git_dir / "HEAD")
+        if not value:
+            raise GitMetadataError(f"Не удалось прочитать {self.git_dir / 'HEAD'}")
+        return value
+
+    def current_branch(self) -> str:
+        """Имя текущей ветки или ``HEAD`` в отсоединённом состоянии, как ``git rev-parse --abbrev-ref HEAD``."""
+
+        head = self.head()
+        if head.startswith("ref:"):
+            ref = head[len("ref:") :].strip()
+            return ref[len("refs/heads/") :] if ref.startswith("refs/heads/") else ref
+        return "HEAD"
+
+    def resolve_ref(self, ref: str) -> str:
+        """Возвращает хэш коммита ссылки, учитывая ``packed-refs``."""
+
+        for _ in range(10):
+            if _SHA_PATTERN.match(ref):
+                return ref
+            base = self.git_dir if ref == "HEAD" or not ref.startswith("refs/") else self.common_dir
+            value = _read_line(base / ref)
+            if value is None and base is not self.common_dir:
+                value = _read_line(self.common_dir / ref)
+            if value is None:
+                packed = _CACHE.load(self.common_dir / "packed-refs", parse_packed_refs) or {}
+                value = packed.get(ref)
+            if value is None:
+                raise GitMetadataError(f"Ссылка {ref} не найдена")
+            ref = value[len("ref:") :].strip() if value.startswith("ref:") else value
+        raise GitMetadataError(f"Слишком длинная цепочка символических ссылок {ref}")
+
+    def head_commit(self) -> str:
+        return self.resolve_ref("HEAD")
+
+    def config(self) -> ConfigData:
+        data = _CACHE.load(self.common_dir / "config", parse_config)
+        if data is None:
+            raise GitMetadataError(f"Не найден файл конфигурации {self.common_dir / 'config'}")
+        return data
+
+    def get_config(self, section: str, subsection: Optional[str], key: str) -> Optional[str]:
+        return self.config().get((section.lower(), subsection), {}).get(key.lower())
+
+    def remote_url(self, name: str = "origin") -> Optional[str]:
+        return self.get_config("remote", name, "url")
+
+
+_REPOSITORIES: Dict[Path, GitRepository] = {}
+_REPOSITORIES_LOCK = threading.Lock()
+
+
+def repository(start: Optional[Path] = None) -> GitRepository:
+    """Репозиторий для каталога ``start``; результат поиска кэшируется на время жизни процесса."""
+
+    key = (start or Path.cwd()).resolve()
+    with _REPOSITORIES_LOCK:
+        cached = _REPOSITORIES.get(key)
+    if cached is not None:
+        return cached
+    found = GitRepository.discover(key)
+    with _REPOSITORIES_LOCK:
+        _REPOSITORIES[key] = found
+    return found
@@ -3,15 +3,23 @@ from __future__ import annotations
 
 import json
 import logging
+import re
+import time
 from dataclasses import dataclass
-from typing import Any, Dict, Optional
-from urllib.error import HTTPError
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional
 from urllib.parse import urlencode, urljoin
-from urllib.request import Request, urlopen
 
+from . import metrics
+from .http_cache import CachedResponse, ResponseCache
+from .http_pool import Body, ConnectionPool, default_pool
+from .rate_limit import RateLimitBudget, RateLimitExceeded, RateLimitScheduler, scheduler_for
 
 LOGGER = logging.getLogger(__name__)
 
+ProgressCallback = Callable[[int, int], None]
+_LINK_PATTERN = re.compile(r'<(?P<url>[^>]+)>\s*;\s*rel="(?P<rel>[^"]+)"')
+
 
 @dataclass
 class GitHubAPIError(RuntimeError):
@@ -25,12 +33,75 @@ class GitHubAPIError(RuntimeError):
         return f"GitHub API error {self.status}: {self.message}"
 
 
+def parse_link_header(value: Optional[str]) -> Dict[str, str]:
+    """Разбирает заголовок Link в словарь ``rel -> url``."""
+
+    links: Dict[str, str] = {}
+    for part in (value or "").split(","):
+        match = _LINK_PATTERN.search(part)
+        if match:
+            links[match.group("rel")] = match.group("url")
+    return links
+
+
+class _ProgressReader:
+    """Обёртка над файлом, сообщающая о количестве отправленных байт."""
+
+    def __init__(self, stream: BinaryIO, total: int, callback: Optional[ProgressCallback]) -> None:
+        self._stream = stream
+        self._total = total
+        self._callback = callback
+        self._sent = 0
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self._stream.read(size)
+        if chunk and self._callback:
+            self._sent += len(chunk)
+            self._callback(self._sent, self._total)
+        return chunk
+
+    def tell(self) -> int:
+        return self._stream.tell()
+
+    def seek(self, offset: int) -> int:
+        self._sent = offset
+        return self._stream.seek(offset)
+
+
 class GitHubAPI:
     """Простой клиент GitHub API."""
 
-    def __init__(self, token: Optional[str] = None, api_url: str = "https://api.github.com") -> None:
+    def __init__(
+        self,
+        token: Optional[str] = None,
+        api_url: str = "https://api.github.com",
+        cache_dir: Optional[Path] = None,
+        pool: Optional[ConnectionPool] = None,
+        scheduler: Optional[RateLimitScheduler] = None,
+    ) -> None:
         self._token = token
         self._api_url = api_url.rstrip("/") + "/"
+        self._cache = ResponseCache(cache_dir) if cache_dir else None
+        self._pool = pool or default_pool()
+        self._scheduler = scheduler or scheduler_for(token)
+
+    @property
+    def pool(self) -> ConnectionPool:
+        """Пул соединений, общий для запросов к API и скачивания ассетов."""
+
+        return self._pool
+
+    @property
+    def rate_limit(self) -> RateLimitBudget:
+        """Текущий известный остаток лимита основного ресурса API."""
+
+        return self._scheduler.budget("core")
+
+    @property
+    def rate_limits(self) -> Dict[str, RateLimitBudget]:
+        """Известные остатки лимитов по всем ресурсам API."""
+
+        return self._scheduler.budgets()
 
     def _build_headers(self, extra: Optional[Dict[str, str]] = None) -> Dict[str, str]:
         headers = {
@@ -49,36 +120,138 @@ class GitHubAPI:
         path: str,
         *,
         params: Optional[Dict[str, Any]] = None,
-        data: Optional[bytes] = None,
+        data: Body = None,
         headers: Optional[Dict[str, str]] = None,
         raw_url: bool = False,
-    ) -> Dict[str, Any]:
+        links: Optional[Dict[str, str]] = None,
+    ) -> Any:
+        """Выполняет запрос и возвращает разобранный JSON (объект или массив).
+
+        Если передан ``links``, он заполняется ссылками из заголовка Link.
+        """
+
         url = path if raw_url else urljoin(self._api_url, path.lstrip("/"))
         if params:
             url += ("?" if "?" not in url else "&") + urlencode(params)
-        request = Request(url, data=data, method=method.upper())
-        for key, value in self._build_headers(headers).items():
-            request.add_header(key, value)
+        method = method.upper()
+        request_headers = self._build_headers(headers)
+        cached = self._cache.get(url) if self._cache and method == "GET" else None
+        if cached:
+            request_headers.update(cached.conditional_headers())
 
-        LOGGER.debug("GitHub API %s %s", method, url)
-        try:
-            with urlopen(request) as response:
+        body_start = data.tell() if data is not None and not isinstance(data, bytes) else None
+        attempt = 0
+        while True:
+            if body_start is not None:
+                data.seek(body_start)  # type: ignore[union-attr]
+            try:
+                self._scheduler.acquire("graphql" if path == "graphql" else "core")
+            except RateLimitExceeded as error:
+                raise GitHubAPIError(status=403, message=str(error)) from error
+            LOGGER.debug("GitHub API %s %s", method, url)
+            with self._pool.request(method, url, headers=request_headers, body=data) as response:
                 content_type = response.headers.get("Content-Type", "")
                 payload = response.read()
-                if content_type.startswith("application/json") or payload.startswith(b"{"):
-                    return json.loads(payload.decode("utf-8"))
-                return {"raw": payload}
-        except HTTPError as exc:
-            try:
-                error_body = exc.read().decode("utf-8")
-                parsed = json.loads(error_body) if error_body else {}
-            except Exception:  # noqa: BLE001 - хочется показать исходную ошибку
-                parsed = {}
-            raise GitHubAPIError(status=exc.code, message=str(exc), response=parsed) from exc
+                status = response.status
+                self._scheduler.update(response.headers)
+                if status == 304 and cached:
+                    metrics.active().inc("api_cache_hits_total")
+                    LOGGER.debug("GitHub API %s не изменился, используется кэш", url)
+                    if links is not None:
+                        links.update(parse_link_header(cached.link))
+                    return self._decode_payload(cached.content_type, cached.body)
+                if status == 304:
+                    # Тела для ответа 304 нет: повторяем запрос без условных заголовков.
+                    conditional = {"If-None-Match", "If-Modified-Since"} & request_headers.keys()
+                    if not conditional:
+                        raise GitHubAPIError(status=status, message=f"HTTP Error 304 без условного запроса: {url}")
+                    LOGGER.debug("GitHub API вернул 304 для %s без записи в кэше, повтор без условия", url)
+                    for name in conditional:
+                        del request_headers[name]
+                    continue
+                if status < 400:
+                    break
+                try:
+                    parsed = json.loads(payload.decode("utf-8")) if payload else {}
+                except Exception:  # noqa: BLE001 - хочется показать исходную ошибку
+                    parsed = {}
+                message = parsed.get("message", "") if isinstance(parsed, dict) else ""
+                delay = self._scheduler.retry_delay(attempt, status, response.headers, message)
+                if delay is None:
+                    raise GitHubAPIError(
+                        status=status,
+                        message=f"HTTP Error {status}: {response.reason}",
+                        response=parsed,
+                    )
+            attempt += 1
+            LOGGER.warning(
+                "GitHub API вернул %s для %s, повтор через %.1f с (попытка %s)", status, url, delay, attempt
+            )
+            self._scheduler.wait(delay)
+
+        link_header = response.headers.get("Link")
+        if links is not None:
+            links.update(parse_link_header(link_header))
+        if self._cache and method == "GET":
+            self._cache.put(
+                CachedResponse(
+                    url=url,
+                    body=payload,
+                    content_type=content_type,
+                    etag=response.headers.get("ETag"),
+                    last_modified=response.headers.get("Last-Modified"),
+                    link=link_header,
+                )
+            )
+        return self._decode_payload(content_type, payload)
+
+    @staticmethod
+    def _decode_payload(content_type: str, payload: bytes) -> Any:
+        if content_type.startswith("application/json") or payload.startswith(b"{"):
+            return json.loads(payload.decode("utf-8"))
+        return {"raw": payload}
 
-    def list_releases(self, owner: str, repo: str, per_page: int = 30) -> Dict[str, Any]:
+    def graphql(self, query: str, variables: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Выполняет GraphQL-запрос и возвращает поле ``data`` ответа."""
+
+        payload = json.dumps({"query": query, "variables": variables or {}}).encode("utf-8")
+        response = self._request("POST", "graphql", data=payload)
+        errors = response.get("errors") or []
+        for error in errors:
+            LOGGER.warning("GraphQL: %s", error.get("message", error))
+        data = response.get("data")
+        if data is None:
+            message = errors[0].get("message", "пустой ответ") if errors else "пустой ответ"
+            raise GitHubAPIError(status=200, message=f"GraphQL: {message}", response=response)
+        return data
+
+    def list_releases(self, owner: str, repo: str, per_page: int = 30) -> List[Dict[str, Any]]:
         return self._request("GET", f"repos/{owner}/{repo}/releases", params={"per_page": per_page})
 
+    def iter_releases(
+        self,
+        owner: str,
+        repo: str,
+        per_page: int = 30,
+        max_pages: int = 10,
+    ) -> Iterator[Dict[str, Any]]:
+        """Лениво перебирает релизы, запрашивая следующую страницу только при необходимости.
+
+        Страницы берутся по ссылке ``next`` из заголовка Link.
+        """
+
+        url: Optional[str] = urljoin(self._api_url, f"repos/{owner}/{repo}/releases")
+        params: Optional[Dict[str, Any]] = {"per_page": per_page}
+        for _ in range(max_pages):
+            if not url:
+                return
+            links: Dict[str, str] = {}
+            page = self._request("GET", url, params=params, raw_url=True, links=links)
+            if not isinstance(page, list):
+                raise GitHubAPIError(status=200, message="Неожиданный ответ при запросе релизов", response=page)
+            yield from page
+            url, params = links.get("next"), None
+
     def get_release_by_tag(self, owner: str, repo: str, tag: str) -> Optional[Dict[str, Any]]:
         try:
             return self._request("GET", f"repos/{owner}/{repo}/releases/tags/{tag}")
@@ -87,6 +260,18 @@ class GitHubAPI:
                 return None
             raise
 
+    def list_release_assets(
+        self, owner: str, repo: str, release_id: int, per_page: int = 100
+    ) -> List[Dict[str, Any]]:
+        return self._request(
+            "GET",
+            f"repos/{owner}/{repo}/releases/{release_id}/assets",
+            params={"per_page": per_page},
+        )
+
+    def delete_release_asset(self, owner: str, repo: str, asset_id: int) -> None:
+        self._request("DELETE", f"repos/{owner}/{repo}/releases/assets/{asset_id}")
+
     def create_release(
         self,
         owner: str,
@@ -109,8 +294,14 @@ class GitHubAPI:
         }
         return self._request("POST", f"repos/{owner}/{repo}/releases", data=json.dumps(payload).encode("utf-8"))
 
-    def upload_asset(self, upload_url: str, asset_path: str, content_type: str) -> Dict[str, Any]:
-        from pathlib import Path
+    def upload_asset(
+        self,
+        upload_url: str,
+        asset_path: str,
+        content_type: str,
+        progress: Optional[ProgressCallback] = None,
+    ) -> Dict[str, Any]:
+        """Загружает файл ассета потоком, не читая его целиком в память."""
 
         asset_file = Path(asset_path)
         if not asset_file.exists():
@@ -118,15 +309,26 @@ class GitHubAPI:
 
         upload_endpoint = upload_url.split("{", 1)[0]
         params = {"name": asset_file.name}
+        size = asset_file.stat().st_size
+        headers = {"Content-Type": content_type, "Content-Length": str(size)}
+        started = time.monotonic()
         with asset_file.open("rb") as stream:
-            payload = stream.read()
-        headers = {"Content-Type": content_type}
-        return self._request(
-            "POST",
-            upload_endpoint,
-            params=params,
-            data=payload,
-            headers=headers,
-            raw_url=True,
+            result = self._request(
+                "POST",
+                upload_endpoint,
+                params=params,
+                data=_ProgressReader(stream, size, progress),
+                headers=headers,
+                raw_url=True,
+            )
+        elapsed = max(time.monotonic() - started, 1e-6)
+        metrics.active().inc("upload_bytes_total", size)
+        LOGGER.info(
+            "Загружен %s: %s байт за %.1f с (%.2f МБ/с)",
+            asset_file.name,
+            size,
+            elapsed,
+            size / elapsed / 1024 / 1024,
         )
+        return result
 
@@ -0,0 +1,90 @@
+"""Дисковый кэш ответов GitHub API для условных запросов."""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+from .atomic import atomic_write
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedResponse:
+    """Сохранённый ответ вместе с валидаторами ETag/Last-Modified."""
+
+    url: str
+    body: bytes
+    content_type: str = ""
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    link: Optional[str] = None
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """Заголовки If-None-Match/If-Modified-Since для повторного запроса."""
+
+        headers: Dict[str, str] = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """Кэш ответов, ключом которого является URL запроса.
+
+    Каждая запись хранится в отдельном файле и заменяется атомарно, поэтому
+    кэшем можно пользоваться из нескольких потоков и процессов одновременно.
+    """
+
+    def __init__(self, cache_dir: Path) -> None:
+        self._cache_dir = cache_dir
+
+    def _entry_path(self, url: str) -> Path:
+        digest = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return self._cache_dir / digest[:2] / f"{digest}.json"
+
+    def get(self, url: str) -> Optional[CachedResponse]:
+        path = self._entry_path(url)
+        try:
+            raw = json.loads(path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as error:
+            LOGGER.warning("Повреждённая запись кэша %s: %s", path, error)
+            return None
+        if raw.get("url") != url:
+            return None
+        return CachedResponse(
+            url=url,
+            body=raw.get("body", "").encode("utf-8"),
+            content_type=raw.get("content_type", ""),
+            etag=raw.get("etag"),
+            last_modified=raw.get("last_modified"),
+            link=raw.get("link"),
+        )
+
+    def put(self, entry: CachedResponse) -> None:
+        if not entry.etag and not entry.last_modified:
+            return
+        try:
+            body = entry.body.decode("utf-8")
+        except UnicodeDecodeError:
+            return
+        path = self._entry_path(entry.url)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            "url": entry.url,
+            "etag": entry.etag,
+            "last_modified": entry.last_modified,
+            "content_type": entry.content_type,
+            "link": entry.link,
+            "body": body,
+        }
+        with atomic_write(path, "w", encoding="utf-8") as output:
+            json.dump(data, output, ensure_ascii=False)
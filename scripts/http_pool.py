@@ -0,0 +1,255 @@
+"""Пул постоянных HTTP(S)-соединений на базе http.client."""
+from __future__ import annotations
+
+import http.client
+import logging
+import ssl
+import threading
+from typing import Dict, List, Mapping, Optional, Protocol, Tuple, Union
+from urllib.parse import urljoin, urlsplit
+
+from . import metrics
+
+LOGGER = logging.getLogger(__name__)
+
+_REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+_BLOCK_SIZE = 256 * 1024
+_STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.BadStatusLine,
+    ConnectionResetError,
+    BrokenPipeError,
+)
+
+PoolKey = Tuple[str, str, int]
+
+
+class StreamBody(Protocol):
+    """Тело запроса, читаемое частями: файл или обёртка над ним с возвратом к началу."""
+
+    def read(self, size: int = -1) -> bytes: ...
+
+    def tell(self) -> int: ...
+
+    def seek(self, offset: int) -> int: ...
+
+
+Body = Union[bytes, StreamBody, None]
+
+
+class HTTPPoolError(RuntimeError):
+    """Ошибка при выполнении запроса через пул соединений."""
+
+
+class PooledResponse:
+    """Ответ сервера, возвращающий соединение в пул после полного чтения."""
+
+    def __init__(
+        self,
+        pool: "ConnectionPool",
+        key: PoolKey,
+        connection: http.client.HTTPConnection,
+        response: http.client.HTTPResponse,
+        url: str,
+    ) -> None:
+        self._pool = pool
+        self._key = key
+        self._connection: Optional[http.client.HTTPConnection] = connection
+        self._response = response
+        self.url = url
+
+    @property
+    def status(self) -> int:
+        return self._response.status
+
+    @property
+    def reason(self) -> str:
+        return self._response.reason
+
+    @property
+    def headers(self) -> http.client.HTTPMessage:
+        return self._response.headers
+
+    def read(self, amt: Optional[int] = None) -> bytes:
+        return self._response.read(amt)
+
+    def readinto(self, buffer: bytearray) -> int:
+        return self._response.readinto(buffer)
+
+    def close(self) -> None:
+        connection, self._connection = self._connection, None
+        if connection is None:
+            return
+        if self._response.isclosed() and not self._response.will_close:
+            self._pool._release(self._key, connection)
+        else:
+            self._response.close()
+            connection.close()
+
+    def __enter__(self) -> "PooledResponse":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+class ConnectionPool:
+    """Потокобезопасный пул keep-alive соединений, сгруппированных по хосту.
+
+    Соединение выдаётся одному потоку на время запроса и возвращается в пул,
+    когда тело ответа прочитано полностью.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_idle_per_host: int = 8,
+        timeout: float = 60.0,
+        max_redirects: int = 5,
+        ssl_context: Optional[ssl.SSLContext] = None,
+    ) -> None:
+        self._max_idle_per_host = max_idle_per_host
+        self._timeout = timeout
+        self._max_redirects = max_redirects
+        self._ssl_context = ssl_context or ssl.create_default_context()
+        self._idle: Dict[PoolKey, List[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+        self._proxies: Optional[Dict[str, str]] = None
+
+    def _proxy_for(self, scheme: str, host: str) -> Optional[Tuple[str, int]]:
+        # urllib.request тяжёлый для импорта, настройки прокси читаются при первом подключении.
+        from urllib.request import getproxies, proxy_bypass
+
+        if self._proxies is None:
+            self._proxies = getproxies()
+        proxy = self._proxies.get(scheme)
+        if not proxy or proxy_bypass(host):
+            return None
+        parts = urlsplit(proxy if "://" in proxy else f"http://{proxy}")
+        return parts.hostname or "", parts.port or 80
+
+    def _connect(self, key: PoolKey) -> http.client.HTTPConnection:
+        scheme, host, port = key
+        proxy = self._proxy_for(scheme, host)
+        if scheme == "https":
+            if proxy:
+                connection = http.client.HTTPSConnection(
+                    proxy[0], proxy[1], timeout=self._timeout, context=self._ssl_context, blocksize=_BLOCK_SIZE
+                )
+                connection.set_tunnel(host, port)
+                return connection
+            return http.client.HTTPSConnection(
+                host, port, timeout=self._timeout, context=self._ssl_context, blocksize=_BLOCK_SIZE
+            )
+        if proxy:
+            return http.client.HTTPConnection(proxy[0], proxy[1], timeout=self._timeout, blocksize=_BLOCK_SIZE)
+        return http.client.HTTPConnection(host, port, timeout=self._timeout, blocksize=_BLOCK_SIZE)
+
+    def _acquire(self, key: PoolKey) -> Tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop(), True
+        return self._connect(key), False
+
+    def _release(self, key: PoolKey, connection: http.client.HTTPConnection) -> None:
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self._max_idle_per_host:
+                idle.append(connection)
+                return
+        connection.close()
+
+    def close(self) -> None:
+        """Закрывает все простаивающие соединения."""
+
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        headers: Optional[Mapping[str, str]] = None,
+        body: Body = None,
+        follow_redirects: bool = True,
+    ) -> PooledResponse:
+        """Выполняет запрос и возвращает ответ, который нужно закрыть после чтения."""
+
+        method = method.upper()
+        request_headers = dict(headers or {})
+        for _ in range(self._max_redirects + 1):
+            response = self._send(method, url, request_headers, body)
+            location = response.headers.get("Location")
+            if not follow_redirects or response.status not in _REDIRECT_STATUSES or not location:
+                return response
+            response.read()
+            response.close()
+
+            target = urljoin(url, location)
+            LOGGER.debug("Перенаправление %s -> %s", url, target)
+            if urlsplit(target).netloc != urlsplit(url).netloc:
+                request_headers = {
+                    key: value for key, value in request_headers.items() if key.lower() != "authorization"
+                }
+            if response.status == 303 or (response.status in {301, 302} and method == "POST"):
+                method, body = "GET", None
+                request_headers = {
+                    key: value
+                    for key, value in request_headers.items()
+                    if not key.lower().startswith("content-")
+                }
+            url = target
+        raise HTTPPoolError(f"Слишком много перенаправлений при запросе {url}")
+
+    def _send(self, method: str, url: str, headers: Dict[str, str], body: Body) -> PooledResponse:
+        parts = urlsplit(url)
+        if parts.scheme not in {"http", "https"}:
+            raise HTTPPoolError(f"Неподдерживаемая схема URL: {url}")
+        default_port = 443 if parts.scheme == "https" else 80
+        key: PoolKey = (parts.scheme, parts.hostname or "", parts.port or default_port)
+        target = parts.path or "/"
+        if parts.query:
+            target += f"?{parts.query}"
+        if parts.scheme == "http" and self._proxy_for("http", key[1]):
+            target = url
+        start = body.tell() if body is not None and not isinstance(body, (bytes, bytearray)) else None
+
+        while True:
+            connection, reused = self._acquire(key)
+            try:
+                connection.request(method, target, body=body, headers=headers)
+                response = connection.getresponse()
+            except _STALE_CONNECTION_ERRORS:
+                connection.close()
+                if not reused:
+                    raise
+                LOGGER.debug("Соединение с %s закрыто сервером, повторное подключение", key[1])
+                if start is not None:
+                    body.seek(start)  # type: ignore[union-attr]
+                elif body is not None and not isinstance(body, (bytes, bytearray)):
+                    raise
+                continue
+            except BaseException:
+                connection.close()
+                raise
+            metrics.active().inc("http_requests_total", method=method, status=response.status)
+            return PooledResponse(self, key, connection, response, url)
+
+
+_DEFAULT_POOL: Optional[ConnectionPool] = None
+_DEFAULT_POOL_LOCK = threading.Lock()
+
+
+def default_pool() -> ConnectionPool:
+    """Общий для процесса пул соединений."""
+
+    global _DEFAULT_POOL
+    with _DEFAULT_POOL_LOCK:
+        if _DEFAULT_POOL is None:
+            _DEFAULT_POOL = ConnectionPool()
+        return _DEFAULT_POOL
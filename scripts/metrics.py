@@ -0,0 +1,234 @@
+"""Метрики запуска: длительность этапов, счётчики и экспорт в JSON и Prometheus.
+
+По умолчанию сбор метрик выключен: :func:`active` возвращает объект, все методы
+которого ничего не делают, поэтому вызовы в горячих местах почти ничего не стоят.
+Сбор включается вызовом :func:`enable`::
+
+    from . import metrics
+
+    with metrics.active().span("download", plugin="yara"):
+        ...
+    metrics.active().inc("download_bytes_total", size)
+"""
+from __future__ import annotations
+
+import json
+import threading
+import time
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Any, ContextManager, Dict, List, Tuple
+
+from .atomic import atomic_write
+
+PROMETHEUS_PREFIX = "plugin_release"
+
+LabelSet = Tuple[Tuple[str, str], ...]
+SeriesKey = Tuple[str, LabelSet]
+
+
+def _label_set(labels: Dict[str, Any]) -> LabelSet:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: LabelSet) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape_label(value)}"' for key, value in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _write_atomic(path: Path, content: str) -> None:
+    # node-exporter читает каталог textfile в произвольный момент, частично записанный файл недопустим.
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with atomic_write(path, "w", encoding="utf-8") as output:
+        output.write(content)
+
+
+class _Span:
+    __slots__ = ("_metrics", "_key", "_started")
+
+    def __init__(self, metrics: "Metrics", key: SeriesKey) -> None:
+        self._metrics = metrics
+        self._key = key
+        self._started = 0.0
+
+    def __enter__(self) -> "_Span":
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type: object, exc: object, traceback: object) -> None:
+        self._metrics._record_span(self._key, time.perf_counter() - self._started, failed=exc_type is not None)
+
+
+class _SpanStats:
+    """Накопленная статистика одного этапа: число замеров, сумма, максимум и ошибки."""
+
+    __slots__ = ("count", "total", "max", "errors")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.errors = 0
+
+
+class Metrics:
+    """Потокобезопасный набор метрик одного запуска."""
+
+    enabled = True
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._started_at = time.time()
+        self._started = time.perf_counter()
+        self._spans: Dict[SeriesKey, _SpanStats] = {}
+        self._counters: Dict[SeriesKey, float] = {}
+        self._gauges: Dict[SeriesKey, float] = {}
+
+    def span(self, name: str, **labels: Any) -> ContextManager[Any]:
+        """Замеряет длительность блока как этап ``name``."""
+
+        return _Span(self, (name, _label_set(labels)))
+
+    def inc(self, name: str, value: float = 1, **labels: Any) -> None:
+        key = (name, _label_set(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels: Any) -> None:
+        with self._lock:
+            self._gauges[(name, _label_set(labels))] = value
+
+    def _record_span(self, key: SeriesKey, elapsed: float, *, failed: bool) -> None:
+        with self._lock:
+            stats = self._spans.setdefault(key, _SpanStats())
+            stats.count += 1
+            stats.total += elapsed
+            stats.max = max(stats.max, elapsed)
+            stats.errors += failed
+
+    def report(self, **extra: Any) -> Dict[str, Any]:
+        """Отчёт о запуске в виде словаря, пригодного для сериализации в JSON."""
+
+        with self._lock:
+            spans = [
+                {
+                    "stage": name,
+                    "labels": dict(labels),
+                    "count": stats.count,
+                    "total_seconds": round(stats.total, 6),
+                    "max_seconds": round(stats.max, 6),
+                    "errors": stats.errors,
+                }
+                for (name, labels), stats in sorted(self._spans.items())
+            ]
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+            gauges = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self._gauges.items())
+            ]
+        return {
+            "started_at": self._started_at,
+            "duration_seconds": round(time.perf_counter() - self._started, 6),
+            "stages": spans,
+            "counters": counters,
+            "gauges": gauges,
+            **extra,
+        }
+
+    def prometheus(self, prefix: str = PROMETHEUS_PREFIX) -> str:
+        """Метрики в текстовом формате Prometheus для textfile collector node-exporter."""
+
+        lines: List[str] = []
+        with self._lock:
+            spans = sorted(self._spans.items())
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+
+        if spans:
+            metric = f"{prefix}_stage_duration_seconds"
+            lines.append(f"# TYPE {metric} summary")
+            for (name, labels), stats in spans:
+                stage_labels = _format_labels((("stage", name),) + labels)
+                lines.append(f"{metric}_sum{stage_labels} {stats.total:.6f}")
+                lines.append(f"{metric}_count{stage_labels} {stats.count}")
+            lines.append(f"# TYPE {metric}_max gauge")
+            for (name, labels), stats in spans:
+                lines.append(f"{metric}_max{_format_labels((('stage', name),) + labels)} {stats.max:.6f}")
+            lines.append(f"# TYPE {prefix}_stage_errors_total counter")
+            for (name, labels), stats in spans:
+                lines.append(f"{prefix}_stage_errors_total{_format_labels((('stage', name),) + labels)} {stats.errors}")
+
+        for kind, samples in (("counter", counters), ("gauge", gauges)):
+            declared = set()
+            for (name, labels), value in samples:
+                metric = f"{prefix}_{name}"
+                if metric not in declared:
+                    lines.append(f"# TYPE {metric} {kind}")
+                    declared.add(metric)
+                lines.append(f"{metric}{_format_labels(labels)} {_format_value(value)}")
+
+        lines.append(f"# TYPE {prefix}_run_duration_seconds gauge")
+        lines.append(f"{prefix}_run_duration_seconds {time.perf_counter() - self._started:.6f}")
+        lines.append(f"# TYPE {prefix}_last_run_timestamp_seconds gauge")
+        lines.append(f"{prefix}_last_run_timestamp_seconds {self._started_at:.0f}")
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, path: Path, **extra: Any) -> None:
+        _write_atomic(path, json.dumps(self.report(**extra), ensure_ascii=False, indent=2) + "\n")
+
+    def write_prometheus(self, path: Path, prefix: str = PROMETHEUS_PREFIX) -> None:
+        _write_atomic(path, self.prometheus(prefix))
+
+
+class _DisabledMetrics:
+    """Заглушка, используемая, пока сбор метрик не включён."""
+
+    enabled = False
+    _NULL_SPAN: ContextManager[Any] = nullcontext()
+
+    def span(self, name: str, **labels: Any) -> ContextManager[Any]:
+        return self._NULL_SPAN
+
+    def inc(self, name: str, value: float = 1, **labels: Any) -> None:
+        return None
+
+    def set(self, name: str, value: float, **labels: Any) -> None:
+        return None
+
+
+_DISABLED = _DisabledMetrics()
+_ACTIVE: Any = _DISABLED
+
+
+def active() -> Any:
+    """Текущий набор метрик процесса (или заглушка, если сбор выключен)."""
+
+    return _ACTIVE
+
+
+def enable() -> Metrics:
+    """Включает сбор метрик и возвращает новый набор."""
+
+    global _ACTIVE
+    _ACTIVE = Metrics()
+    return _ACTIVE
+
+
+def disable() -> None:
+    global _ACTIVE
+    _ACTIVE = _DISABLED
+
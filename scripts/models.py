@@ -1,18 +1,83 @@
 """Модели данных для конфигурации и описания релизов плагинов."""
 from __future__ import annotations
 
+import re
 from dataclasses import dataclass, field
-from typing import Dict, Iterable, List, Optional
+from typing import Dict, Iterable, List, Optional, Sequence
+
+_BACKREFERENCE = re.compile(r"\\[1-9]|\(\?P=")
 
 
 @dataclass
 class AssetPattern:
-    """Описание шаблона для бинарника конкретной архитектуры."""
+    """Описание шаблона для бинарника конкретной архитектуры.
+
+    Регулярные выражения компилируются один раз при создании; ошибка в шаблоне
+    приводит к ``re.error`` уже при загрузке конфигурации.
+    """
 
     arch: str
     pattern: str
     rename_to: Optional[str] = None
     archive_member: Optional[str] = None
+    compression_level: Optional[int] = None
+    regex: re.Pattern[str] = field(init=False, repr=False, compare=False)
+    member_regex: Optional[re.Pattern[str]] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        self.regex = re.compile(self.pattern)
+        self.member_regex = re.compile(self.archive_member) if self.archive_member else None
+
+
+class AssetMatcher:
+    """Сопоставление ассетов релиза шаблонам всех архитектур за один проход.
+
+    Имена ассетов сначала проверяются объединённым выражением, поэтому
+    ассеты, не подходящие ни под один шаблон, отсеиваются одной проверкой.
+    Для каждой архитектуры выбирается первый подходящий ассет в порядке релиза,
+    просмотр заканчивается, как только найдены все архитектуры.
+    """
+
+    def __init__(self, patterns: Sequence[AssetPattern]) -> None:
+        self.patterns = list(patterns)
+        self._combined: Optional[re.Pattern[str]] = None
+        if self.patterns and not any(_BACKREFERENCE.search(item.pattern) for item in self.patterns):
+            try:
+                self._combined = re.compile("|".join(f"(?:{item.pattern})" for item in self.patterns))
+            except re.error:
+                # Например, глобальные флаги (?i) внутри альтернативы; тогда шаблоны проверяются по отдельности.
+                self._combined = None
+
+    def classify(self, assets: Iterable[dict]) -> Dict[str, dict]:
+        """Возвращает найденные ассеты по архитектурам."""
+
+        pending = list(self.patterns)
+        result: Dict[str, dict] = {}
+        for asset in assets:
+            name = asset.get("name", "")
+            if self._combined is not None and not self._combined.search(name):
+                continue
+            for pattern in [item for item in pending if item.regex.search(name)]:
+                result.setdefault(pattern.arch, asset)
+                pending.remove(pattern)
+            if not pending:
+                break
+        return result
+
+
+@dataclass
+class CompressionSettings:
+    """Настройки сжатия архивов плагина.
+
+    ``profile`` — ``fast``, ``balanced`` или ``small``; ``level`` задаёт
+    уровень deflate явно. ``store_entropy`` — порог энтропии в битах на байт,
+    начиная с которого данные считаются несжимаемыми и хранятся без сжатия.
+    Значения ``None`` берутся из профиля.
+    """
+
+    profile: str = "balanced"
+    level: Optional[int] = None
+    store_entropy: Optional[float] = None
 
 
 @dataclass
@@ -25,6 +90,10 @@ class PluginSource:
     release_branch: Optional[str] = None
     tag_prefix: str = ""
     asset_patterns: List[AssetPattern] = field(default_factory=list)
+    matcher: AssetMatcher = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        self.matcher = AssetMatcher(self.asset_patterns)
 
 
 @dataclass
@@ -41,6 +110,8 @@ class PluginConfig:
     )
     plugin_description: str = ""
     binary_subdir: str = "bin"
+    category: Optional[str] = None
+    compression: CompressionSettings = field(default_factory=CompressionSettings)
 
     def expected_architectures(self) -> Iterable[str]:
         """Возвращает список архитектур, заданных в конфигурации."""
@@ -55,4 +126,20 @@ class ReleaseState:
     plugin: str
     version: str
     assets: Dict[str, str]
+    digests: Dict[str, str] = field(default_factory=dict)
+    source_digests: Dict[str, str] = field(default_factory=dict)
+
 
+@dataclass
+class PluginRunResult:
+    """Итог обработки одного плагина."""
+
+    plugin: str
+    status: str
+    version: Optional[str] = None
+    error: Optional[str] = None
+    duration: Optional[float] = None
+
+    @property
+    def failed(self) -> bool:
+        return self.status == "failed"
@@ -3,38 +3,329 @@ from __future__ import annotations
 
 import json
 import logging
+import re
+import shutil
+import struct
+import hashlib
+import io
+import tarfile
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional
-from zipfile import ZIP_DEFLATED, ZipFile
+from typing import IO, Any, Callable, Dict, Iterator, Optional, Tuple
+from zipfile import ZIP64_LIMIT, ZIP_DEFLATED, ZIP_STORED, BadZipFile, ZipFile, ZipInfo
 
+from . import metrics
+from .atomic import atomic_write
+from .compression import SAMPLE_BLOCK, SAMPLE_BLOCKS, CompressionPolicy, read_sample
 from .models import AssetPattern, PluginConfig
 
 LOGGER = logging.getLogger(__name__)
 
 
+class PackageBuildError(RuntimeError):
+    """Ошибка сборки архива плагина."""
+
+
 _ARCHIVE_EXTENSION = {
     "x86": ".mxt3",
     "x64": ".mxt64",
 }
 
+_LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+_LOCAL_HEADER_SIGNATURE = b"PK\003\004"
+_COPY_BUFFER = 1024 * 1024
+_FIXED_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+_BINARY_MODE = 0o100755
+_METADATA_MODE = 0o100644
+_MANIFEST_NAME = "build-manifest.json"
+# Закрытые атрибуты ZipFile, без которых нельзя дописать в архив уже сжатые данные.
+_RAW_COPY_ATTRIBUTES = ("_lock", "_writecheck", "_didModify", "start_dir")
+
+
+@dataclass
+class BinarySource:
+    """Бинарник для упаковки: отдельный файл или член zip/tar-архива.
+
+    Для tar-архивов член может быть задан не именем, а регулярным выражением
+    ``member_pattern``: он выбирается при потоковом чтении архива.
+    """
+
+    path: Path
+    kind: str = "file"
+    member: Optional[str] = None
+    member_pattern: Optional[re.Pattern[str]] = None
+    digest: Optional[str] = None
+
+    @property
+    def name(self) -> str:
+        return Path(self.member).name if self.member else self.path.name
+
+    def fingerprint(self) -> Dict[str, Any]:
+        """Описание входных данных для манифеста сборки."""
+
+        return {
+            "sha256": self.digest or file_sha256(self.path),
+            "kind": self.kind,
+            "member": self.member,
+            "member_pattern": self.member_pattern.pattern if self.member_pattern else None,
+        }
+
+
+@dataclass
+class BuiltArchive:
+    """Результат сборки архива плагина."""
+
+    path: Path
+    sha256: str
+    size: int
+    reused: bool = False
+
+
+def file_sha256(path: Path) -> str:
+    hasher = hashlib.sha256()
+    with path.open("rb") as stream:
+        for chunk in iter(lambda: stream.read(_COPY_BUFFER), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+class BuildManifest:
+    """Манифест сборки: входные данные и результат для каждого архива каталога.
+
+    Запись обновляется под блокировкой, общей для всех сборщиков процесса,
+    и сохраняется атомарной заменой файла.
+    """
+
+    _locks: Dict[Path, threading.Lock] = {}
+    _locks_guard = threading.Lock()
+
+    def __init__(self, path: Path) -> None:
+        self._path = path
+        with self._locks_guard:
+            self._lock = self._locks.setdefault(path.resolve(), threading.Lock())
+
+    def _read(self) -> Dict[str, Any]:
+        try:
+            return json.loads(self._path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as error:
+            LOGGER.warning("Манифест сборки %s повреждён и будет пересоздан: %s", self._path, error)
+            return {}
+
+    def get(self, archive_name: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._read().get(archive_name)
+
+    def put(self, archive_name: str, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            data = self._read()
+            data[archive_name] = entry
+            with atomic_write(self._path, "w", encoding="utf-8") as output:
+                json.dump(dict(sorted(data.items())), output, ensure_ascii=False, indent=2)
+
 
 def _resolve_archive_name(plugin: PluginConfig, version: str, arch: str) -> str:
     extension = _ARCHIVE_EXTENSION.get(arch, f"-{arch}.zip")
     return f"{plugin.name}-{version}-{arch}{extension}"
 
 
-def _resolve_internal_name(pattern: AssetPattern, source_path: Path) -> str:
+def _resolve_internal_name(pattern: AssetPattern, source_name: str) -> str:
     if pattern.rename_to:
         return pattern.rename_to
-    return source_path.name
+    return source_name
+
+
+def _entry(arcname: str, mode: int, compression: Tuple[int, Optional[int]] = (ZIP_DEFLATED, None)) -> ZipInfo:
+    """Заголовок записи с фиксированными датой и правами для воспроизводимых архивов."""
+
+    entry = ZipInfo(arcname, date_time=_FIXED_DATE_TIME)
+    entry.create_system = 3
+    # Уровень сжатия записи задаётся только через закрытый атрибут ZipInfo.
+    entry.compress_type, entry._compresslevel = compression  # type: ignore[attr-defined]  # noqa: SLF001
+    entry.external_attr = mode << 16
+    metrics.active().inc("package_entries_total", method="stored" if compression[0] == ZIP_STORED else "deflated")
+    return entry
+
+
+def _member_data_offset(source: IO[bytes], info: ZipInfo) -> int:
+    source.seek(info.header_offset)
+    header = source.read(_LOCAL_HEADER.size)
+    fields = _LOCAL_HEADER.unpack(header) if len(header) == _LOCAL_HEADER.size else None
+    if not fields or fields[0] != _LOCAL_HEADER_SIGNATURE:
+        raise BadZipFile(f"Повреждён локальный заголовок {info.filename}")
+    name_length, extra_length = fields[-2], fields[-1]
+    return info.header_offset + _LOCAL_HEADER.size + name_length + extra_length
+
+
+@lru_cache(maxsize=None)
+def _raw_copy_supported() -> bool:
+    """Проверяет один раз, что у ``ZipFile`` есть закрытые атрибуты для переноса сжатых данных."""
+
+    with ZipFile(io.BytesIO(), "w") as probe:
+        missing = [name for name in _RAW_COPY_ATTRIBUTES if not hasattr(probe, name)]
+    if missing:
+        LOGGER.debug("Перенос сжатых данных недоступен: в ZipFile нет %s", ", ".join(missing))
+    return not missing
+
+
+def _copy_raw_member(upstream: ZipFile, info: ZipInfo, archive: ZipFile, arcname: str) -> bool:
+    """Переносит уже сжатые данные члена zip-архива без распаковки и повторного сжатия.
+
+    zipfile не даёт публичного API для записи сжатых данных, поэтому используются
+    его закрытые атрибуты. Если их нет, возвращает ``False``: в архив ничего не
+    записано, и член нужно перепаковать.
+    """
+
+    source, output = upstream.fp, archive.fp
+    if not _raw_copy_supported() or source is None or output is None:
+        return False
+    writer: Any = archive
+    try:
+        lock, writecheck = writer._lock, writer._writecheck  # noqa: SLF001
+    except AttributeError:
+        return False
+
+    target = _entry(arcname, _BINARY_MODE, (info.compress_type, None))
+    target.CRC = info.CRC
+    target.compress_size = info.compress_size
+    target.file_size = info.file_size
+    zip64 = info.file_size > ZIP64_LIMIT or info.compress_size > ZIP64_LIMIT
+
+    data_offset = _member_data_offset(source, info)
+    with lock:
+        try:
+            writecheck(target)
+        except AttributeError:
+            return False
+        writer._didModify = True  # noqa: SLF001
+        target.header_offset = output.tell()
+        output.write(target.FileHeader(zip64))
+        source.seek(data_offset)
+        remaining = info.compress_size
+        while remaining:
+            chunk = source.read(min(_COPY_BUFFER, remaining))
+            if not chunk:
+                raise BadZipFile(f"Неожиданный конец данных {info.filename}")
+            output.write(chunk)
+            remaining -= len(chunk)
+        archive.filelist.append(target)
+        archive.NameToInfo[arcname] = target
+        writer.start_dir = output.tell()
+    return True
+
+
+def _write_stream(
+    archive: ZipFile,
+    arcname: str,
+    stream: IO[bytes],
+    *,
+    size: int,
+    policy: CompressionPolicy,
+    sample: Optional[bytes] = None,
+) -> None:
+    """Записывает поток; способ сжатия выбирается по ``sample`` или по началу потока."""
+
+    head = b""
+    if sample is None:
+        head = stream.read(SAMPLE_BLOCK * SAMPLE_BLOCKS)
+        sample = head
+    target = _entry(arcname, _BINARY_MODE, policy.choose(sample))
+    target.file_size = size
+    if target.compress_type == ZIP_STORED:
+        LOGGER.info("%s не сжимается и хранится без сжатия", arcname)
+    with archive.open(target, "w", force_zip64=size > ZIP64_LIMIT) as output:
+        output.write(head)
+        shutil.copyfileobj(stream, output, _COPY_BUFFER)
+
+
+def _is_candidate(member: tarfile.TarInfo) -> bool:
+    return member.isfile() and not Path(member.name).name.startswith(".")
+
+
+@contextmanager
+def _open_tar_member(source: BinarySource) -> Iterator[Tuple[tarfile.TarInfo, IO[bytes]]]:
+    """Однопроходный выбор члена tar-архива.
+
+    Архив читается потоком (режим ``r|*``) без построения списка членов:
+    первый подходящий файл отдаётся сразу. При поиске по шаблону или по имени
+    чтение на этом заканчивается; без шаблона архив дочитывается, чтобы
+    убедиться, что подходящий файл единственный.
+    """
+
+    regex = source.member_pattern
+    with tarfile.open(source.path, "r|*") as upstream:
+        selected: Optional[tarfile.TarInfo] = None
+        for member in upstream:
+            if not _is_candidate(member):
+                continue
+            if selected is not None:
+                raise PackageBuildError(
+                    f"В архиве {source.path} найдено несколько файлов, укажите 'archive_member' в конфигурации"
+                )
+            if source.member is not None and member.name != source.member:
+                continue
+            if regex is not None and not regex.search(member.name):
+                continue
+            LOGGER.info("Выбран файл %s из архива %s", member.name, source.path.name)
+            stream = upstream.extractfile(member)
+            if stream is None:
+                raise PackageBuildError(f"{member.name} в {source.path} не является файлом")
+            with stream:
+                yield member, stream
+            if source.member is not None or regex is not None:
+                return
+            selected = member
+        if selected is None:
+            pattern = regex.pattern if regex is not None else source.member
+            raise PackageBuildError(f"В архиве {source.path} не найден файл по шаблону {pattern}")
+
+
+def _write_binary(
+    archive: ZipFile,
+    resolve_arcname: Callable[[str], str],
+    source: BinarySource,
+    policy: CompressionPolicy,
+) -> None:
+    if source.kind == "zip":
+        arcname = resolve_arcname(source.name)
+        with ZipFile(source.path) as upstream:
+            info = upstream.getinfo(source.member or "")
+            if info.compress_type == ZIP_DEFLATED and not info.flag_bits & 0x1:
+                if _copy_raw_member(upstream, info, archive, arcname):
+                    LOGGER.debug("Сжатые данные %s перенесены без перекодирования", info.filename)
+                    return
+            with upstream.open(info) as stream:
+                _write_stream(archive, arcname, stream, size=info.file_size, policy=policy)
+        return
+
+    if source.kind == "tar":
+        with _open_tar_member(source) as (member, stream):
+            _write_stream(archive, resolve_arcname(Path(member.name).name), stream, size=member.size, policy=policy)
+        return
+
+    size = source.path.stat().st_size
+    sample = read_sample(source.path, size)
+    with source.path.open("rb") as stream:
+        _write_stream(archive, resolve_arcname(source.name), stream, size=size, policy=policy, sample=sample)
 
 
 class PackageBuilder:
-    """Утилита для упаковки бинарников в формат mxt."""
+    """Утилита для упаковки бинарников в формат mxt.
+
+    Архивы собираются воспроизводимо (фиксированные даты, права и порядок
+    записей), а входные данные каждого архива записываются в манифест
+    ``build-manifest.json``. Если входные данные и настройки не изменились
+    и архив на месте, повторная сборка пропускается. Способ сжатия записей
+    определяет :class:`CompressionPolicy` плагина и архитектуры.
+    """
 
     def __init__(self, output_dir: Path) -> None:
         self._output_dir = output_dir
-        self._output_dir.mkdir(parents=True, exist_ok=True)
+        self._manifest = BuildManifest(output_dir / _MANIFEST_NAME)
 
     def build(
         self,
@@ -42,11 +333,71 @@ class PackageBuilder:
         pattern: AssetPattern,
         *,
         version: str,
-        binary_path: Path,
+        binary: BinarySource,
+        release_url: Optional[str] = None,
+    ) -> BuiltArchive:
+        archive_path = self.archive_path(plugin, version, pattern.arch)
+        archive_name = archive_path.name
+        policy = CompressionPolicy.for_asset(plugin.compression, pattern)
+        inputs = self._inputs(plugin, pattern, version, binary.fingerprint(), release_url)
+        metadata = inputs["metadata"]
+        reused = self._reuse(archive_path, inputs)
+        if reused:
+            LOGGER.info("Архив %s не изменился, сборка пропущена", archive_path)
+            metrics.active().inc("package_builds_total", result="reused")
+            return reused
+
+        def resolve_arcname(source_name: str) -> str:
+            return str(Path(plugin.binary_subdir) / _resolve_internal_name(pattern, source_name))
+
+        LOGGER.info("Формирование архива %s", archive_path)
+        self._output_dir.mkdir(parents=True, exist_ok=True)
+        with atomic_write(archive_path) as output, ZipFile(output, "w", compression=ZIP_DEFLATED) as archive:
+            _write_binary(archive, resolve_arcname, binary, policy)
+            payload = json.dumps(metadata, ensure_ascii=False, indent=2)
+            archive.writestr(_entry("plugin.json", _METADATA_MODE, policy.choose(payload.encode("utf-8"))), payload)
+
+        stat = archive_path.stat()
+        built = BuiltArchive(path=archive_path, sha256=file_sha256(archive_path), size=stat.st_size)
+        metrics.active().inc("package_builds_total", result="built")
+        metrics.active().inc("package_bytes_total", built.size)
+        self._manifest.put(
+            archive_name,
+            {"inputs": inputs, "sha256": built.sha256, "size": built.size, "mtime_ns": stat.st_mtime_ns},
+        )
+        return built
+
+    def archive_path(self, plugin: PluginConfig, version: str, arch: str) -> Path:
+        return self._output_dir / _resolve_archive_name(plugin, version, arch)
+
+    def recorded_binary(self, plugin: PluginConfig, version: str, arch: str) -> Optional[Dict[str, Any]]:
+        """Описание бинарника, из которого был собран архив, по данным манифеста."""
+
+        entry = self._manifest.get(self.archive_path(plugin, version, arch).name)
+        return (entry or {}).get("inputs", {}).get("binary")
+
+    def existing(
+        self,
+        plugin: PluginConfig,
+        pattern: AssetPattern,
+        *,
+        version: str,
+        binary: Dict[str, Any],
         release_url: Optional[str] = None,
-    ) -> Path:
-        archive_name = _resolve_archive_name(plugin, version, pattern.arch)
-        archive_path = self._output_dir / archive_name
+    ) -> Optional[BuiltArchive]:
+        """Готовый архив, если он собран из тех же входных данных; ``binary`` — результат ``fingerprint()``."""
+
+        inputs = self._inputs(plugin, pattern, version, binary, release_url)
+        return self._reuse(self.archive_path(plugin, version, pattern.arch), inputs)
+
+    def _inputs(
+        self,
+        plugin: PluginConfig,
+        pattern: AssetPattern,
+        version: str,
+        binary: Dict[str, Any],
+        release_url: Optional[str],
+    ) -> Dict[str, Any]:
         metadata = {
             "name": plugin.name,
             "version": version,
@@ -54,11 +405,22 @@ class PackageBuilder:
             "description": plugin.plugin_description,
             "source_release": release_url,
         }
-        binary_inside = Path(plugin.binary_subdir) / _resolve_internal_name(pattern, binary_path)
-
-        LOGGER.info("Формирование архива %s", archive_path)
-        with ZipFile(archive_path, "w", compression=ZIP_DEFLATED) as archive:
-            archive.write(binary_path, arcname=str(binary_inside))
-            archive.writestr("plugin.json", json.dumps(metadata, ensure_ascii=False, indent=2))
-        return archive_path
+        return {
+            "binary": binary,
+            "binary_subdir": plugin.binary_subdir,
+            "rename_to": pattern.rename_to,
+            "metadata": metadata,
+            "compression": CompressionPolicy.for_asset(plugin.compression, pattern).describe(),
+        }
 
+    def _reuse(self, archive_path: Path, inputs: Dict[str, Any]) -> Optional[BuiltArchive]:
+        entry = self._manifest.get(archive_path.name)
+        if not entry or entry.get("inputs") != inputs:
+            return None
+        try:
+            stat = archive_path.stat()
+        except FileNotFoundError:
+            return None
+        if stat.st_size != entry.get("size") or stat.st_mtime_ns != entry.get("mtime_ns"):
+            return None
+        return BuiltArchive(path=archive_path, sha256=entry["sha256"], size=stat.st_size, reused=True)
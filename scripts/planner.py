@@ -0,0 +1,218 @@
+"""План запуска без скачивания и сборки.
+
+План строится только по метаданным GitHub API (с условными запросами через
+кэш ответов), состоянию плагинов, кэшу бинарников и манифесту сборки: какой
+релиз будет выбран, какие ассеты подходят, какие архивы будут пересобраны или
+взяты готовыми, что придётся загрузить и сколько байт будет передано.
+"""
+from __future__ import annotations
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from .downloader import expected_sha256
+from .github_api import GitHubAPIError
+from .models import AssetPattern, PluginConfig
+from .package_builder import BuiltArchive, PackageBuilder
+from .release_steps import (
+    PluginReleaseError,
+    RunContext,
+    latest_release,
+    match_assets,
+    prepare_binary,
+    release_tag,
+    same_asset,
+)
+
+
+@dataclass
+class AssetPlan:
+    """План для одной архитектуры."""
+
+    arch: str
+    asset: str
+    asset_size: Optional[int]
+    archive: str
+    download: bool
+    build: bool
+    archive_size: Optional[int] = None
+    upload: Optional[str] = None
+
+
+@dataclass
+class PluginPlan:
+    """План обработки плагина; ``status`` — ``update``, ``up-to-date`` или ``failed``."""
+
+    plugin: str
+    status: str
+    version: Optional[str] = None
+    previous_version: Optional[str] = None
+    release: Optional[str] = None
+    release_url: Optional[str] = None
+    assets: List[AssetPlan] = field(default_factory=list)
+    error: Optional[str] = None
+
+    @property
+    def download_bytes(self) -> int:
+        return sum(item.asset_size or 0 for item in self.assets if item.download)
+
+    @property
+    def upload_bytes(self) -> int:
+        """Объём загрузки; для пересобираемых архивов оценивается по размеру исходного ассета."""
+
+        return sum(
+            (item.archive_size if item.archive_size is not None else item.asset_size or 0)
+            for item in self.assets
+            if item.upload in {"upload", "replace"}
+        )
+
+
+def _plan_asset(
+    context: RunContext,
+    builder: PackageBuilder,
+    plugin: PluginConfig,
+    pattern: AssetPattern,
+    version: str,
+    asset: dict,
+    release_url: Optional[str],
+) -> Tuple[AssetPlan, Optional[BuiltArchive]]:
+    blob = context.downloader.lookup(asset)
+    fingerprint: Optional[Dict[str, Any]] = None
+    if blob is not None:
+        binary = prepare_binary(blob.path, pattern)
+        binary.digest = blob.sha256
+        fingerprint = binary.fingerprint()
+    else:
+        # Без скачивания член архива неизвестен; достаточно, что манифест записан для того же файла.
+        recorded = builder.recorded_binary(plugin, version, pattern.arch)
+        digest = expected_sha256(asset)
+        if recorded and digest and recorded.get("sha256") == digest:
+            fingerprint = recorded
+    existing = (
+        builder.existing(plugin, pattern, version=version, binary=fingerprint, release_url=release_url)
+        if fingerprint
+        else None
+    )
+    return AssetPlan(
+        arch=pattern.arch,
+        asset=asset.get("name", ""),
+        asset_size=asset.get("size"),
+        archive=builder.archive_path(plugin, version, pattern.arch).name,
+        download=blob is None,
+        build=existing is None,
+        archive_size=existing.size if existing else None,
+        upload="upload" if context.publish else None,
+    ), existing
+
+
+def _plan_uploads(
+    context: RunContext,
+    plugin: PluginConfig,
+    version: str,
+    items: List[Tuple[AssetPlan, Optional[BuiltArchive]]],
+) -> None:
+    if context.origin is None:
+        raise PluginReleaseError("Не задан репозиторий для публикации")
+    owner, repo = context.origin
+    release: Optional[Dict[str, Any]] = context.api.get_release_by_tag(owner, repo, release_tag(plugin, version))
+    if release is None:
+        return
+    remote_assets: Optional[List[Dict[str, Any]]] = release.get("assets")
+    if remote_assets is None:
+        remote_assets = context.api.list_release_assets(owner, repo, release["id"])
+    remote_by_name = {asset.get("name"): asset for asset in remote_assets}
+    for item, existing in items:
+        remote = remote_by_name.get(item.archive)
+        if remote is None:
+            continue
+        if existing is None:
+            item.upload = "replace"
+            continue
+        uploaded = context.store.uploaded_sha256(f"{owner}/{repo}", remote.get("id"))
+        item.upload = "skip" if same_asset(remote, existing.size, existing.sha256, uploaded) else "replace"
+
+
+def plan_plugin(context: RunContext, plugin: PluginConfig) -> PluginPlan:
+    """Строит план обработки одного плагина, не скачивая ассеты."""
+
+    try:
+        release, version = latest_release(context.api, plugin, context.discovered.get(plugin.name))
+        previous = context.store.latest(plugin.name)
+        plan = PluginPlan(
+            plugin=plugin.name,
+            status="update",
+            version=version,
+            previous_version=previous.version if previous else None,
+            release=release.get("tag_name"),
+            release_url=release.get("html_url"),
+        )
+        if previous and previous.version == version and not context.force:
+            plan.status = "up-to-date"
+            return plan
+        matched = match_assets(plugin.source.matcher, release)
+        builder = PackageBuilder(context.output_dir)
+        items = [
+            _plan_asset(context, builder, plugin, pattern, version, matched[pattern.arch], plan.release_url)
+            for pattern in plugin.source.asset_patterns
+        ]
+        if context.publish:
+            _plan_uploads(context, plugin, version, items)
+        plan.assets = [item for item, _ in items]
+        return plan
+    except (PluginReleaseError, GitHubAPIError) as error:
+        return PluginPlan(plugin=plugin.name, status="failed", error=str(error))
+
+
+def plan_plugins(context: RunContext, plugins: List[PluginConfig], jobs: int = 4) -> List[PluginPlan]:
+    with ThreadPoolExecutor(max_workers=min(jobs, len(plugins)) or 1) as executor:
+        return list(executor.map(lambda plugin: plan_plugin(context, plugin), plugins))
+
+
+def _size(value: Optional[int]) -> str:
+    if value is None:
+        return "?"
+    if value < 1024 * 1024:
+        return f"{value / 1024:.1f} КБ"
+    return f"{value / 1024 / 1024:.1f} МБ"
+
+
+def format_plan(plans: List[PluginPlan]) -> str:
+    lines = ["План обработки плагинов:"]
+    for plan in plans:
+        if plan.status == "failed":
+            lines.append(f"  {plan.plugin}: ошибка: {plan.error}")
+            continue
+        if plan.status == "up-to-date":
+            lines.append(f"  {plan.plugin}: версия {plan.version} уже обработана")
+            continue
+        lines.append(
+            f"  {plan.plugin}: {plan.previous_version or '-'} -> {plan.version} (релиз {plan.release})"
+        )
+        for item in plan.assets:
+            actions = [
+                "скачать" if item.download else "из кэша",
+                "собрать" if item.build else "готовый архив",
+            ]
+            if item.upload:
+                actions.append({"upload": "загрузить", "replace": "заменить", "skip": "уже загружен"}[item.upload])
+            lines.append(
+                f"    {item.arch:<6} {item.asset} ({_size(item.asset_size)}) -> {item.archive}: {', '.join(actions)}"
+            )
+    updates = [plan for plan in plans if plan.status == "update"]
+    failed = sum(1 for plan in plans if plan.status == "failed")
+    lines.append(
+        f"Всего: {len(plans)}, к обновлению: {len(updates)}, с ошибками: {failed}; "
+        f"скачать {_size(sum(plan.download_bytes for plan in updates))}, "
+        f"загрузить около {_size(sum(plan.upload_bytes for plan in updates))}"
+    )
+    return "\n".join(lines)
+
+
+def plan_json(plans: List[PluginPlan]) -> str:
+    payload = [
+        {**asdict(plan), "download_bytes": plan.download_bytes, "upload_bytes": plan.upload_bytes}
+        for plan in plans
+    ]
+    return json.dumps(payload, ensure_ascii=False, indent=2)
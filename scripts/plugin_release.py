@@ -5,65 +5,71 @@ import argparse
 import logging
 import os
 import re
-import shutil
-import subprocess
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
 from pathlib import Path
-from typing import Dict, Iterable, List, Tuple
-from urllib.error import HTTPError
-from urllib.request import Request, urlopen
-
-import tarfile
-from zipfile import ZipFile, is_zipfile
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
 
+from . import git_metadata, metrics
 from .config_loader import ConfigurationError, load_plugins_config
+from .downloader import AssetDownloader, CachedBlob, DownloadError
+from .git_metadata import GitMetadataError
 from .github_api import GitHubAPI, GitHubAPIError
-from .models import AssetPattern, PluginConfig, ReleaseState
-from .package_builder import PackageBuilder
-from .state import load_state, save_state
+from .models import AssetPattern, PluginConfig, PluginRunResult, ReleaseState
+from .release_steps import (
+    PluginReleaseError,
+    RunContext,
+    latest_release,
+    match_assets,
+    prepare_binary,
+    release_tag,
+    same_asset,
+    select_release,
+)
+from .state import StateStore
+
+# Сборка, распаковка архивов, GraphQL и шардирование нужны не в каждом запуске:
+# чаще всего плагины уже обработаны, и запуск заканчивается проверкой версий.
+# Такие модули импортируются в местах использования, чтобы не замедлять запуск.
+if TYPE_CHECKING:
+    from .checksums import ReleaseChecksums
+    from .package_builder import BuiltArchive
 
 LOGGER = logging.getLogger(__name__)
 
 
-class PluginReleaseError(RuntimeError):
-    """Базовая ошибка сборки релиза плагина."""
-
-
 def _configure_logging(verbose: bool) -> None:
     level = logging.DEBUG if verbose else logging.INFO
     logging.basicConfig(level=level, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
 
 
-def _current_branch() -> str:
+def _git_output(*args: str) -> str:
+    import subprocess
+
     try:
         result = subprocess.run(
-            ["git", "rev-parse", "--abbrev-ref", "HEAD"],
+            ["git", *args],
             check=True,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
             text=True,
         )
     except subprocess.CalledProcessError as error:
-        raise PluginReleaseError("Не удалось определить текущую ветку git") from error
+        raise OSError(f"git {' '.join(args)}: {error.stderr.strip()}") from error
     return result.stdout.strip()
 
 
-def _origin_repo() -> Tuple[str, str]:
+def _current_branch() -> str:
     try:
-        result = subprocess.run(
-            ["git", "config", "--get", "remote.origin.url"],
-            check=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-        )
-    except subprocess.CalledProcessError as error:
-        raise PluginReleaseError("Не удалось получить адрес origin") from error
-    url = result.stdout.strip()
-    match = re.search(r"github.com[:/](?P<owner>[^/]+)/(?P<repo>[^/.]+)(?:\.git)?", url)
-    if not match:
-        raise PluginReleaseError(f"Не удалось разобрать адрес удалённого репозитория: {url}")
-    return match.group("owner"), match.group("repo")
+        return git_metadata.repository().current_branch()
+    except (GitMetadataError, OSError) as error:
+        LOGGER.debug("Метаданные git недоступны (%s), используется git rev-parse", error)
+    try:
+        return _git_output("rev-parse", "--abbrev-ref", "HEAD")
+    except OSError as error:
+        raise PluginReleaseError("Не удалось определить текущую ветку git") from error
 
 
 def _ensure_branch(expected: str) -> None:
@@ -72,109 +78,36 @@ def _ensure_branch(expected: str) -> None:
         raise PluginReleaseError(f"Скрипт должен запускаться в ветке {expected}, текущая ветка {branch}")
 
 
-def _latest_release(api: GitHubAPI, plugin: PluginConfig) -> Tuple[dict, str]:
-    releases = api.list_releases(plugin.source.owner, plugin.source.repo)
-    if not isinstance(releases, list):
-        raise PluginReleaseError("GitHub API вернул неожиданный ответ при запросе релизов")
-
-    prefix = plugin.source.tag_prefix
-    for release in releases:
-        if release.get("draft") or release.get("prerelease"):
-            continue
-        if plugin.source.release_branch and release.get("target_commitish") != plugin.source.release_branch:
-            continue
-        tag = release.get("tag_name", "")
-        if prefix and not tag.startswith(prefix):
-            continue
-        version = tag[len(prefix) :] if prefix else tag
-        return release, version
-    raise PluginReleaseError("Подходящих релизов не найдено")
-
-
-def _match_assets(patterns: Iterable[AssetPattern], release: dict) -> Dict[str, dict]:
-    assets = release.get("assets", [])
-    result: Dict[str, dict] = {}
-    for pattern in patterns:
-        regex = re.compile(pattern.pattern)
-        for asset in assets:
-            if regex.search(asset.get("name", "")):
-                result[pattern.arch] = asset
-                break
-        else:
-            raise PluginReleaseError(
-                f"Для архитектуры {pattern.arch} не найден подходящий бинарник по шаблону {pattern.pattern}"
-            )
-    return result
-
-
-def _download_asset(asset: dict, destination: Path, token: str | None) -> Path:
-    url = asset.get("browser_download_url")
-    if not url:
-        raise PluginReleaseError("У релиза отсутствует ссылка на скачивание бинарника")
-
-    request = Request(url)
-    request.add_header("User-Agent", "mobaxterm-plugin-updater")
-    if token:
-        request.add_header("Authorization", f"Bearer {token}")
-    destination.parent.mkdir(parents=True, exist_ok=True)
-    LOGGER.info("Загрузка %s", url)
+def _origin_repo() -> Tuple[str, str]:
+    url: Optional[str] = None
     try:
-        with urlopen(request) as response, destination.open("wb") as output:
-            shutil.copyfileobj(response, output)
-    except HTTPError as error:
-        raise PluginReleaseError(f"Не удалось скачать файл {url}: {error}") from error
-    return destination
-
-
-def _extract_from_archive(archive_path: Path, pattern: AssetPattern, workdir: Path) -> Path:
-    member_regex = re.compile(pattern.archive_member) if pattern.archive_member else None
-    extracted_dir = workdir / "extracted"
-    extracted_dir.mkdir(parents=True, exist_ok=True)
-
-    if is_zipfile(archive_path):
-        with ZipFile(archive_path) as archive:
-            members = [m for m in archive.namelist() if not m.endswith("/")]
-            target = _select_member(members, member_regex, archive_path)
-            destination = extracted_dir / Path(target).name
-            with archive.open(target) as source, destination.open("wb") as output:
-                shutil.copyfileobj(source, output)
-            return destination
-
-    if tarfile.is_tarfile(archive_path):
-        with tarfile.open(archive_path, "r:*") as archive:
-            members = [m for m in archive.getmembers() if m.isfile()]
-            target_name = _select_member([m.name for m in members], member_regex, archive_path)
-            member = archive.getmember(target_name)
-            destination = extracted_dir / Path(member.name).name
-            with archive.extractfile(member) as source, destination.open("wb") as output:
-                shutil.copyfileobj(source, output)
-            return destination
-
-    if member_regex:
-        raise PluginReleaseError(
-            f"Архив {archive_path} не поддерживается для извлечения, необходимо распаковать вручную"
-        )
-    return archive_path
-
-
-def _select_member(members: Iterable[str], regex: re.Pattern[str] | None, archive_path: Path) -> str:
-    candidates = [m for m in members if not Path(m).name.startswith(".")]
-    if regex:
-        for member in candidates:
-            if regex.search(member):
-                return member
-        raise PluginReleaseError(f"В архиве {archive_path} не найден файл по шаблону {regex.pattern}")
-    if len(candidates) == 1:
-        return candidates[0]
-    raise PluginReleaseError(
-        f"В архиве {archive_path} найдено несколько файлов, укажите 'archive_member' в конфигурации"
-    )
+        url = git_metadata.repository().remote_url("origin")
+    except (GitMetadataError, OSError) as error:
+        LOGGER.debug("Метаданные git недоступны (%s), используется git config", error)
+    if not url:
+        try:
+            url = _git_output("config", "--get", "remote.origin.url")
+        except OSError as error:
+            raise PluginReleaseError("Не удалось получить адрес origin") from error
+    match = re.search(r"github.com[:/](?P<owner>[^/]+)/(?P<repo>[^/.]+)(?:\.git)?", url)
+    if not match:
+        raise PluginReleaseError(f"Не удалось разобрать адрес удалённого репозитория: {url}")
+    return match.group("owner"), match.group("repo")
 
 
-def _prepare_binary(binary_path: Path, pattern: AssetPattern, workdir: Path) -> Path:
-    if binary_path.suffix.lower() in {".zip", ".gz", ".tgz", ".tar"} or is_zipfile(binary_path):
-        return _extract_from_archive(binary_path, pattern, workdir)
-    return binary_path
+def _download_asset(
+    asset: dict,
+    downloader: AssetDownloader,
+    checksums: Optional[ReleaseChecksums] = None,
+) -> CachedBlob:
+    try:
+        expected = checksums.expected(asset.get("name", "")) if checksums else None
+    except DownloadError as error:
+        raise PluginReleaseError(f"Не удалось получить контрольные суммы релиза: {error}") from error
+    try:
+        return downloader.fetch(asset, expected)
+    except DownloadError as error:
+        raise PluginReleaseError(str(error)) from error
 
 
 def _archive_assets(
@@ -182,27 +115,42 @@ def _archive_assets(
     version: str,
     patterns: List[AssetPattern],
     matched_assets: Dict[str, dict],
-    temp_dir: Path,
     output_dir: Path,
     release_url: str | None,
-    token: str | None,
+    downloader: AssetDownloader,
+    workers: int = 4,
+    checksums: Optional[ReleaseChecksums] = None,
 ) -> ReleaseState:
+    from .package_builder import PackageBuildError, PackageBuilder
+
     builder = PackageBuilder(output_dir)
-    built_assets: Dict[str, str] = {}
-    for pattern in patterns:
-        asset = matched_assets[pattern.arch]
-        binary_path = temp_dir / asset["name"]
-        _download_asset(asset, binary_path, token)
-        prepared_binary = _prepare_binary(binary_path, pattern, temp_dir)
-        archive_path = builder.build(
-            plugin,
-            pattern,
-            version=version,
-            binary_path=prepared_binary,
-            release_url=release_url,
-        )
-        built_assets[pattern.arch] = str(archive_path)
-    return ReleaseState(plugin=plugin.name, version=version, assets=built_assets)
+
+    def build_arch(pattern: AssetPattern) -> Tuple[BuiltArchive, CachedBlob]:
+        collector = metrics.active()
+        with collector.span("download", plugin=plugin.name, arch=pattern.arch):
+            blob = _download_asset(matched_assets[pattern.arch], downloader, checksums)
+        try:
+            with collector.span("locate", plugin=plugin.name, arch=pattern.arch):
+                binary = prepare_binary(blob.path, pattern)
+            binary.digest = blob.sha256
+            with collector.span("build", plugin=plugin.name, arch=pattern.arch):
+                archive = builder.build(plugin, pattern, version=version, binary=binary, release_url=release_url)
+        except PackageBuildError as error:
+            raise PluginReleaseError(str(error)) from error
+        finally:
+            downloader.release(blob)
+        return archive, blob
+
+    # zlib отпускает GIL, поэтому скачивание и сжатие разных архитектур идут параллельно.
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(patterns)))) as executor:
+        built = list(executor.map(build_arch, patterns))
+    return ReleaseState(
+        plugin=plugin.name,
+        version=version,
+        assets={pattern.arch: str(archive.path) for pattern, (archive, _) in zip(patterns, built)},
+        digests={pattern.arch: archive.sha256 for pattern, (archive, _) in zip(patterns, built)},
+        source_digests={pattern.arch: blob.sha256 for pattern, (_, blob) in zip(patterns, built)},
+    )
 
 
 def _upload_release(
@@ -214,8 +162,15 @@ def _upload_release(
     release_name: str,
     release_body: str,
     target_branch: str,
+    *,
+    workers: int = 4,
+    prune: bool = False,
+    store: Optional[StateStore] = None,
 ) -> None:
-    tag = f"{plugin.name}-v{state.version}"
+    from .package_builder import file_sha256
+
+    repo_key = f"{repo_owner}/{repo_name}"
+    tag = release_tag(plugin, state.version)
     existing = api.get_release_by_tag(repo_owner, repo_name, tag)
     if existing:
         LOGGER.info("Релиз %s уже существует, загрузка ассетов", tag)
@@ -236,105 +191,225 @@ def _upload_release(
     if not upload_url:
         raise PluginReleaseError("GitHub не вернул ссылку для загрузки ассетов")
 
+    remote_assets = release.get("assets")
+    if existing and remote_assets is None:
+        remote_assets = api.list_release_assets(repo_owner, repo_name, release["id"])
+    remote_by_name = {asset.get("name"): asset for asset in remote_assets or []}
+
+    pending: List[Tuple[str, str]] = []
     for arch, path in state.assets.items():
+        name = Path(path).name
+        remote = remote_by_name.get(name)
+        if remote is None:
+            pending.append((arch, path))
+            continue
+        local_digest = state.digests.get(arch) or file_sha256(Path(path))
+        uploaded = store.uploaded_sha256(repo_key, remote.get("id")) if store else None
+        if same_asset(remote, Path(path).stat().st_size, local_digest, uploaded):
+            LOGGER.info("Ассет %s уже загружен и не изменился", name)
+            continue
+        LOGGER.info("Ассет %s изменился, замена", name)
+        api.delete_release_asset(repo_owner, repo_name, remote["id"])
+        pending.append((arch, path))
+
+    if prune:
+        local_names = {Path(path).name for path in state.assets.values()}
+        for name, remote in remote_by_name.items():
+            if name not in local_names:
+                LOGGER.info("Удаление устаревшего ассета %s", name)
+                api.delete_release_asset(repo_owner, repo_name, remote["id"])
+
+    def upload(item: Tuple[str, str]) -> None:
+        arch, path = item
         LOGGER.info("Загрузка архива для %s: %s", arch, path)
-        api.upload_asset(upload_url, path, content_type="application/zip")
+        uploaded = api.upload_asset(
+            upload_url,
+            path,
+            content_type="application/zip",
+            progress=_progress_logger(Path(path).name),
+        )
+        if store and uploaded.get("id") is not None:
+            digest = state.digests.get(arch) or file_sha256(Path(path))
+            store.record_upload(repo_key, uploaded["id"], Path(path).name, Path(path).stat().st_size, digest)
 
+    if pending:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(pending)))) as executor:
+            list(executor.map(upload, pending))
+
+
+def _progress_logger(name: str, step: int = 10) -> Callable[[int, int], None]:
+    reported = [0]
+
+    def report(sent: int, total: int) -> None:
+        percent = sent * 100 // total if total else 100
+        if percent >= reported[0] + step or sent == total:
+            reported[0] = percent
+            LOGGER.debug("Загрузка %s: %s%% (%s из %s байт)", name, percent, sent, total)
+
+    return report
+
+
+def add_run_arguments(parser: argparse.ArgumentParser) -> None:
+    """Добавляет параметры сборки и публикации, общие для разовых запусков и режима наблюдения."""
 
-def parse_args(argv: List[str]) -> argparse.Namespace:
-    parser = argparse.ArgumentParser(description="Проверка обновлений плагина и формирование релиза")
-    parser.add_argument("--plugin", required=True, help="Название плагина из конфигурации")
     parser.add_argument("--config", default="data/plugins.json", help="Путь до файла конфигурации")
     parser.add_argument("--output-dir", default="dist", help="Каталог для собранных архивов")
     parser.add_argument("--state-dir", default="state", help="Каталог для хранения обработанных версий")
+    parser.add_argument(
+        "--cache-dir",
+        default=".cache/github",
+        help="Каталог кэша ответов GitHub API для условных запросов",
+    )
+    parser.add_argument("--no-cache", action="store_true", help="Не использовать кэш ответов GitHub API")
+    parser.add_argument(
+        "--download-cache-dir",
+        default=".cache/assets",
+        help="Каталог кэша скачанных бинарников",
+    )
+    parser.add_argument(
+        "--download-cache-size",
+        type=int,
+        default=2048,
+        help="Максимальный размер кэша бинарников в мегабайтах",
+    )
+    parser.add_argument(
+        "--api-url",
+        default=os.getenv("GITHUB_API_URL", "https://api.github.com"),
+        help="Адрес GitHub API (по умолчанию GITHUB_API_URL или https://api.github.com)",
+    )
     parser.add_argument("--publish", action="store_true", help="Создать релиз в текущем репозитории")
+    parser.add_argument(
+        "--repo",
+        help="Репозиторий owner/name для публикации вместо адреса origin",
+    )
+    parser.add_argument(
+        "--prune-assets",
+        action="store_true",
+        help="Удалять из публикуемого релиза ассеты, которых нет среди собранных архивов",
+    )
     parser.add_argument("--force", action="store_true", help="Игнорировать уже обработанную версию")
     parser.add_argument(
         "--ignore-branch",
         action="store_true",
         help="Не проверять соответствие текущей ветки требуемой ветке плагина",
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=4,
+        help="Количество плагинов, обрабатываемых одновременно в пакетном режиме",
+    )
+    parser.add_argument(
+        "--arch-jobs",
+        type=int,
+        default=4,
+        help="Количество архитектур одного плагина, собираемых одновременно",
+    )
+    parser.add_argument(
+        "--upload-jobs",
+        type=int,
+        default=4,
+        help="Количество ассетов, загружаемых в релиз одновременно",
+    )
+    parser.add_argument(
+        "--metrics-json",
+        help="Сохранить отчёт о запуске с длительностью этапов и счётчиками в JSON-файл",
+    )
+    parser.add_argument(
+        "--metrics-textfile",
+        help="Сохранить метрики в файл .prom для textfile collector node-exporter",
+    )
     parser.add_argument("--verbose", action="store_true", help="Подробный вывод логов")
-    return parser.parse_args(argv)
 
 
-def main(argv: List[str] | None = None) -> int:
-    args = parse_args(argv or sys.argv[1:])
-    _configure_logging(args.verbose)
+def check_run_arguments(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+    if min(args.jobs, args.arch_jobs, args.upload_jobs) < 1:
+        parser.error("--jobs, --arch-jobs и --upload-jobs должны быть положительными числами")
+    if args.repo and not re.fullmatch(r"[^/\s]+/[^/\s]+", args.repo):
+        parser.error("--repo должен иметь вид owner/name")
 
-    try:
-        config = load_plugins_config(Path(args.config))
-    except ConfigurationError as error:
-        LOGGER.error("%s", error)
-        return 1
 
-    plugin = config.get(args.plugin)
-    if not plugin:
-        LOGGER.error("Плагин %s не найден в конфигурации", args.plugin)
-        return 1
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Проверка обновлений плагина и формирование релиза")
+    selection = parser.add_mutually_exclusive_group(required=True)
+    selection.add_argument("--plugin", help="Название плагина из конфигурации")
+    selection.add_argument("--plugins", help="Список плагинов через запятую для пакетной обработки")
+    selection.add_argument("--all", action="store_true", help="Обработать все плагины из конфигурации")
+    add_run_arguments(parser)
+    parser.add_argument(
+        "--graphql",
+        action="store_true",
+        help="Получать релизы выбранных плагинов пакетными GraphQL-запросами",
+    )
+    parser.add_argument(
+        "--plan",
+        nargs="?",
+        const="text",
+        choices=["text", "json"],
+        help="Показать план запуска без скачивания и сборки (в виде текста или JSON)",
+    )
+    parser.add_argument(
+        "--shard",
+        help="Обработать только часть i/N плагинов (шарды нумеруются с 1), распределённых по истории запусков",
+    )
+    args = parser.parse_args(argv)
+    check_run_arguments(parser, args)
+    if args.shard and args.plugin:
+        parser.error("--shard применяется только вместе с --plugins или --all")
+    if args.shard:
+        from . import sharding
 
-    if not args.ignore_branch:
         try:
-            _ensure_branch(plugin.branch)
-        except PluginReleaseError as error:
-            LOGGER.error("%s", error)
-            return 1
+            args.shard = sharding.parse_shard(args.shard)
+        except ValueError as error:
+            parser.error(str(error))
+    return args
 
-    token = os.getenv("GITHUB_TOKEN")
-    api = GitHubAPI(token=token)
 
-    try:
-        release, version = _latest_release(api, plugin)
-    except (PluginReleaseError, GitHubAPIError) as error:
-        LOGGER.error("%s", error)
-        return 1
+def _select_plugins(args: argparse.Namespace, config: Dict[str, PluginConfig]) -> List[PluginConfig]:
+    if args.all:
+        return list(config.values())
+    names = [args.plugin] if args.plugin else [name.strip() for name in args.plugins.split(",") if name.strip()]
+    missing = [name for name in names if name not in config]
+    if missing:
+        raise PluginReleaseError(f"Плагины не найдены в конфигурации: {', '.join(missing)}")
+    return [config[name] for name in dict.fromkeys(names)]
 
-    state_path = Path(args.state_dir) / f"{plugin.name}.json"
-    previous_state = load_state(state_path)
-    if previous_state and previous_state.version == version and not args.force:
-        LOGGER.info("Актуальная версия %s уже обработана", version)
-        return 0
 
-    patterns = list(plugin.source.asset_patterns)
-    try:
-        matched_assets = _match_assets(patterns, release)
-    except PluginReleaseError as error:
-        LOGGER.error("%s", error)
-        return 1
+def _process_plugin(context: RunContext, plugin: PluginConfig) -> PluginRunResult:
+    with metrics.active().span("latest_release", plugin=plugin.name):
+        release, version = latest_release(context.api, plugin, context.discovered.get(plugin.name))
 
-    temp_dir = Path(".tmp") / f"{plugin.name}-{version}"
-    if temp_dir.exists():
-        shutil.rmtree(temp_dir)
-    temp_dir.mkdir(parents=True, exist_ok=True)
+    previous_state = context.store.latest(plugin.name)
+    if previous_state and previous_state.version == version and not context.force:
+        LOGGER.info("Актуальная версия %s плагина %s уже обработана", version, plugin.name)
+        return PluginRunResult(plugin=plugin.name, status="up-to-date", version=version)
 
-    try:
-        state = _archive_assets(
-            plugin,
-            version,
-            patterns,
-            matched_assets,
-            temp_dir,
-            Path(args.output_dir),
-            release_url=release.get("html_url"),
-            token=token,
-        )
-    finally:
-        shutil.rmtree(temp_dir, ignore_errors=True)
-
-    save_state(state_path, state)
-    LOGGER.info("Сохранено состояние для %s версии %s", plugin.name, version)
+    patterns = list(plugin.source.asset_patterns)
+    matched_assets = match_assets(plugin.source.matcher, release)
+    from .checksums import ReleaseChecksums
+
+    checksums = ReleaseChecksums(release, context.downloader)
+
+    state = _archive_assets(
+        plugin,
+        version,
+        patterns,
+        matched_assets,
+        context.output_dir,
+        release_url=release.get("html_url"),
+        downloader=context.downloader,
+        workers=context.arch_jobs,
+        checksums=checksums,
+    )
 
-    if args.publish:
-        try:
-            owner, repo = _origin_repo()
-        except PluginReleaseError as error:
-            LOGGER.error("%s", error)
-            return 1
+    if context.publish:
+        owner, repo = context.origin or _origin_repo()
         release_name = plugin.release_name_template.format(name=plugin.name, version=version)
         release_body = plugin.release_body_template.format(name=plugin.name, version=version)
-        try:
+        with metrics.active().span("upload", plugin=plugin.name):
             _upload_release(
-                api,
+                context.api,
                 owner,
                 repo,
                 plugin,
@@ -342,15 +417,206 @@ def main(argv: List[str] | None = None) -> int:
                 release_name,
                 release_body,
                 plugin.branch,
+                workers=context.upload_jobs,
+                prune=context.prune_assets,
+                store=context.store,
             )
-        except (PluginReleaseError, GitHubAPIError) as error:
-            LOGGER.error("%s", error)
-            return 1
 
+    # Состояние сохраняется после публикации, чтобы неудачная публикация повторилась при следующем запуске.
+    context.store.save(state)
+    LOGGER.info("Сохранено состояние для %s версии %s", plugin.name, version)
     LOGGER.info("Плагин %s обновлён до версии %s", plugin.name, version)
-    return 0
+    return PluginRunResult(plugin=plugin.name, status="updated", version=version)
+
+
+def _log_stale(context: RunContext, plugins: List[PluginConfig]) -> None:
+    upstream: Dict[str, str] = {}
+    for plugin in plugins:
+        releases = context.discovered.get(plugin.name)
+        if releases is None:
+            continue
+        try:
+            upstream[plugin.name] = select_release(plugin, releases)[1]
+        except PluginReleaseError:
+            continue
+    stale = context.store.stale_plugins(upstream)
+    LOGGER.info("Требуют обновления %s из %s плагинов: %s", len(stale), len(upstream), ", ".join(stale) or "-")
+
+
+def _run_isolated(context: RunContext, plugin: PluginConfig) -> PluginRunResult:
+    collector = metrics.active()
+    started = time.monotonic()
+    with collector.span("plugin", plugin=plugin.name):
+        try:
+            result = _process_plugin(context, plugin)
+        except (PluginReleaseError, GitHubAPIError) as error:
+            LOGGER.error("%s: %s", plugin.name, error)
+            result = PluginRunResult(plugin=plugin.name, status="failed", error=str(error))
+        except Exception as error:  # noqa: BLE001 - сбой одного плагина не должен прерывать пакет
+            LOGGER.exception("Непредвиденная ошибка при обработке %s", plugin.name)
+            result = PluginRunResult(plugin=plugin.name, status="failed", error=repr(error))
+    result.duration = round(time.monotonic() - started, 3)
+    context.store.record_run(plugin.name, result.status, result.duration)
+    collector.inc("plugin_runs_total", status=result.status)
+    return result
+
+
+def run_batch(context: RunContext, plugins: List[PluginConfig], jobs: int) -> List[PluginRunResult]:
+    with ThreadPoolExecutor(max_workers=min(jobs, len(plugins)) or 1) as executor:
+        return list(executor.map(lambda plugin: _run_isolated(context, plugin), plugins))
+
+
+def _print_summary(results: List[PluginRunResult]) -> None:
+    width = max((len(result.plugin) for result in results), default=0)
+    lines = ["Итоги обработки плагинов:"]
+    for result in results:
+        details = result.error if result.failed else (result.version or "")
+        lines.append(f"  {result.plugin:<{width}}  {result.status:<10}  {details}")
+    failed = sum(1 for result in results if result.failed)
+    lines.append(f"Всего: {len(results)}, с ошибками: {failed}")
+    print("\n".join(lines))
+
+
+def create_context(args: argparse.Namespace) -> RunContext:
+    """Создаёт клиент API, загрузчик и хранилище состояния по параметрам запуска."""
+
+    token = os.getenv("GITHUB_TOKEN")
+    api = GitHubAPI(
+        token=token,
+        api_url=args.api_url,
+        cache_dir=None if args.no_cache else Path(args.cache_dir),
+    )
+    context = RunContext(
+        api=api,
+        downloader=AssetDownloader(
+            Path(args.download_cache_dir),
+            api.pool,
+            token=token,
+            max_cache_bytes=args.download_cache_size * 1024 * 1024,
+        ),
+        output_dir=Path(args.output_dir),
+        store=StateStore.open(Path(args.state_dir)),
+        force=args.force,
+        publish=args.publish,
+        arch_jobs=args.arch_jobs,
+        upload_jobs=args.upload_jobs,
+        prune_assets=args.prune_assets,
+    )
+    if args.repo:
+        owner, repo = args.repo.split("/", 1)
+        context.origin = (owner, repo)
+    elif args.publish:
+        context.origin = _origin_repo()
+    return context
+
+
+def export_metrics(args: argparse.Namespace, context: RunContext, results: List[PluginRunResult]) -> None:
+    collector = metrics.active()
+    if not collector.enabled:
+        return
+    for resource, budget in context.api.rate_limits.items():
+        if budget.remaining is not None:
+            collector.set("rate_limit_remaining", budget.remaining, resource=resource)
+        if budget.limit is not None:
+            collector.set("rate_limit_limit", budget.limit, resource=resource)
+    try:
+        if args.metrics_json:
+            collector.write_json(Path(args.metrics_json), results=[asdict(result) for result in results])
+        if args.metrics_textfile:
+            collector.write_prometheus(Path(args.metrics_textfile))
+    except OSError as error:
+        LOGGER.warning("Не удалось сохранить метрики: %s", error)
+
+
+def main(argv: List[str] | None = None) -> int:
+    argv = argv or sys.argv[1:]
+    if argv and argv[0] == "watch":
+        from .watch import main as watch_main
+
+        return watch_main(argv[1:])
+    if argv and argv[0] == "bench":
+        from .compression_bench import main as bench_main
+
+        return bench_main(argv[1:])
+    if argv and argv[0] == "merge":
+        from .sharding import main as merge_main
+
+        return merge_main(argv[1:])
+    if argv and argv[0] == "readme":
+        from .catalogue import main as readme_main
+
+        return readme_main(argv[1:])
+
+    args = parse_args(argv)
+    _configure_logging(args.verbose)
+    if args.metrics_json or args.metrics_textfile:
+        metrics.enable()
+
+    try:
+        config = load_plugins_config(Path(args.config))
+        plugins = _select_plugins(args, config)
+        # Плагины пакетного запуска относятся к разным веткам, поэтому ветка
+        # проверяется один раз и только при обработке одного плагина.
+        if args.plugin and not args.ignore_branch:
+            _ensure_branch(plugins[0].branch)
+    except (ConfigurationError, PluginReleaseError) as error:
+        LOGGER.error("%s", error)
+        return 1
+
+    try:
+        context = create_context(args)
+    except PluginReleaseError as error:
+        LOGGER.error("%s", error)
+        return 1
+    api = context.api
+    token = os.getenv("GITHUB_TOKEN")
+
+    if args.shard:
+        from . import sharding
+
+        index, count = args.shard
+        selected = set(
+            sharding.select_shard([plugin.name for plugin in plugins], context.store.run_durations(), index, count)
+        )
+        plugins = [plugin for plugin in plugins if plugin.name in selected]
+
+    if args.graphql:
+        if token:
+            from .release_discovery import discover_latest_releases
+
+            try:
+                context.discovered = discover_latest_releases(api, plugins)
+                _log_stale(context, plugins)
+            except GitHubAPIError as error:
+                LOGGER.warning("Не удалось получить релизы через GraphQL, используется REST API: %s", error)
+        else:
+            LOGGER.warning("GraphQL API требует GITHUB_TOKEN, используется REST API")
+
+    if args.plan:
+        # План нужен только с --plan, поэтому planner импортируется в месте использования.
+        from .planner import format_plan, plan_json, plan_plugins
+
+        plans = plan_plugins(context, plugins, args.jobs)
+        print(plan_json(plans) if args.plan == "json" else format_plan(plans))
+        return 1 if any(plan.status == "failed" for plan in plans) else 0
+
+    if args.plugin:
+        results = [_run_isolated(context, plugins[0])]
+    else:
+        results = run_batch(context, plugins, args.jobs)
+        _print_summary(results)
+        budget = context.api.rate_limit
+        if budget.remaining is not None:
+            LOGGER.info("Остаток лимита GitHub API: %s из %s", budget.remaining, budget.limit)
+    if args.shard:
+        from .sharding import write_report
+
+        index, count = args.shard
+        path = write_report(Path(args.state_dir), index, count, [plugin.name for plugin in plugins], results)
+        LOGGER.info("Отчёт шарда сохранён в %s", path)
+    export_metrics(args, context, results)
+    return 1 if any(result.failed for result in results) else 0
 
 
 if __name__ == "__main__":
     sys.exit(main())
-
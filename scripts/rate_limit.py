@@ -0,0 +1,180 @@
+"""Учёт лимитов GitHub API и повтор запросов с экспоненциальной задержкой."""
+from __future__ import annotations
+
+import hashlib
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass, replace
+from email.message import Message
+from typing import Callable, Dict, Mapping, Optional, Union
+
+LOGGER = logging.getLogger(__name__)
+
+_RETRY_STATUSES = {500, 502, 503, 504}
+
+# Заголовки ответа: словарь или http.client.HTTPMessage.
+Headers = Union[Mapping[str, str], Message]
+
+
+@dataclass(frozen=True)
+class RateLimitBudget:
+    """Остаток лимита запросов для одного ресурса GitHub API."""
+
+    resource: str
+    limit: Optional[int] = None
+    remaining: Optional[int] = None
+    reset_at: Optional[float] = None
+
+    def seconds_to_reset(self, now: Optional[float] = None) -> float:
+        if self.reset_at is None:
+            return 0.0
+        return max(0.0, self.reset_at - (time.time() if now is None else now))
+
+
+def _int_header(headers: Headers, name: str) -> Optional[int]:
+    value = headers.get(name)
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class RateLimitExceeded(RuntimeError):
+    """Лимит запросов исчерпан, а до его сброса слишком долго ждать."""
+
+    def __init__(self, budget: RateLimitBudget) -> None:
+        super().__init__(
+            f"Лимит запросов GitHub API ({budget.resource}) исчерпан, "
+            f"сброс через {budget.seconds_to_reset():.0f} с"
+        )
+        self.budget = budget
+
+
+class RateLimitScheduler:
+    """Планировщик запросов одного токена.
+
+    Пока лимита достаточно, запросы выполняются без задержек. Когда остаток
+    опускается ниже доли ``low_watermark`` от лимита, оставшиеся запросы равномерно
+    распределяются до момента сброса лимита; при исчерпании лимита запросы
+    ждут сброса, если он наступит не позже чем через ``max_wait`` секунд.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        max_wait: float = 900.0,
+        low_watermark: float = 0.1,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.max_retries = max_retries
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+        self._max_wait = max_wait
+        self._low_watermark = low_watermark
+        self._clock = clock
+        self._sleep = sleep
+        self._budgets: Dict[str, RateLimitBudget] = {}
+        self._next_slot: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def budget(self, resource: str = "core") -> RateLimitBudget:
+        """Последний известный остаток лимита для ресурса."""
+
+        with self._lock:
+            return self._budgets.get(resource, RateLimitBudget(resource=resource))
+
+    def budgets(self) -> Dict[str, RateLimitBudget]:
+        with self._lock:
+            return dict(self._budgets)
+
+    def acquire(self, resource: str = "core") -> None:
+        """Ожидает слот для очередного запроса к ресурсу."""
+
+        with self._lock:
+            now = self._clock()
+            budget = self._budgets.get(resource)
+            delay = 0.0
+            if budget and budget.remaining is not None and budget.reset_at is not None and budget.reset_at > now:
+                if budget.remaining <= 0:
+                    delay = budget.reset_at - now
+                    if delay > self._max_wait:
+                        raise RateLimitExceeded(budget)
+                elif budget.limit and budget.remaining < budget.limit * self._low_watermark:
+                    interval = (budget.reset_at - now) / budget.remaining
+                    slot = max(now, self._next_slot.get(resource, now))
+                    self._next_slot[resource] = slot + interval
+                    delay = slot - now
+                if budget.remaining > 0:
+                    self._budgets[resource] = replace(budget, remaining=budget.remaining - 1)
+        if delay > 0:
+            LOGGER.info("Ожидание %.1f с перед запросом к GitHub API (%s)", delay, resource)
+            self._sleep(delay)
+
+    def update(self, headers: Headers) -> None:
+        """Обновляет остаток лимита по заголовкам X-RateLimit-* ответа."""
+
+        remaining = _int_header(headers, "X-RateLimit-Remaining")
+        if remaining is None:
+            return
+        resource = headers.get("X-RateLimit-Resource") or "core"
+        reset = _int_header(headers, "X-RateLimit-Reset")
+        budget = RateLimitBudget(
+            resource=resource,
+            limit=_int_header(headers, "X-RateLimit-Limit"),
+            remaining=remaining,
+            reset_at=float(reset) if reset is not None else None,
+        )
+        with self._lock:
+            self._budgets[resource] = budget
+
+    def retry_delay(
+        self,
+        attempt: int,
+        status: int,
+        headers: Headers,
+        message: str = "",
+    ) -> Optional[float]:
+        """Возвращает задержку перед повтором запроса или None, если повтор не нужен."""
+
+        if attempt >= self.max_retries:
+            return None
+        retry_after = _int_header(headers, "Retry-After")
+        if status in {403, 429}:
+            if retry_after is not None:
+                return min(float(retry_after), self._max_wait)
+            if headers.get("X-RateLimit-Remaining") == "0":
+                reset = _int_header(headers, "X-RateLimit-Reset")
+                if reset is None:
+                    return None
+                delay = max(0.0, reset - self._clock()) + 1.0
+                return delay if delay <= self._max_wait else None
+            if status == 403 and "secondary rate limit" not in message.lower():
+                return None
+        elif status not in _RETRY_STATUSES:
+            return None
+        ceiling = min(self._max_delay, self._base_delay * (2**attempt))
+        return random.uniform(ceiling / 2, ceiling)
+
+    def wait(self, delay: float) -> None:
+        self._sleep(delay)
+
+
+_SCHEDULERS: Dict[str, RateLimitScheduler] = {}
+_SCHEDULERS_LOCK = threading.Lock()
+
+
+def scheduler_for(token: Optional[str]) -> RateLimitScheduler:
+    """Общий для процесса планировщик, привязанный к токену."""
+
+    key = hashlib.sha256(token.encode("utf-8")).hexdigest() if token else "anonymous"
+    with _SCHEDULERS_LOCK:
+        scheduler = _SCHEDULERS.get(key)
+        if scheduler is None:
+            scheduler = _SCHEDULERS[key] = RateLimitScheduler()
+        return scheduler
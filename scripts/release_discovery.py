@@ -0,0 +1,95 @@
+"""Пакетное получение последних релизов многих репозиториев через GitHub GraphQL."""
+from __future__ import annotations
+
+import logging
+from typing import Dict, Iterable, List, Optional
+
+from .github_api import GitHubAPI
+from .models import PluginConfig
+
+LOGGER = logging.getLogger(__name__)
+
+_RELEASE_FIELDS = """
+      nodes {
+        tagName
+        isDraft
+        isPrerelease
+        url
+        releaseAssets(first: $assets) {
+          nodes { name size downloadUrl updatedAt digest }
+        }
+      }
+"""
+
+
+def supports_graphql(plugin: PluginConfig) -> bool:
+    """GraphQL не отдаёт target_commitish, поэтому фильтр по ветке требует REST."""
+
+    return plugin.source.type == "github" and not plugin.source.release_branch
+
+
+def _build_query(count: int) -> str:
+    variables = ", ".join(f"$owner{index}: String!, $name{index}: String!" for index in range(count))
+    aliases = "\n".join(
+        f"  r{index}: repository(owner: $owner{index}, name: $name{index}) {{\n"
+        f"    releases(first: $releases, orderBy: {{field: CREATED_AT, direction: DESC}}) {{{_RELEASE_FIELDS}    }}\n"
+        "  }"
+        for index in range(count)
+    )
+    return f"query({variables}, $releases: Int!, $assets: Int!) {{\n{aliases}\n}}"
+
+
+def _to_rest_release(node: dict) -> dict:
+    """Приводит узел GraphQL к форме ответа REST API, которую ожидает остальной код."""
+
+    return {
+        "tag_name": node.get("tagName", ""),
+        "draft": bool(node.get("isDraft")),
+        "prerelease": bool(node.get("isPrerelease")),
+        "html_url": node.get("url"),
+        "assets": [
+            {
+                "name": asset.get("name"),
+                "size": asset.get("size"),
+                "browser_download_url": asset.get("downloadUrl"),
+                "updated_at": asset.get("updatedAt"),
+                "digest": asset.get("digest"),
+            }
+            for asset in (node.get("releaseAssets") or {}).get("nodes", [])
+        ],
+    }
+
+
+def discover_latest_releases(
+    api: GitHubAPI,
+    plugins: Iterable[PluginConfig],
+    *,
+    per_repo: int = 10,
+    assets_per_release: int = 100,
+    batch_size: int = 50,
+) -> Dict[str, List[dict]]:
+    """Возвращает последние ``per_repo`` релизов для каждого плагина.
+
+    Репозитории запрашиваются пачками по ``batch_size`` в одном GraphQL-запросе
+    с алиасами. Плагины, для которых данные получить не удалось, в результат
+    не попадают и должны обрабатываться через REST API.
+    """
+
+    candidates = [plugin for plugin in plugins if supports_graphql(plugin)]
+    result: Dict[str, List[dict]] = {}
+    for start in range(0, len(candidates), batch_size):
+        batch = candidates[start : start + batch_size]
+        variables: Dict[str, object] = {"releases": per_repo, "assets": assets_per_release}
+        for index, plugin in enumerate(batch):
+            variables[f"owner{index}"] = plugin.source.owner
+            variables[f"name{index}"] = plugin.source.repo
+        data = api.graphql(_build_query(len(batch)), variables)
+        for index, plugin in enumerate(batch):
+            repository: Optional[dict] = data.get(f"r{index}")
+            if not repository:
+                LOGGER.warning("GraphQL не вернул релизы %s/%s", plugin.source.owner, plugin.source.repo)
+                continue
+            nodes = (repository.get("releases") or {}).get("nodes", [])
+            result[plugin.name] = [_to_rest_release(node) for node in nodes]
+    LOGGER.info("Через GraphQL получены релизы %s из %s плагинов", len(result), len(candidates))
+    return result
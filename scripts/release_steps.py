@@ -0,0 +1,161 @@
+"""Общие шаги обработки релиза плагина.
+
+Выбор версии исходного проекта, сопоставление ассетов архитектурам,
+подготовка бинарника к упаковке и сравнение архивов с ассетами релиза.
+Используются и при обработке плагинов, и при построении плана ``--plan``.
+"""
+from __future__ import annotations
+
+import logging
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+from .downloader import AssetDownloader
+from .github_api import GitHubAPI, GitHubAPIError
+from .models import AssetMatcher, AssetPattern, PluginConfig
+from .state import StateStore
+from .versioning import ReleaseSelector
+
+if TYPE_CHECKING:
+    from .package_builder import BinarySource
+
+LOGGER = logging.getLogger(__name__)
+
+
+class PluginReleaseError(RuntimeError):
+    """Базовая ошибка сборки релиза плагина."""
+
+
+def latest_release(
+    api: GitHubAPI,
+    plugin: PluginConfig,
+    releases: Optional[List[dict]] = None,
+) -> Tuple[dict, str]:
+    if releases is not None:
+        try:
+            return select_release(plugin, releases)
+        except PluginReleaseError:
+            LOGGER.debug("Среди полученных заранее релизов %s нет подходящих, запрос через REST", plugin.name)
+    try:
+        return select_release(plugin, api.iter_releases(plugin.source.owner, plugin.source.repo))
+    except GitHubAPIError as error:
+        if error.status == 200:
+            raise PluginReleaseError("GitHub API вернул неожиданный ответ при запросе релизов") from error
+        raise
+
+
+def release_version(plugin: PluginConfig, release: dict) -> Optional[str]:
+    if release.get("draft") or release.get("prerelease"):
+        return None
+    if plugin.source.release_branch and release.get("target_commitish") != plugin.source.release_branch:
+        return None
+    tag = release.get("tag_name", "")
+    prefix = plugin.source.tag_prefix
+    if prefix and not tag.startswith(prefix):
+        return None
+    return tag[len(prefix) :] if prefix else tag
+
+
+def select_release(plugin: PluginConfig, releases: Iterable[dict]) -> Tuple[dict, str]:
+    selected = ReleaseSelector(lambda release: release_version(plugin, release)).select(releases)
+    if selected is None:
+        raise PluginReleaseError("Подходящих релизов не найдено")
+    return selected
+
+
+def match_assets(matcher: AssetMatcher, release: dict) -> Dict[str, dict]:
+    found = matcher.classify(release.get("assets", []))
+    result: Dict[str, dict] = {}
+    for pattern in matcher.patterns:
+        if pattern.arch not in found:
+            raise PluginReleaseError(
+                f"Для архитектуры {pattern.arch} не найден подходящий бинарник по шаблону {pattern.pattern}"
+            )
+        result[pattern.arch] = found[pattern.arch]
+    return result
+
+
+def locate_in_archive(archive_path: Path, pattern: AssetPattern) -> BinarySource:
+    import tarfile
+    from zipfile import ZipFile, is_zipfile
+
+    from .package_builder import BinarySource
+
+    member_regex = pattern.member_regex
+
+    if is_zipfile(archive_path):
+        with ZipFile(archive_path) as archive:
+            members = [m for m in archive.namelist() if not m.endswith("/")]
+            target = select_member(members, member_regex, archive_path)
+            return BinarySource(path=archive_path, kind="zip", member=target)
+
+    if tarfile.is_tarfile(archive_path):
+        return BinarySource(path=archive_path, kind="tar", member_pattern=member_regex)
+
+    if member_regex:
+        raise PluginReleaseError(
+            f"Архив {archive_path} не поддерживается для извлечения, необходимо распаковать вручную"
+        )
+    return BinarySource(path=archive_path)
+
+
+def select_member(members: Iterable[str], regex: re.Pattern[str] | None, archive_path: Path) -> str:
+    candidates = [m for m in members if not Path(m).name.startswith(".")]
+    if regex:
+        for member in candidates:
+            if regex.search(member):
+                return member
+        raise PluginReleaseError(f"В архиве {archive_path} не найден файл по шаблону {regex.pattern}")
+    if len(candidates) == 1:
+        return candidates[0]
+    raise PluginReleaseError(
+        f"В архиве {archive_path} найдено несколько файлов, укажите 'archive_member' в конфигурации"
+    )
+
+
+def prepare_binary(binary_path: Path, pattern: AssetPattern) -> BinarySource:
+    from zipfile import is_zipfile
+
+    from .package_builder import BinarySource
+
+    if binary_path.suffix.lower() in {".zip", ".gz", ".tgz", ".tar"} or is_zipfile(binary_path):
+        return locate_in_archive(binary_path, pattern)
+    return BinarySource(path=binary_path)
+
+
+def release_tag(plugin: PluginConfig, version: str) -> str:
+    return f"{plugin.name}-v{version}"
+
+
+def same_asset(remote: dict, size: int, local_digest: str, uploaded_digest: Optional[str] = None) -> bool:
+    """Совпадает ли ассет релиза с локальным архивом.
+
+    Без ``digest`` от GitHub сравнивается SHA-256, записанный при загрузке
+    ассета (``uploaded_digest``); если он неизвестен, ассет считается изменённым.
+    """
+
+    if remote.get("size") != size:
+        return False
+    algorithm, _, remote_digest = (remote.get("digest") or "").partition(":")
+    if algorithm == "sha256" and remote_digest:
+        return remote_digest.lower() == local_digest
+    return uploaded_digest == local_digest
+
+
+@dataclass
+class RunContext:
+    """Общие для всех плагинов параметры запуска."""
+
+    api: GitHubAPI
+    downloader: AssetDownloader
+    output_dir: Path
+    store: StateStore
+    force: bool = False
+    publish: bool = False
+    arch_jobs: int = 4
+    upload_jobs: int = 4
+    prune_assets: bool = False
+    origin: Optional[Tuple[str, str]] = None
+    discovered: Dict[str, List[dict]] = field(default_factory=dict)
@@ -0,0 +1,228 @@
+"""Распределение плагинов между несколькими запусками CI и объединение результатов.
+
+С ``--shard i/N`` запуск обрабатывает только свою часть плагинов. Разбиение
+детерминировано: используется rendezvous hashing с ограничением загрузки.
+Каждый плагин ранжирует шарды по хэшу своего имени и номера шарда и попадает в
+первый по рангу шард, суммарная длительность которого по истории запусков не
+превысит ограничения; плагины раскладываются от самых долгих к самым коротким.
+Поэтому все узлы, начавшие с одного и того же состояния, получают одинаковое
+разбиение без обмена данными, а добавление или удаление плагина переносит в
+другие шарды лишь немногие плагины. Каждый шард сохраняет отчёт
+``shards/shard-<i>-of-<N>.json`` в каталоге состояния; команда ``merge``
+переносит частичные базы в основную и выводит общую сводку::
+
+    python -m scripts.plugin_release --all --shard 2/4 --publish
+    python -m scripts.plugin_release merge --state-dir state shard-1/state shard-2/state ...
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import logging
+import math
+import re
+import statistics
+import sys
+from dataclasses import asdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from .atomic import atomic_write
+from .models import PluginRunResult
+from .state import STATE_DB_NAME, StateStore
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_WEIGHT = 1.0
+# Насколько загрузка шарда может превышать равную долю ради устойчивости разбиения.
+LOAD_SLACK = 0.1
+# Отчёты лежат в отдельном подкаталоге: в корне каталога состояния файлы *.json
+# считаются состоянием плагинов старого формата.
+REPORTS_DIR = "shards"
+_SHARD_PATTERN = re.compile(r"(\d+)/(\d+)$")
+
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """Разбирает ``i/N`` (шарды нумеруются с единицы)."""
+
+    match = _SHARD_PATTERN.match(value.strip())
+    if not match:
+        raise ValueError(f"Шард должен иметь вид i/N, получено {value!r}")
+    index, count = int(match.group(1)), int(match.group(2))
+    if not 1 <= index <= count:
+        raise ValueError(f"Номер шарда должен быть от 1 до {count}, получено {index}")
+    return index, count
+
+
+def _rendezvous(name: str, shard: int) -> int:
+    return int.from_bytes(hashlib.sha256(f"{name}:{shard}".encode("utf-8")).digest()[:8], "big")
+
+
+def plugin_weights(names: Iterable[str], durations: Mapping[str, float]) -> Dict[str, float]:
+    """Вес плагина — средняя длительность его запусков; без истории — медиана известных."""
+
+    known = [value for value in durations.values() if value > 0]
+    default = statistics.median(known) if known else DEFAULT_WEIGHT
+    return {name: durations.get(name) or default for name in names}
+
+
+def partition(weights: Mapping[str, float], count: int) -> List[List[str]]:
+    """Раскладывает плагины по ``count`` шардам с близкой суммарной длительностью.
+
+    Загрузка шарда ограничена равной долей общей длительности с запасом
+    ``LOAD_SLACK`` (но не меньше веса самого долгого плагина). Запас — цена
+    устойчивости: жадное разбиение «в наименее загруженный шард» балансирует
+    точнее, но при добавлении одного плагина перекладывает заметную часть
+    остальных, а здесь самый загруженный шард бывает длиннее не более чем на
+    ``LOAD_SLACK``. Если плагин не помещается ни в один шард, он попадает в
+    наименее загруженный.
+    """
+
+    total = math.fsum(weights.values())
+    capacity = max(total / count * (1 + LOAD_SLACK), max(weights.values(), default=0.0))
+    loads = [0.0] * count
+    shards: List[List[str]] = [[] for _ in range(count)]
+    for name in sorted(weights, key=lambda item: (-weights[item], item)):
+        ranked = sorted(range(count), key=lambda shard: _rendezvous(name, shard), reverse=True)
+        fitting = [shard for shard in ranked if loads[shard] + weights[name] <= capacity]
+        target = fitting[0] if fitting else min(ranked, key=lambda shard: loads[shard])
+        shards[target].append(name)
+        loads[target] += weights[name]
+    return [sorted(shard) for shard in shards]
+
+
+def select_shard(names: Sequence[str], durations: Mapping[str, float], index: int, count: int) -> List[str]:
+    """Имена плагинов шарда ``index`` из ``count`` в исходном порядке."""
+
+    weights = plugin_weights(names, durations)
+    selected = set(partition(weights, count)[index - 1])
+    total = sum(weights.values())
+    share = sum(weights[name] for name in selected)
+    LOGGER.info(
+        "Шард %s/%s: %s из %s плагинов, ожидаемая длительность %.1f с из %.1f с",
+        index,
+        count,
+        len(selected),
+        len(names),
+        share,
+        total,
+    )
+    return [name for name in names if name in selected]
+
+
+def report_path(state_dir: Path, index: int, count: int) -> Path:
+    return state_dir / REPORTS_DIR / f"shard-{index}-of-{count}.json"
+
+
+def write_report(
+    state_dir: Path,
+    index: int,
+    count: int,
+    plugins: Sequence[str],
+    results: Sequence[PluginRunResult],
+) -> Path:
+    """Сохраняет отчёт шарда атомарной заменой файла."""
+
+    path = report_path(state_dir, index, count)
+    payload = {
+        "shard": index,
+        "shards": count,
+        "plugins": list(plugins),
+        "results": [asdict(item) for item in results],
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with atomic_write(path, "w", encoding="utf-8") as output:
+        json.dump(payload, output, ensure_ascii=False, indent=2)
+    return path
+
+
+def _load_reports(directory: Path) -> List[dict]:
+    reports = []
+    for path in sorted((directory / REPORTS_DIR).glob("shard-*-of-*.json")):
+        try:
+            reports.append(json.loads(path.read_text(encoding="utf-8")))
+        except (OSError, ValueError) as error:
+            LOGGER.warning("Не удалось прочитать отчёт шарда %s: %s", path, error)
+    return reports
+
+
+def _format_summary(results: List[dict], missing: List[int], duplicates: List[str]) -> str:
+    width = max((len(item["plugin"]) for item in results), default=0)
+    lines = ["Итоги обработки плагинов по всем шардам:"]
+    for item in sorted(results, key=lambda value: value["plugin"]):
+        details = item.get("error") if item["status"] == "failed" else (item.get("version") or "")
+        lines.append(f"  {item['plugin']:<{width}}  {item['status']:<10}  шард {item['shard']:<3} {details}")
+    updated = sum(1 for item in results if item["status"] == "updated")
+    failed = sum(1 for item in results if item["status"] == "failed")
+    lines.append(f"Всего: {len(results)}, обновлено: {updated}, с ошибками: {failed}")
+    if missing:
+        lines.append(f"Нет отчётов шардов: {', '.join(map(str, missing))}")
+    if duplicates:
+        lines.append(f"Обработаны несколькими шардами: {', '.join(duplicates)}")
+    return "\n".join(lines)
+
+
+def merge_shards(state_dir: Path, shard_dirs: Sequence[Path]) -> Tuple[List[dict], List[int], List[str]]:
+    """Переносит частичные базы шардов в основную и собирает их отчёты.
+
+    Возвращает итоги по плагинам, номера шардов без отчётов и плагины,
+    обработанные более чем одним шардом.
+    """
+
+    store = StateStore.open(state_dir)
+    results: List[dict] = []
+    seen: Dict[int, int] = {}
+    counts = set()
+    owners: Dict[str, int] = {}
+    duplicates = []
+    for directory in shard_dirs:
+        database = directory / STATE_DB_NAME
+        if database.exists():
+            changed = store.merge(database)
+            LOGGER.info("Состояние шарда %s перенесено, обновлены плагины: %s", directory, ", ".join(changed) or "-")
+        else:
+            LOGGER.warning("В каталоге %s нет базы состояния %s", directory, STATE_DB_NAME)
+        for report in _load_reports(directory):
+            shard, count = report["shard"], report["shards"]
+            seen[shard] = count
+            counts.add(count)
+            for plugin in report.get("plugins", []):
+                if owners.setdefault(plugin, shard) != shard:
+                    duplicates.append(plugin)
+            results.extend({**item, "shard": shard} for item in report.get("results", []))
+    if len(counts) > 1:
+        LOGGER.warning("Отчёты шардов получены для разного числа шардов: %s", ", ".join(map(str, sorted(counts))))
+    expected = max(counts, default=0)
+    missing = [index for index in range(1, expected + 1) if index not in seen]
+    return results, missing, sorted(set(duplicates))
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="plugin_release merge",
+        description="Объединение состояния и отчётов шардов в основное состояние",
+    )
+    parser.add_argument("shard_dirs", nargs="+", help="Каталоги состояния шардов")
+    parser.add_argument("--state-dir", default="state", help="Каталог основного состояния")
+    parser.add_argument("--summary-json", help="Сохранить общую сводку в JSON-файл")
+    parser.add_argument("--verbose", action="store_true", help="Подробный вывод логов")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv if argv is not None else sys.argv[1:])
+    level = logging.DEBUG if args.verbose else logging.INFO
+    logging.basicConfig(level=level, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+
+    results, missing, duplicates = merge_shards(Path(args.state_dir), [Path(value) for value in args.shard_dirs])
+    print(_format_summary(results, missing, duplicates))
+    if args.summary_json:
+        payload = {"results": results, "missing_shards": missing, "duplicates": duplicates}
+        Path(args.summary_json).write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+    failed = any(item["status"] == "failed" for item in results)
+    return 1 if failed or missing else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
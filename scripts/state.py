@@ -1,26 +1,334 @@
-"""Загрузка и сохранение состояния обработанных релизов."""
+"""Хранилище состояния обработанных релизов на базе SQLite."""
 from __future__ import annotations
 
 import json
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Iterator, List, Mapping, Optional
 
 from .models import ReleaseState
 
+LOGGER = logging.getLogger(__name__)
+
+STATE_DB_NAME = "state.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS releases (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    plugin TEXT NOT NULL,
+    version TEXT NOT NULL,
+    processed_at REAL NOT NULL,
+    UNIQUE (plugin, version)
+);
+CREATE TABLE IF NOT EXISTS release_assets (
+    release_id INTEGER NOT NULL REFERENCES releases (id) ON DELETE CASCADE,
+    arch TEXT NOT NULL,
+    path TEXT NOT NULL,
+    sha256 TEXT,
+    source_sha256 TEXT,
+    PRIMARY KEY (release_id, arch)
+);
+CREATE TABLE IF NOT EXISTS current_releases (
+    plugin TEXT PRIMARY KEY,
+    release_id INTEGER NOT NULL REFERENCES releases (id)
+);
+CREATE INDEX IF NOT EXISTS releases_by_plugin ON releases (plugin, processed_at);
+CREATE TABLE IF NOT EXISTS plugin_runs (
+    plugin TEXT NOT NULL,
+    finished_at REAL NOT NULL,
+    duration REAL NOT NULL,
+    status TEXT NOT NULL,
+    PRIMARY KEY (plugin, finished_at)
+);
+CREATE TABLE IF NOT EXISTS uploaded_assets (
+    repo TEXT NOT NULL,
+    asset_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    uploaded_at REAL NOT NULL,
+    PRIMARY KEY (repo, asset_id)
+);
+"""
+
 
 def load_state(path: Path) -> Optional[ReleaseState]:
+    """Читает состояние из JSON-файла прежнего формата (``state/<plugin>.json``)."""
+
     if not path.exists():
         return None
     raw = json.loads(path.read_text(encoding="utf-8"))
-    return ReleaseState(plugin=raw["plugin"], version=raw["version"], assets=raw.get("assets", {}))
+    return ReleaseState(
+        plugin=raw["plugin"],
+        version=raw["version"],
+        assets=raw.get("assets", {}),
+        digests=raw.get("digests", {}),
+        source_digests=raw.get("source_digests", {}),
+    )
+
+
+class StateStore:
+    """Состояние всех плагинов в одной базе SQLite.
+
+    Для каждого плагина хранится история обработанных версий с путями и
+    контрольными суммами архивов. Запись выполняется в транзакциях
+    ``BEGIN IMMEDIATE``; каждый поток работает через собственное соединение,
+    база открыта в режиме WAL, поэтому хранилищем можно пользоваться из
+    нескольких потоков и процессов одновременно.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self._path = path
+        self._local = threading.local()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        connection = self._connection()
+        connection.executescript(_SCHEMA)
+        columns = {row["name"] for row in connection.execute("PRAGMA table_info(release_assets)")}
+        if "source_sha256" not in columns:
+            try:
+                connection.execute("ALTER TABLE release_assets ADD COLUMN source_sha256 TEXT")
+            except sqlite3.OperationalError as error:
+                # Столбец мог добавить параллельно запущенный процесс.
+                if "duplicate column" not in str(error):
+                    raise
+
+    @classmethod
+    def open(cls, state_dir: Path) -> "StateStore":
+        """Открывает хранилище каталога состояния, импортируя JSON-файлы прежнего формата."""
+
+        store = cls(state_dir / STATE_DB_NAME)
+        store.import_legacy(state_dir)
+        return store
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self._path, timeout=30, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA foreign_keys=ON")
+            self._local.connection = connection
+        return connection
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def _load_release(self, connection: sqlite3.Connection, row: sqlite3.Row) -> ReleaseState:
+        assets: Dict[str, str] = {}
+        digests: Dict[str, str] = {}
+        source_digests: Dict[str, str] = {}
+        for asset in connection.execute(
+            "SELECT arch, path, sha256, source_sha256 FROM release_assets WHERE release_id = ? ORDER BY rowid",
+            (row["id"],),
+        ):
+            assets[asset["arch"]] = asset["path"]
+            if asset["sha256"]:
+                digests[asset["arch"]] = asset["sha256"]
+            if asset["source_sha256"]:
+                source_digests[asset["arch"]] = asset["source_sha256"]
+        return ReleaseState(
+            plugin=row["plugin"],
+            version=row["version"],
+            assets=assets,
+            digests=digests,
+            source_digests=source_digests,
+        )
+
+    def latest(self, plugin: str) -> Optional[ReleaseState]:
+        """Последняя обработанная версия плагина."""
+
+        connection = self._connection()
+        row = connection.execute(
+            "SELECT r.* FROM current_releases c JOIN releases r ON r.id = c.release_id WHERE c.plugin = ?",
+            (plugin,),
+        ).fetchone()
+        return self._load_release(connection, row) if row else None
+
+    def latest_all(self) -> Dict[str, ReleaseState]:
+        connection = self._connection()
+        rows = connection.execute(
+            "SELECT r.* FROM current_releases c JOIN releases r ON r.id = c.release_id ORDER BY r.plugin"
+        ).fetchall()
+        return {row["plugin"]: self._load_release(connection, row) for row in rows}
+
+    def history(self, plugin: str) -> List[ReleaseState]:
+        """Все обработанные версии плагина, от новых к старым."""
+
+        connection = self._connection()
+        rows = connection.execute(
+            "SELECT * FROM releases WHERE plugin = ? ORDER BY processed_at DESC, id DESC", (plugin,)
+        ).fetchall()
+        return [self._load_release(connection, row) for row in rows]
+
+    def save(self, state: ReleaseState, processed_at: Optional[float] = None) -> None:
+        """Сохраняет версию плагина и делает её текущей в одной транзакции."""
+
+        timestamp = time.time() if processed_at is None else processed_at
+        with self._transaction() as connection:
+            connection.execute(
+                "INSERT INTO releases (plugin, version, processed_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (plugin, version) DO UPDATE SET processed_at = excluded.processed_at",
+                (state.plugin, state.version, timestamp),
+            )
+            release_id = connection.execute(
+                "SELECT id FROM releases WHERE plugin = ? AND version = ?", (state.plugin, state.version)
+            ).fetchone()["id"]
+            connection.execute("DELETE FROM release_assets WHERE release_id = ?", (release_id,))
+            connection.executemany(
+                "INSERT INTO release_assets (release_id, arch, path, sha256, source_sha256) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (release_id, arch, path, state.digests.get(arch), state.source_digests.get(arch))
+                    for arch, path in state.assets.items()
+                ],
+            )
+            connection.execute(
+                "INSERT INTO current_releases (plugin, release_id) VALUES (?, ?) "
+                "ON CONFLICT (plugin) DO UPDATE SET release_id = excluded.release_id",
+                (state.plugin, release_id),
+            )
+
+    def record_run(self, plugin: str, status: str, duration: float, finished_at: Optional[float] = None) -> None:
+        """Запоминает длительность обработки плагина для распределения по шардам."""
+
+        timestamp = time.time() if finished_at is None else finished_at
+        self._connection().execute(
+            "INSERT OR REPLACE INTO plugin_runs (plugin, finished_at, duration, status) VALUES (?, ?, ?, ?)",
+            (plugin, timestamp, duration, status),
+        )
+
+    def record_upload(self, repo: str, asset_id: int, name: str, size: int, sha256: str) -> None:
+        """Запоминает SHA-256 файла, загруженного в релиз ``repo`` как ассет ``asset_id``."""
+
+        self._connection().execute(
+            "INSERT OR REPLACE INTO uploaded_assets (repo, asset_id, name, size, sha256, uploaded_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (repo, asset_id, name, size, sha256, time.time()),
+        )
+
+    def uploaded_sha256(self, repo: str, asset_id: Optional[int]) -> Optional[str]:
+        """SHA-256 файла, загруженного этой утилитой как ассет ``asset_id``, если загрузка записана."""
+
+        if asset_id is None:
+            return None
+        row = self._connection().execute(
+            "SELECT sha256 FROM uploaded_assets WHERE repo = ? AND asset_id = ?", (repo, asset_id)
+        ).fetchone()
+        return row["sha256"] if row else None
+
+    def run_durations(self, last: int = 5) -> Dict[str, float]:
+        """Средняя длительность последних ``last`` запусков каждого плагина в секундах."""
+
+        rows = self._connection().execute(
+            "SELECT plugin, avg(duration) AS duration FROM ("
+            "  SELECT plugin, duration, row_number() OVER (PARTITION BY plugin ORDER BY finished_at DESC) AS n"
+            "  FROM plugin_runs"
+            ") WHERE n <= ? GROUP BY plugin",
+            (last,),
+        ).fetchall()
+        return {row["plugin"]: row["duration"] for row in rows}
+
+    def merge(self, path: Path) -> List[str]:
+        """Переносит в хранилище результаты частичной базы шарда.
+
+        Версии, которых нет в хранилище или которые обработаны в шарде позже,
+        копируются вместе с архивами; текущей версией плагина становится более
+        поздняя из двух. История запусков и записи о загруженных ассетах
+        добавляются к имеющимся. Возвращает плагины, текущая версия которых изменилась.
+        """
+
+        # Открытие через StateStore обновляет схему базы шарда, созданной прежней версией.
+        StateStore(path)._connection().close()
+        connection = self._connection()
+        connection.execute("ATTACH DATABASE ? AS shard", (str(path),))
+        try:
+            with self._transaction():
+                newer = connection.execute(
+                    "SELECT s.id, s.plugin, s.version, s.processed_at FROM shard.releases s "
+                    "LEFT JOIN releases r ON r.plugin = s.plugin AND r.version = s.version "
+                    "WHERE r.id IS NULL OR s.processed_at > r.processed_at"
+                ).fetchall()
+                for row in newer:
+                    connection.execute(
+                        "INSERT INTO releases (plugin, version, processed_at) VALUES (?, ?, ?) "
+                        "ON CONFLICT (plugin, version) DO UPDATE SET processed_at = excluded.processed_at",
+                        (row["plugin"], row["version"], row["processed_at"]),
+                    )
+                    release_id = connection.execute(
+                        "SELECT id FROM releases WHERE plugin = ? AND version = ?", (row["plugin"], row["version"])
+                    ).fetchone()["id"]
+                    connection.execute("DELETE FROM release_assets WHERE release_id = ?", (release_id,))
+                    connection.execute(
+                        "INSERT INTO release_assets (release_id, arch, path, sha256, source_sha256) "
+                        "SELECT ?, arch, path, sha256, source_sha256 FROM shard.release_assets "
+                        "WHERE release_id = ? ORDER BY rowid",
+                        (release_id, row["id"]),
+                    )
+                current = connection.execute(
+                    "SELECT sr.plugin, sr.version FROM shard.current_releases sc "
+                    "JOIN shard.releases sr ON sr.id = sc.release_id "
+                    "LEFT JOIN current_releases c ON c.plugin = sc.plugin "
+                    "LEFT JOIN releases r ON r.id = c.release_id "
+                    "WHERE r.id IS NULL OR sr.processed_at > r.processed_at ORDER BY sr.plugin"
+                ).fetchall()
+                for row in current:
+                    connection.execute(
+                        "INSERT INTO current_releases (plugin, release_id) "
+                        "SELECT plugin, id FROM releases WHERE plugin = ? AND version = ? "
+                        "ON CONFLICT (plugin) DO UPDATE SET release_id = excluded.release_id",
+                        (row["plugin"], row["version"]),
+                    )
+                connection.execute(
+                    "INSERT OR IGNORE INTO plugin_runs (plugin, finished_at, duration, status) "
+                    "SELECT plugin, finished_at, duration, status FROM shard.plugin_runs"
+                )
+                connection.execute(
+                    "INSERT OR REPLACE INTO uploaded_assets (repo, asset_id, name, size, sha256, uploaded_at) "
+                    "SELECT s.repo, s.asset_id, s.name, s.size, s.sha256, s.uploaded_at FROM shard.uploaded_assets s "
+                    "LEFT JOIN uploaded_assets u ON u.repo = s.repo AND u.asset_id = s.asset_id "
+                    "WHERE u.asset_id IS NULL OR s.uploaded_at > u.uploaded_at"
+                )
+        finally:
+            connection.execute("DETACH DATABASE shard")
+        return [row["plugin"] for row in current]
+
+    def stale_plugins(self, upstream_versions: Mapping[str, str]) -> List[str]:
+        """Плагины, чья последняя обработанная версия отличается от версии исходного проекта."""
 
+        if not upstream_versions:
+            return []
+        values = ", ".join("(?, ?)" for _ in upstream_versions)
+        parameters = [item for pair in upstream_versions.items() for item in pair]
+        rows = self._connection().execute(
+            f"WITH upstream (plugin, version) AS (VALUES {values}) "
+            "SELECT u.plugin FROM upstream u "
+            "LEFT JOIN current_releases c ON c.plugin = u.plugin "
+            "LEFT JOIN releases r ON r.id = c.release_id "
+            "WHERE r.version IS NULL OR r.version != u.version ORDER BY u.plugin",
+            parameters,
+        ).fetchall()
+        return [row["plugin"] for row in rows]
 
-def save_state(path: Path, state: ReleaseState) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    data = {
-        "plugin": state.plugin,
-        "version": state.version,
-        "assets": state.assets,
-    }
-    path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    def import_legacy(self, state_dir: Path) -> None:
+        """Переносит в базу состояния из файлов ``<plugin>.json``, которых в ней ещё нет."""
 
+        for path in sorted(state_dir.glob("*.json")):
+            try:
+                state = load_state(path)
+            except (OSError, ValueError, KeyError) as error:
+                LOGGER.warning("Не удалось прочитать состояние %s: %s", path, error)
+                continue
+            if state and self.latest(state.plugin) is None:
+                LOGGER.info("Импорт состояния %s из %s", state.plugin, path)
+                self.save(state, processed_at=path.stat().st_mtime)
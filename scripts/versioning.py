@@ -0,0 +1,66 @@
+"""Сравнение версий и выбор самого нового подходящего релиза."""
+from __future__ import annotations
+
+import re
+from typing import Callable, Iterable, Optional, Tuple
+
+_TOKEN = re.compile(r"\d+|[a-zA-Z]+")
+_SEPARATOR = re.compile(r"[-+~_]")
+
+VersionKey = Tuple[Tuple[int, ...], int, Tuple[Tuple[int, object], ...]]
+
+
+def version_key(version: str) -> VersionKey:
+    """Ключ сортировки версии в духе semver.
+
+    Числовая часть сравнивается покомпонентно, версии с суффиксом пре-релиза
+    (``-rc1``, ``-beta.2``) считаются младше соответствующей финальной версии.
+    Для нестандартных тегов (например, ``RELEASE.2021-03-10T05-11-33Z``)
+    сравниваются все числа по порядку.
+    """
+
+    text = version.strip().lstrip("vV")
+    core, separator, suffix = text.partition("-") if re.match(r"^\d+(\.\d+)*-", text) else (text, "", "")
+    numbers = tuple(int(token) for token in re.findall(r"\d+", core))
+    if not separator:
+        return numbers, 1, ()
+    prerelease = tuple(
+        (0, int(token)) if token.isdigit() else (1, token.lower()) for token in _TOKEN.findall(suffix)
+    )
+    return numbers, 0, prerelease
+
+
+class ReleaseSelector:
+    """Выбирает релиз с наибольшей версией из потока релизов в порядке API.
+
+    GitHub отдаёт релизы от новых к старым по дате создания, поэтому после
+    первого подходящего релиза достаточно просмотреть ещё ``lookahead``
+    подходящих: более новая версия может встретиться среди них только если
+    первым оказался бэкпорт в старую ветку.
+    """
+
+    def __init__(self, accept: Callable[[dict], Optional[str]], lookahead: int = 5) -> None:
+        self._accept = accept
+        self._lookahead = lookahead
+        self._seen_after_best = 0
+        self.best: Optional[Tuple[dict, str]] = None
+
+    def offer(self, release: dict) -> bool:
+        """Учитывает релиз; возвращает True, когда выбор окончателен."""
+
+        version = self._accept(release)
+        if version is None:
+            return False
+        if self.best is None or version_key(version) > version_key(self.best[1]):
+            if self.best is not None:
+                self._seen_after_best = 0
+            self.best = (release, version)
+            return self._lookahead <= 0
+        self._seen_after_best += 1
+        return self._seen_after_best >= self._lookahead
+
+    def select(self, releases: Iterable[dict]) -> Optional[Tuple[dict, str]]:
+        for release in releases:
+            if self.offer(release):
+                break
+        return self.best
@@ -0,0 +1,423 @@
+"""Режим наблюдения: периодический опрос исходных репозиториев и приём вебхуков о релизах.
+
+В отличие от разового запуска по cron, процесс живёт долго: конфигурация, пул
+соединений, кэш ответов API и хранилище состояния остаются «тёплыми». Каждый
+плагин опрашивается по собственному расписанию со случайным разбросом; если
+новых релизов нет, интервал опроса плагина постепенно растёт до
+``--max-interval``. Вебхук ``release`` от GitHub ставит соответствующие плагины
+в очередь немедленно::
+
+    python -m scripts.plugin_release watch --publish --webhook-port 8080
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import heapq
+import hmac
+import json
+import logging
+import os
+import random
+import signal
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from . import metrics
+from .config_loader import ConfigurationError, load_plugins_config
+from .models import PluginConfig, PluginRunResult
+from .plugin_release import (
+    PluginReleaseError,
+    RunContext,
+    _configure_logging,
+    add_run_arguments,
+    check_run_arguments,
+    create_context,
+    export_metrics,
+    run_batch,
+)
+
+LOGGER = logging.getLogger(__name__)
+
+_RELEASE_ACTIONS = {"published", "released", "edited"}
+
+
+@dataclass
+class PollSchedule:
+    """Расписание опроса одного плагина."""
+
+    plugin: str
+    interval: float
+    due: float
+
+
+class PollScheduler:
+    """Расписание опроса плагинов с разбросом и отступом для редко обновляемых проектов.
+
+    После опроса без новой версии интервал умножается на ``backoff`` (не больше
+    ``max_interval``), после обновления возвращается к базовому. Ошибки также
+    увеличивают интервал, чтобы недоступный репозиторий не расходовал лимит API.
+    """
+
+    def __init__(
+        self,
+        interval: float,
+        max_interval: float,
+        *,
+        jitter: float = 0.1,
+        backoff: float = 1.5,
+        clock=time.monotonic,
+        rng: Optional[random.Random] = None,
+    ) -> None:
+        self._interval = interval
+        self._max_interval = max(interval, max_interval)
+        self._jitter = jitter
+        self._backoff = backoff
+        self._clock = clock
+        self._random = rng or random.Random()
+        self._schedules: Dict[str, PollSchedule] = {}
+        self._heap: List[Tuple[float, str]] = []
+
+    def _jittered(self, interval: float) -> float:
+        return interval * self._random.uniform(1 - self._jitter, 1 + self._jitter)
+
+    def sync(self, names: Iterable[str]) -> None:
+        """Приводит расписание к списку плагинов; новые плагины равномерно распределяются по интервалу."""
+
+        now = self._clock()
+        names = list(names)
+        for name in set(self._schedules) - set(names):
+            del self._schedules[name]
+        for name in names:
+            if name not in self._schedules:
+                # Первый опрос размазывается по базовому интервалу, чтобы не посылать все запросы разом.
+                due = now + self._random.uniform(0, self._interval * self._jitter)
+                self._schedules[name] = PollSchedule(name, self._interval, due)
+                heapq.heappush(self._heap, (due, name))
+
+    def next_due(self) -> Optional[float]:
+        while self._heap:
+            due, name = self._heap[0]
+            schedule = self._schedules.get(name)
+            if schedule is None or schedule.due != due:
+                heapq.heappop(self._heap)
+                continue
+            return due
+        return None
+
+    def pop_due(self) -> List[str]:
+        now = self._clock()
+        names = []
+        while self.next_due() is not None and self._heap[0][0] <= now:
+            names.append(heapq.heappop(self._heap)[1])
+        return names
+
+    def record(self, result: PluginRunResult) -> None:
+        schedule = self._schedules.get(result.plugin)
+        if schedule is None:
+            return
+        if result.status == "updated":
+            schedule.interval = self._interval
+        else:
+            schedule.interval = min(schedule.interval * self._backoff, self._max_interval)
+        schedule.due = self._clock() + self._jittered(schedule.interval)
+        heapq.heappush(self._heap, (schedule.due, schedule.plugin))
+
+
+class WebhookQueue:
+    """Очередь плагинов, запрошенных вебхуками, с ожиданием по условию."""
+
+    def __init__(self) -> None:
+        self._condition = threading.Condition()
+        self._pending: Dict[str, None] = {}
+        self._stopped = False
+
+    def put(self, names: Iterable[str]) -> None:
+        with self._condition:
+            for name in names:
+                self._pending[name] = None
+            self._condition.notify_all()
+
+    def wait(self, timeout: Optional[float]) -> List[str]:
+        """Ждёт запросов не дольше ``timeout`` секунд и забирает их."""
+
+        with self._condition:
+            if not self._pending and not self._stopped:
+                self._condition.wait(timeout)
+            names = list(self._pending)
+            self._pending.clear()
+            return names
+
+    def stop(self) -> None:
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+
+    @property
+    def stopped(self) -> bool:
+        return self._stopped
+
+
+def verify_signature(secret: str, body: bytes, signature: Optional[str]) -> bool:
+    """Проверяет подпись ``X-Hub-Signature-256`` вебхука GitHub."""
+
+    if not signature or not signature.startswith("sha256="):
+        return False
+    expected = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature[len("sha256=") :])
+
+
+class WebhookServer:
+    """Локальный HTTP-сервер, принимающий вебхуки ``release`` от GitHub."""
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        queue: WebhookQueue,
+        resolve,
+        secret: Optional[str] = None,
+    ) -> None:
+        self._queue = queue
+        self._resolve = resolve
+        self._secret = secret
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="webhook", daemon=True)
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self._server.socket.getsockname()[:2]
+
+    def start(self) -> None:
+        self._thread.start()
+        LOGGER.info("Приём вебхуков на http://%s:%s", *self.address)
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format: str, *args) -> None:  # noqa: A002 - сигнатура BaseHTTPRequestHandler
+                LOGGER.debug("webhook: " + format, *args)
+
+            def _reply(self, status: int, payload: Optional[dict] = None) -> None:
+                body = json.dumps(payload, ensure_ascii=False).encode("utf-8") if payload is not None else b""
+                self.send_response(status)
+                if payload is not None:
+                    self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self) -> None:
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if server._secret and not verify_signature(
+                    server._secret, body, self.headers.get("X-Hub-Signature-256")
+                ):
+                    self._reply(401, {"message": "Неверная подпись"})
+                    return
+                event = self.headers.get("X-GitHub-Event", "")
+                if event == "ping":
+                    self._reply(200, {"message": "pong"})
+                    return
+                try:
+                    payload = json.loads(body or b"{}")
+                except ValueError:
+                    self._reply(400, {"message": "Тело запроса не является JSON"})
+                    return
+                if event != "release" or payload.get("action") not in _RELEASE_ACTIONS:
+                    self._reply(204)
+                    return
+                full_name = (payload.get("repository") or {}).get("full_name", "")
+                plugins = server._resolve(full_name)
+                if not plugins:
+                    self._reply(404, {"message": f"Нет плагинов для репозитория {full_name}"})
+                    return
+                LOGGER.info("Вебхук о релизе %s: в очередь %s", full_name, ", ".join(plugins))
+                metrics.active().inc("webhook_triggers_total")
+                server._queue.put(plugins)
+                self._reply(202, {"queued": plugins})
+
+        return Handler
+
+
+class Watcher:
+    """Цикл наблюдения: опрос по расписанию, обработка вебхуков и перечитывание конфигурации."""
+
+    def __init__(
+        self,
+        args: argparse.Namespace,
+        context: RunContext,
+        scheduler: PollScheduler,
+        queue: WebhookQueue,
+    ) -> None:
+        self._args = args
+        self._context = context
+        self._scheduler = scheduler
+        self._queue = queue
+        self._config_path = Path(args.config)
+        self._config_mtime: Optional[int] = None
+        self._plugins: Dict[str, PluginConfig] = {}
+        self._lock = threading.Lock()
+
+    def plugins_for_repository(self, full_name: str) -> List[str]:
+        with self._lock:
+            return [
+                plugin.name
+                for plugin in self._plugins.values()
+                if f"{plugin.source.owner}/{plugin.source.repo}".lower() == full_name.lower()
+            ]
+
+    def reload_config(self) -> None:
+        """Перечитывает конфигурацию, если файл изменился."""
+
+        try:
+            mtime = self._config_path.stat().st_mtime_ns
+        except OSError as error:
+            LOGGER.error("Не удалось прочитать конфигурацию %s: %s", self._config_path, error)
+            return
+        if mtime == self._config_mtime:
+            return
+        try:
+            config = load_plugins_config(self._config_path)
+        except (ConfigurationError, ValueError) as error:
+            LOGGER.error("Конфигурация не перечитана: %s", error)
+            return
+        if self._args.plugins:
+            selected = {name.strip() for name in self._args.plugins.split(",") if name.strip()}
+            missing = selected - config.keys()
+            if missing:
+                LOGGER.warning("Плагины не найдены в конфигурации: %s", ", ".join(sorted(missing)))
+            config = {name: plugin for name, plugin in config.items() if name in selected}
+        with self._lock:
+            self._plugins = config
+        self._config_mtime = mtime
+        self._scheduler.sync(config)
+        LOGGER.info("Загружена конфигурация: %s плагинов", len(config))
+
+    def run_once(self, names: Iterable[str]) -> List[PluginRunResult]:
+        with self._lock:
+            plugins = [self._plugins[name] for name in dict.fromkeys(names) if name in self._plugins]
+        if not plugins:
+            return []
+        results = run_batch(self._context, plugins, self._args.jobs)
+        for result in results:
+            self._scheduler.record(result)
+        export_metrics(self._args, self._context, results)
+        return results
+
+    def run(self) -> None:
+        self.reload_config()
+        while not self._queue.stopped:
+            due = self._scheduler.next_due()
+            timeout = None if due is None else max(0.0, due - time.monotonic())
+            if self._args.config_check_interval:
+                timeout = min(timeout, self._args.config_check_interval) if timeout is not None else (
+                    self._args.config_check_interval
+                )
+            triggered = self._queue.wait(timeout)
+            if self._queue.stopped:
+                break
+            self.reload_config()
+            names = triggered + [name for name in self._scheduler.pop_due() if name not in triggered]
+            self.run_once(names)
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Наблюдение за релизами исходных проектов плагинов")
+    parser.add_argument("--plugins", help="Список плагинов через запятую (по умолчанию все из конфигурации)")
+    add_run_arguments(parser)
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=900,
+        help="Базовый интервал опроса каждого плагина в секундах",
+    )
+    parser.add_argument(
+        "--max-interval",
+        type=float,
+        default=6 * 3600,
+        help="Максимальный интервал опроса плагинов без новых релизов в секундах",
+    )
+    parser.add_argument(
+        "--jitter",
+        type=float,
+        default=0.1,
+        help="Доля случайного разброса интервала опроса",
+    )
+    parser.add_argument(
+        "--config-check-interval",
+        type=float,
+        default=60,
+        help="Период проверки изменения файла конфигурации в секундах (0 — не проверять)",
+    )
+    parser.add_argument("--webhook-host", default="127.0.0.1", help="Адрес приёма вебхуков")
+    parser.add_argument("--webhook-port", type=int, help="Порт приёма вебхуков (по умолчанию вебхуки отключены)")
+    parser.add_argument(
+        "--webhook-secret",
+        default=os.getenv("GITHUB_WEBHOOK_SECRET"),
+        help="Секрет для проверки подписи вебхуков (по умолчанию GITHUB_WEBHOOK_SECRET)",
+    )
+    args = parser.parse_args(argv)
+    check_run_arguments(parser, args)
+    if args.interval <= 0 or args.max_interval <= 0:
+        parser.error("--interval и --max-interval должны быть положительными")
+    if not 0 <= args.jitter < 1:
+        parser.error("--jitter должен быть в диапазоне [0, 1)")
+    return args
+
+
+def main(argv: List[str] | None = None) -> int:
+    args = parse_args(argv if argv is not None else sys.argv[1:])
+    _configure_logging(args.verbose)
+    if args.metrics_json or args.metrics_textfile:
+        metrics.enable()
+
+    try:
+        context = create_context(args)
+    except PluginReleaseError as error:
+        LOGGER.error("%s", error)
+        return 1
+
+    queue = WebhookQueue()
+    scheduler = PollScheduler(args.interval, args.max_interval, jitter=args.jitter)
+    watcher = Watcher(args, context, scheduler, queue)
+    webhook: Optional[WebhookServer] = None
+    if args.webhook_port is not None:
+        webhook = WebhookServer(
+            args.webhook_host,
+            args.webhook_port,
+            queue,
+            watcher.plugins_for_repository,
+            secret=args.webhook_secret,
+        )
+        webhook.start()
+
+    def stop(signum: int, frame: object) -> None:
+        LOGGER.info("Получен сигнал %s, завершение", signum)
+        queue.stop()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    try:
+        watcher.run()
+    finally:
+        if webhook:
+            webhook.stop()
+        context.api.pool.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
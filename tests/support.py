@@ -0,0 +1,55 @@
+"""Общие заготовки тестов: временный каталог и имитатор GitHub API."""
+from __future__ import annotations
+
+import logging
+import tempfile
+import unittest
+from pathlib import Path
+from typing import Optional
+
+from scripts.fake_github import FakeGitHub
+from scripts.github_api import GitHubAPI
+from scripts.http_pool import ConnectionPool
+from scripts.rate_limit import RateLimitScheduler
+
+OWNER = "upstream"
+REPO = "tool"
+
+
+class TempDirTestCase(unittest.TestCase):
+    """Тест с временным каталогом ``self.tmp``, удаляемым после теста."""
+
+    def setUp(self) -> None:
+        temp = tempfile.TemporaryDirectory()
+        self.addCleanup(temp.cleanup)
+        self.tmp = Path(temp.name)
+        logging.disable(logging.CRITICAL)
+        self.addCleanup(logging.disable, logging.NOTSET)
+
+
+class FakeGitHubTestCase(TempDirTestCase):
+    """Тест с запущенным :class:`FakeGitHub` и собственным пулом соединений."""
+
+    binary_size = 256 * 1024
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.server = FakeGitHub(self.tmp / "server", binary_size=self.binary_size).start()
+        self.addCleanup(self.server.stop)
+        self.pool = ConnectionPool()
+        self.addCleanup(self.pool.close)
+
+    def make_api(self, cache_dir: Optional[Path] = None) -> GitHubAPI:
+        return GitHubAPI(
+            token="test-token",
+            api_url=self.server.url,
+            cache_dir=cache_dir,
+            pool=self.pool,
+            scheduler=RateLimitScheduler(),
+        )
+
+    def add_release(self, tag: str = "v1.0.0", **assets: str) -> dict:
+        """Добавляет релиз и возвращает его представление REST API."""
+
+        release = self.server.add_release(OWNER, REPO, tag, assets or {"tool-x64.zip": "tool.exe"})
+        return self.server._release_json(release)  # noqa: SLF001 - тесту нужен ответ в формате REST
@@ -0,0 +1,66 @@
+"""Атомарная запись файлов и права доступа к результату."""
+from __future__ import annotations
+
+import os
+import stat
+import unittest
+
+from scripts.atomic import atomic_write
+from scripts.catalogue import write_if_changed
+
+from .support import TempDirTestCase
+
+
+def _mode(path) -> int:
+    return stat.S_IMODE(path.stat().st_mode)
+
+
+@unittest.skipIf(os.name == "nt", "права доступа POSIX")
+class AtomicWriteTest(TempDirTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        previous = os.umask(0o022)
+        self.addCleanup(os.umask, previous)
+
+    def test_new_file_follows_umask(self) -> None:
+        path = self.tmp / "plugin.mxt64"
+        with atomic_write(path) as output:
+            output.write(b"data")
+
+        self.assertEqual(path.read_bytes(), b"data")
+        self.assertEqual(_mode(path), 0o644)
+
+    def test_existing_file_keeps_its_mode(self) -> None:
+        path = self.tmp / "README.md"
+        path.write_text("old", encoding="utf-8")
+        path.chmod(0o664)
+
+        with atomic_write(path, "w", encoding="utf-8") as output:
+            output.write("new")
+
+        self.assertEqual(path.read_text(encoding="utf-8"), "new")
+        self.assertEqual(_mode(path), 0o664)
+
+    def test_failed_write_keeps_original(self) -> None:
+        path = self.tmp / "state.json"
+        path.write_text("old", encoding="utf-8")
+
+        with self.assertRaises(RuntimeError), atomic_write(path, "w", encoding="utf-8") as output:
+            output.write("partial")
+            raise RuntimeError("сбой")
+
+        self.assertEqual(path.read_text(encoding="utf-8"), "old")
+        self.assertEqual(sorted(item.name for item in self.tmp.iterdir()), ["state.json"])
+
+    def test_catalogue_keeps_readme_mode(self) -> None:
+        path = self.tmp / "README.md"
+        path.write_text("old\n", encoding="utf-8")
+        path.chmod(0o644)
+
+        self.assertTrue(write_if_changed(path, "new\n"))
+        self.assertFalse(write_if_changed(path, "new\n"))
+        self.assertEqual(_mode(path), 0o644)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,179 @@
+"""Кэш бинарников: сегментное скачивание, докачка, вытеснение и ключи кэша."""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import unittest
+
+from scripts.downloader import AssetDownloader, DownloadError, _split
+from scripts.release_discovery import _to_rest_release
+
+from .support import OWNER, REPO, FakeGitHubTestCase
+
+SEGMENT_SIZE = 16 * 1024
+
+
+class DownloaderTestCase(FakeGitHubTestCase):
+    def make_downloader(self, **kwargs) -> AssetDownloader:
+        options = {"segment_size": SEGMENT_SIZE, "max_segments": 4, "max_cache_bytes": 64 * 1024 * 1024}
+        options.update(kwargs)
+        return AssetDownloader(self.tmp / "assets", self.pool, **options)
+
+    def asset(self, tag: str = "v1.0.0", member: str = "tool.exe") -> dict:
+        return self.add_release(tag, **{"tool-x64.zip": member})["assets"][0]
+
+    def payload(self, asset: dict) -> bytes:
+        tag, name = asset["browser_download_url"].rsplit("/", 2)[1:]
+        return self.server.find_download(OWNER, REPO, tag, name).path.read_bytes()
+
+    def segments(self, asset: dict) -> list:
+        size = asset["size"]
+        return _split(size, max(SEGMENT_SIZE, -(-size // 4)))
+
+
+class SegmentedDownloadTest(DownloaderTestCase):
+    def test_segments_are_fetched_with_ranges_and_verified(self) -> None:
+        asset = self.asset()
+        downloader = self.make_downloader()
+        blob = downloader.fetch(asset)
+
+        self.assertEqual(blob.sha256, hashlib.sha256(self.payload(asset)).hexdigest())
+        self.assertEqual(blob.path.read_bytes(), self.payload(asset))
+        # Проба диапазона и по запросу на каждый сегмент.
+        self.assertEqual(self.server.stats.requests["GET /download"], 1 + len(self.segments(asset)))
+        self.assertEqual(self.server.stats.statuses[200], 0)
+
+    def test_cached_asset_is_not_downloaded_again(self) -> None:
+        asset = self.asset()
+        downloader = self.make_downloader()
+        downloader.release(downloader.fetch(asset))
+        self.server.reset_stats()
+
+        blob = downloader.fetch(asset)
+        self.assertTrue(blob.path.exists())
+        self.assertEqual(self.server.stats.requests["GET /download"], 0)
+
+    def test_wrong_digest_is_rejected_and_not_cached(self) -> None:
+        asset = dict(self.asset(), digest="sha256:" + "0" * 64)
+        downloader = self.make_downloader()
+        with self.assertRaises(DownloadError):
+            downloader.fetch(asset)
+        self.assertIsNone(downloader.lookup(asset))
+
+
+class ResumeTest(DownloaderTestCase):
+    def prepare_entry(self, downloader: AssetDownloader, asset: dict):
+        entry_dir = self.tmp / "assets" / downloader.cache_key(asset)
+        entry_dir.mkdir(parents=True)
+        return entry_dir / "blob.part", entry_dir / "blob.progress"
+
+    def test_interrupted_segment_download_resumes(self) -> None:
+        asset = self.asset()
+        downloader = self.make_downloader()
+        payload = self.payload(asset)
+        segments = self.segments(asset)
+        (start, end), done = segments[0], segments[0][1] - segments[0][0] + 1
+        part_path, progress_path = self.prepare_entry(downloader, asset)
+        part_path.write_bytes(payload[start : end + 1] + bytes(len(payload) - done))
+        progress = [done] + [0] * (len(segments) - 1)
+        progress_path.write_text(json.dumps({"segments": segments, "done": progress}), encoding="utf-8")
+        self.server.reset_stats()
+
+        blob = downloader.fetch(asset)
+
+        self.assertEqual(blob.path.read_bytes(), payload)
+        # Первый сегмент уже на диске: скачивается остаток и один байт пробы.
+        self.assertEqual(self.server.stats.bytes_sent, len(payload) - done + 1)
+        self.assertEqual(self.server.stats.requests["GET /download"], len(segments))
+        self.assertFalse(part_path.exists())
+        self.assertFalse(progress_path.exists())
+
+    def test_corrupted_resumed_part_fails_verification(self) -> None:
+        asset = self.asset()
+        downloader = self.make_downloader()
+        payload = self.payload(asset)
+        segments = self.segments(asset)
+        done = segments[0][1] + 1
+        part_path, progress_path = self.prepare_entry(downloader, asset)
+        part_path.write_bytes(b"\xff" * done + bytes(len(payload) - done))
+        progress = [done] + [0] * (len(segments) - 1)
+        progress_path.write_text(json.dumps({"segments": segments, "done": progress}), encoding="utf-8")
+
+        with self.assertRaises(DownloadError):
+            downloader.fetch(asset)
+        self.assertFalse(part_path.exists())
+
+        blob = downloader.fetch(asset)
+        self.assertEqual(blob.path.read_bytes(), payload)
+
+    def test_stream_download_resumes_from_part_file(self) -> None:
+        asset = self.asset()
+        downloader = self.make_downloader(segment_size=1024 * 1024)
+        payload = self.payload(asset)
+        part_path, _ = self.prepare_entry(downloader, asset)
+        part_path.write_bytes(payload[:1000])
+        self.server.reset_stats()
+
+        blob = downloader.fetch(asset)
+
+        self.assertEqual(blob.path.read_bytes(), payload)
+        self.assertEqual(self.server.stats.statuses[206], 1)
+        self.assertEqual(self.server.stats.bytes_sent, len(payload) - 1000)
+
+
+class EvictionTest(DownloaderTestCase):
+    def make_small_cache(self, first: dict) -> AssetDownloader:
+        # Кэш вмещает только один ассет.
+        return self.make_downloader(max_cache_bytes=first["size"] + 4096)
+
+    def age(self, downloader: AssetDownloader, asset: dict) -> None:
+        meta = self.tmp / "assets" / downloader.cache_key(asset) / "meta.json"
+        os.utime(meta, (0, 0))
+
+    def test_least_recently_used_entry_is_evicted(self) -> None:
+        first, second = self.asset("v1.0.0", "one.exe"), self.asset("v1.1.0", "two.exe")
+        downloader = self.make_small_cache(first)
+        downloader.release(downloader.fetch(first))
+        self.age(downloader, first)
+
+        downloader.release(downloader.fetch(second))
+
+        self.assertIsNone(downloader.lookup(first))
+        self.assertIsNotNone(downloader.lookup(second))
+
+    def test_pinned_entry_is_not_evicted_until_released(self) -> None:
+        first, second = self.asset("v1.0.0", "one.exe"), self.asset("v1.1.0", "two.exe")
+        downloader = self.make_small_cache(first)
+        blob = downloader.fetch(first)
+        self.age(downloader, first)
+
+        downloader.release(downloader.fetch(second))
+        self.assertIsNotNone(downloader.lookup(first))
+        self.assertTrue(blob.path.exists())
+
+        downloader.release(blob)
+        downloader._evict()  # noqa: SLF001 - вытеснение запускается после скачивания
+        self.assertIsNone(downloader.lookup(first))
+
+
+class CacheKeyTest(DownloaderTestCase):
+    def graphql_asset(self) -> dict:
+        status, _, body = self.server._graphql({"variables": {"owner0": OWNER, "name0": REPO}})  # noqa: SLF001
+        self.assertEqual(status, 200)
+        return _to_rest_release(body["data"]["r0"]["releases"]["nodes"][0])["assets"][0]
+
+    def test_rest_and_graphql_assets_share_a_key(self) -> None:
+        rest = self.asset()
+        self.assertEqual(AssetDownloader.cache_key(rest), AssetDownloader.cache_key(self.graphql_asset()))
+
+    def test_key_without_digest_depends_on_update_time(self) -> None:
+        rest = dict(self.asset(), digest=None)
+        graphql = dict(self.graphql_asset(), digest=None)
+        self.assertEqual(AssetDownloader.cache_key(rest), AssetDownloader.cache_key(graphql))
+        updated = dict(rest, updated_at="2030-01-01T00:00:00Z")
+        self.assertNotEqual(AssetDownloader.cache_key(rest), AssetDownloader.cache_key(updated))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+"""Кэш ответов GitHub API: условные запросы с ETag и ответы 304."""
+from __future__ import annotations
+
+import unittest
+
+from scripts import metrics
+from scripts.github_api import GitHubAPIError
+
+from .support import OWNER, REPO, FakeGitHubTestCase
+
+RELEASES_PATH = f"repos/{OWNER}/{REPO}/releases"
+
+
+class ETagCacheTest(FakeGitHubTestCase):
+    binary_size = 4096
+
+    def setUp(self) -> None:
+        super().setUp()
+        for index in range(3):
+            self.add_release(f"v1.{index}.0")
+        self.cache_dir = self.tmp / "api-cache"
+
+    def tags(self, api, per_page: int = 30) -> list:
+        return [release["tag_name"] for release in api.iter_releases(OWNER, REPO, per_page=per_page)]
+
+    def test_repeated_request_is_served_from_cache(self) -> None:
+        api = self.make_api(self.cache_dir)
+        first = self.tags(api)
+        remaining = api.rate_limits["core"].remaining
+        self.server.reset_stats()
+
+        collector = metrics.enable()
+        self.addCleanup(metrics.disable)
+        self.assertEqual(self.tags(api), first)
+
+        self.assertEqual(dict(self.server.stats.statuses), {304: 1})
+        self.assertEqual(collector.report()["counters"][0]["value"], 1)
+        # GitHub не учитывает ответы 304 в лимите запросов.
+        self.assertEqual(api.rate_limits["core"].remaining, remaining)
+
+    def test_cache_is_shared_between_clients(self) -> None:
+        self.tags(self.make_api(self.cache_dir))
+        self.server.reset_stats()
+
+        self.tags(self.make_api(self.cache_dir))
+        self.assertEqual(dict(self.server.stats.statuses), {304: 1})
+
+    def test_pagination_links_are_restored_from_cache(self) -> None:
+        api = self.make_api(self.cache_dir)
+        first = self.tags(api, per_page=1)
+        self.assertEqual(len(first), 3)
+        self.server.reset_stats()
+
+        self.assertEqual(self.tags(api, per_page=1), first)
+        self.assertEqual(dict(self.server.stats.statuses), {304: 3})
+
+    def test_changed_resource_is_downloaded_again(self) -> None:
+        api = self.make_api(self.cache_dir)
+        self.tags(api)
+        self.add_release("v2.0.0")
+        self.server.reset_stats()
+
+        self.assertIn("v2.0.0", self.tags(api))
+        self.assertEqual(dict(self.server.stats.statuses), {200: 1})
+
+    def test_requests_are_unconditional_without_cache(self) -> None:
+        api = self.make_api()
+        self.tags(api)
+        self.tags(api)
+        self.assertEqual(dict(self.server.stats.statuses), {200: 2})
+
+    def test_corrupted_entry_is_ignored(self) -> None:
+        api = self.make_api(self.cache_dir)
+        self.tags(api)
+        for path in self.cache_dir.rglob("*.json"):
+            path.write_text("{", encoding="utf-8")
+        self.server.reset_stats()
+
+        self.assertEqual(len(self.tags(api)), 3)
+        self.assertEqual(dict(self.server.stats.statuses), {200: 1})
+
+    def test_not_modified_without_cached_body_repeats_request(self) -> None:
+        api = self.make_api()
+        self.tags(api)
+        etag = self.server._list_releases(OWNER, REPO, {}, {})[1]["ETag"]  # noqa: SLF001
+        self.server.reset_stats()
+
+        releases = api._request("GET", RELEASES_PATH, headers={"If-None-Match": etag})  # noqa: SLF001
+
+        self.assertEqual(len(releases), 3)
+        self.assertEqual(dict(self.server.stats.statuses), {304: 1, 200: 1})
+
+    def test_not_modified_to_unconditional_request_is_an_error(self) -> None:
+        api = self.make_api()
+        self.server.handle_api = lambda *args: (304, {}, None)
+        with self.assertRaises(GitHubAPIError) as raised:
+            api._request("GET", RELEASES_PATH)  # noqa: SLF001
+        self.assertEqual(raised.exception.status, 304)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+"""Перенос членов zip-архивов исходного проекта в архив плагина."""
+from __future__ import annotations
+
+import unittest
+import zlib
+from unittest import mock
+from zipfile import ZIP_DEFLATED, ZipFile
+
+from scripts import package_builder
+from scripts.models import AssetPattern, PluginConfig, PluginSource
+from scripts.package_builder import BinarySource, PackageBuilder
+
+from .support import TempDirTestCase
+
+PAYLOAD = b"".join(b"MZ section %05d\n" % (index % 700) for index in range(20000))
+
+
+class RawCopyTest(TempDirTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.pattern = AssetPattern(arch="x64", pattern=r"x64\.zip$")
+        self.plugin = PluginConfig(
+            name="tool",
+            branch="tool",
+            source=PluginSource(type="github", owner="upstream", repo="tool", asset_patterns=[self.pattern]),
+        )
+        self.upstream = self.tmp / "tool-x64.zip"
+        # Уровень 1 отличается от уровня сборки, поэтому по размеру видно, были ли данные пережаты.
+        with ZipFile(self.upstream, "w", compression=ZIP_DEFLATED, compresslevel=1) as archive:
+            archive.writestr("tool.exe", PAYLOAD)
+        with ZipFile(self.upstream) as archive:
+            self.raw_size = archive.getinfo("tool.exe").compress_size
+
+    def build(self) -> ZipFile:
+        binary = BinarySource(path=self.upstream, kind="zip", member="tool.exe")
+        built = PackageBuilder(self.tmp / "dist").build(self.plugin, self.pattern, version="v1", binary=binary)
+        archive = ZipFile(built.path)
+        self.addCleanup(archive.close)
+        self.assertIsNone(archive.testzip())
+        self.assertEqual(archive.read("bin/tool.exe"), PAYLOAD)
+        return archive
+
+    def test_deflated_member_is_copied_without_recompression(self) -> None:
+        info = self.build().getinfo("bin/tool.exe")
+        self.assertEqual((info.compress_size, info.CRC), (self.raw_size, zlib.crc32(PAYLOAD)))
+
+    def test_member_is_recompressed_without_zipfile_internals(self) -> None:
+        with mock.patch.object(package_builder, "_RAW_COPY_ATTRIBUTES", ("_lock", "_no_such_attribute")):
+            self.assertFalse(package_builder._raw_copy_supported.__wrapped__())  # noqa: SLF001
+
+        with mock.patch.object(package_builder, "_raw_copy_supported", return_value=False):
+            info = self.build().getinfo("bin/tool.exe")
+        self.assertNotEqual(info.compress_size, self.raw_size)
+
+    def test_member_is_recompressed_when_internals_fail(self) -> None:
+        writecheck = ZipFile._writecheck  # noqa: SLF001
+        failures = []
+
+        def failing_once(archive: ZipFile, zinfo) -> None:
+            if not failures:
+                failures.append(zinfo.filename)
+                raise AttributeError("_writecheck")
+            writecheck(archive, zinfo)
+
+        with mock.patch.object(ZipFile, "_writecheck", failing_once):
+            info = self.build().getinfo("bin/tool.exe")
+
+        self.assertEqual(failures, ["bin/tool.exe"])
+        self.assertNotEqual(info.compress_size, self.raw_size)
+
+
+if __name__ == "__main__":
+    unittest.main()
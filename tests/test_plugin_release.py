@@ -0,0 +1,75 @@
+"""Запуск ``plugin_release`` целиком на имитаторе GitHub API."""
+from __future__ import annotations
+
+import contextlib
+import io
+import json
+import os
+import unittest
+from unittest import mock
+
+from scripts import plugin_release
+
+from .support import OWNER, REPO, FakeGitHubTestCase
+
+
+class MainTest(FakeGitHubTestCase):
+    binary_size = 4096
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.add_release("v1.0.0")
+        config = {
+            "plugins": [
+                {
+                    "name": "tool",
+                    "branch": "tool",
+                    "source": {
+                        "type": "github",
+                        "owner": OWNER,
+                        "repo": REPO,
+                        "asset_patterns": [{"arch": "x64", "pattern": r"x64\.zip$"}],
+                    },
+                }
+            ]
+        }
+        self.config = self.tmp / "plugins.json"
+        self.config.write_text(json.dumps(config), encoding="utf-8")
+        environment = mock.patch.dict(os.environ, {"GITHUB_TOKEN": "test-token"})
+        environment.start()
+        self.addCleanup(environment.stop)
+
+    def run_main(self, *args: str) -> int:
+        argv = [
+            *args,
+            "--config",
+            str(self.config),
+            "--output-dir",
+            str(self.tmp / "dist"),
+            "--state-dir",
+            str(self.tmp / "state"),
+            "--download-cache-dir",
+            str(self.tmp / "assets"),
+            "--no-cache",
+            "--api-url",
+            self.server.url,
+        ]
+        with contextlib.redirect_stdout(io.StringIO()):
+            return plugin_release.main(argv)
+
+    def test_batch_run_with_graphql_discovery(self) -> None:
+        self.assertEqual(self.run_main("--all", "--graphql"), 0)
+
+        self.assertEqual(self.server.stats.requests["POST /graphql"], 1)
+        self.assertTrue((self.tmp / "dist" / "tool-v1.0.0-x64.mxt64").exists())
+
+    def test_repeated_graphql_run_finds_nothing_stale(self) -> None:
+        self.run_main("--all", "--graphql")
+        self.server.reset_stats()
+
+        self.assertEqual(self.run_main("--all", "--graphql"), 0)
+        self.assertEqual(self.server.stats.requests["GET /download"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+"""Распределение плагинов по шардам и объединение результатов шардов."""
+from __future__ import annotations
+
+import contextlib
+import io
+import unittest
+
+from scripts import plugin_release, sharding
+from scripts.models import PluginRunResult, ReleaseState
+from scripts.state import StateStore
+
+from .support import TempDirTestCase
+
+NAMES = [f"plugin-{index:02d}" for index in range(23)]
+
+
+class ParseShardTest(unittest.TestCase):
+    def test_valid_shard(self) -> None:
+        self.assertEqual(sharding.parse_shard(" 2/4 "), (2, 4))
+
+    def test_invalid_shards(self) -> None:
+        for value in ("0/4", "5/4", "2", "a/b", "1/0"):
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                sharding.parse_shard(value)
+
+    def test_shard_requires_batch_selection(self) -> None:
+        with contextlib.redirect_stderr(io.StringIO()), self.assertRaises(SystemExit):
+            plugin_release.parse_args(["--plugin", "yara", "--shard", "1/2"])
+        self.assertEqual(plugin_release.parse_args(["--all", "--shard", "1/2"]).shard, (1, 2))
+
+
+class PartitionTest(unittest.TestCase):
+    def test_every_plugin_lands_in_exactly_one_shard(self) -> None:
+        for count in (1, 2, 3, 7, 30):
+            with self.subTest(count=count):
+                shards = [sharding.select_shard(NAMES, {}, index, count) for index in range(1, count + 1)]
+                selected = [name for shard in shards for name in shard]
+                self.assertEqual(sorted(selected), NAMES)
+
+    def test_selection_keeps_configuration_order(self) -> None:
+        names = list(reversed(NAMES))
+        shard = sharding.select_shard(names, {}, 1, 3)
+        self.assertEqual(shard, [name for name in names if name in shard])
+
+    def test_partition_is_deterministic(self) -> None:
+        durations = {name: float(index % 5 + 1) for index, name in enumerate(NAMES)}
+        first = sharding.partition(sharding.plugin_weights(NAMES, durations), 4)
+        second = sharding.partition(sharding.plugin_weights(list(reversed(NAMES)), dict(durations)), 4)
+        self.assertEqual(first, second)
+
+    def test_shards_are_balanced_by_duration(self) -> None:
+        durations = {"slow": 100.0, **{name: 10.0 for name in NAMES[:10]}}
+        shards = sharding.partition(sharding.plugin_weights(["slow", *NAMES[:10]], durations), 2)
+        slow, other = sorted(shards, key=lambda shard: "slow" not in shard)
+        # Равная доля — 100 с; шард с долгим плагином может превысить её не больше чем на LOAD_SLACK.
+        self.assertLessEqual(len(slow), 2)
+        self.assertGreaterEqual(len(other), 9)
+
+    def test_added_plugin_moves_few_others(self) -> None:
+        durations = {name: float(index % 5 + 1) for index, name in enumerate(NAMES)}
+        for count in (2, 3, 4, 7):
+            with self.subTest(count=count):
+                before = sharding.partition(sharding.plugin_weights(NAMES, durations), count)
+                after = sharding.partition(sharding.plugin_weights([*NAMES, "plugin-new"], durations), count)
+                shard_of = {name: index for index, shard in enumerate(before) for name in shard}
+                moved = [name for index, shard in enumerate(after) for name in shard if shard_of.get(name, index) != index]
+                # Жадное разбиение «в наименее загруженный шард» перекладывало здесь от 4 до 8 плагинов.
+                self.assertLessEqual(len(moved), len(NAMES) // 6)
+
+    def test_plugins_without_history_get_median_weight(self) -> None:
+        weights = sharding.plugin_weights(["a", "b", "c", "new"], {"a": 1.0, "b": 3.0, "c": 8.0})
+        self.assertEqual(weights["new"], 3.0)
+        self.assertEqual(sharding.plugin_weights(["new"], {})["new"], sharding.DEFAULT_WEIGHT)
+
+
+class MergeTest(TempDirTestCase):
+    def run_shard(self, index: int, count: int, plugins: list) -> None:
+        state_dir = self.tmp / f"shard-{index}"
+        store = StateStore.open(state_dir)
+        results = []
+        for name in plugins:
+            store.save(ReleaseState(plugin=name, version="2.0", assets={"x64": f"dist/{name}.mxt64"}))
+            results.append(PluginRunResult(plugin=name, status="updated", version="2.0"))
+        sharding.write_report(state_dir, index, count, plugins, results)
+
+    def test_reports_are_not_imported_as_legacy_state(self) -> None:
+        self.run_shard(1, 2, ["alpha"])
+        path = sharding.report_path(self.tmp / "shard-1", 1, 2)
+        self.assertEqual(path.parent.name, sharding.REPORTS_DIR)
+
+        store = StateStore.open(self.tmp / "shard-1")
+        self.assertEqual(list(store.latest_all()), ["alpha"])
+
+    def test_merge_collects_state_and_reports(self) -> None:
+        self.run_shard(1, 2, ["alpha", "beta"])
+        self.run_shard(2, 2, ["gamma"])
+
+        results, missing, duplicates = sharding.merge_shards(
+            self.tmp / "state", [self.tmp / "shard-1", self.tmp / "shard-2"]
+        )
+
+        self.assertEqual(sorted(item["plugin"] for item in results), ["alpha", "beta", "gamma"])
+        self.assertEqual((missing, duplicates), ([], []))
+        self.assertEqual(sorted(StateStore.open(self.tmp / "state").latest_all()), ["alpha", "beta", "gamma"])
+
+    def test_merge_reports_missing_and_duplicate_shards(self) -> None:
+        self.run_shard(1, 3, ["alpha"])
+        self.run_shard(3, 3, ["alpha", "beta"])
+
+        _, missing, duplicates = sharding.merge_shards(self.tmp / "state", [self.tmp / "shard-1", self.tmp / "shard-3"])
+
+        self.assertEqual(missing, [2])
+        self.assertEqual(duplicates, ["alpha"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+"""Хранилище состояния: импорт JSON прежнего формата и миграция схемы SQLite."""
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import unittest
+
+from scripts.models import ReleaseState
+from scripts.state import STATE_DB_NAME, StateStore
+
+from .support import TempDirTestCase
+
+# Схема первой версии хранилища: без столбца source_sha256 и таблиц запусков и загрузок.
+_OLD_SCHEMA = """
+CREATE TABLE releases (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    plugin TEXT NOT NULL,
+    version TEXT NOT NULL,
+    processed_at REAL NOT NULL,
+    UNIQUE (plugin, version)
+);
+CREATE TABLE release_assets (
+    release_id INTEGER NOT NULL REFERENCES releases (id) ON DELETE CASCADE,
+    arch TEXT NOT NULL,
+    path TEXT NOT NULL,
+    sha256 TEXT,
+    PRIMARY KEY (release_id, arch)
+);
+CREATE TABLE current_releases (
+    plugin TEXT PRIMARY KEY,
+    release_id INTEGER NOT NULL REFERENCES releases (id)
+);
+INSERT INTO releases (id, plugin, version, processed_at) VALUES (1, 'yara', '4.5.0', 1);
+INSERT INTO release_assets VALUES (1, 'x64', 'dist/yara-4.5.0-x64.mxt64', 'abc');
+INSERT INTO current_releases VALUES ('yara', 1);
+"""
+
+
+class LegacyImportTest(TempDirTestCase):
+    def write_legacy(self, plugin: str, version: str, **extra: object) -> None:
+        payload = {"plugin": plugin, "version": version, "assets": {"x64": f"dist/{plugin}-{version}.mxt64"}, **extra}
+        (self.tmp / f"{plugin}.json").write_text(json.dumps(payload), encoding="utf-8")
+
+    def test_json_state_is_imported(self) -> None:
+        self.write_legacy("yara", "4.5.0", digests={"x64": "abc"}, source_digests={"x64": "def"})
+
+        state = StateStore.open(self.tmp).latest("yara")
+
+        self.assertEqual(state.version, "4.5.0")
+        self.assertEqual(state.assets, {"x64": "dist/yara-4.5.0.mxt64"})
+        self.assertEqual(state.digests, {"x64": "abc"})
+        self.assertEqual(state.source_digests, {"x64": "def"})
+
+    def test_import_keeps_file_time_and_runs_once(self) -> None:
+        self.write_legacy("yara", "4.5.0")
+        os.utime(self.tmp / "yara.json", (1000, 1000))
+        StateStore.open(self.tmp)
+        self.write_legacy("yara", "4.6.0")
+
+        store = StateStore.open(self.tmp)
+
+        # Плагин уже есть в базе, поэтому файл не импортируется повторно.
+        self.assertEqual([state.version for state in store.history("yara")], ["4.5.0"])
+        processed_at = store._connection().execute("SELECT processed_at FROM releases").fetchone()[0]  # noqa: SLF001
+        self.assertEqual(processed_at, 1000)
+
+    def test_database_state_wins_over_json(self) -> None:
+        store = StateStore.open(self.tmp)
+        store.save(ReleaseState(plugin="yara", version="5.0.0", assets={}))
+        self.write_legacy("yara", "4.5.0")
+
+        self.assertEqual(StateStore.open(self.tmp).latest("yara").version, "5.0.0")
+
+    def test_unreadable_files_are_skipped(self) -> None:
+        self.write_legacy("yara", "4.5.0")
+        (self.tmp / "broken.json").write_text("{", encoding="utf-8")
+        (self.tmp / "other.json").write_text(json.dumps({"name": "not a state"}), encoding="utf-8")
+
+        self.assertEqual(list(StateStore.open(self.tmp).latest_all()), ["yara"])
+
+
+class SchemaMigrationTest(TempDirTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        connection = sqlite3.connect(self.tmp / STATE_DB_NAME)
+        connection.executescript(_OLD_SCHEMA)
+        connection.close()
+
+    def columns(self, store: StateStore, table: str) -> set:
+        rows = store._connection().execute(f"PRAGMA table_info({table})")  # noqa: SLF001
+        return {row["name"] for row in rows}
+
+    def test_old_database_is_upgraded(self) -> None:
+        store = StateStore.open(self.tmp)
+
+        self.assertIn("source_sha256", self.columns(store, "release_assets"))
+        state = store.latest("yara")
+        self.assertEqual((state.version, state.digests, state.source_digests), ("4.5.0", {"x64": "abc"}, {}))
+
+    def test_upgraded_database_accepts_new_data(self) -> None:
+        store = StateStore.open(self.tmp)
+        store.save(ReleaseState(plugin="yara", version="4.6.0", assets={"x64": "a"}, source_digests={"x64": "src"}))
+        store.record_run("yara", "updated", 2.5, finished_at=10)
+        store.record_upload("me/mirror", 7, "yara-4.6.0-x64.mxt64", 1, "sha")
+
+        self.assertEqual(store.latest("yara").source_digests, {"x64": "src"})
+        self.assertEqual(store.run_durations(), {"yara": 2.5})
+        self.assertEqual(store.uploaded_sha256("me/mirror", 7), "sha")
+
+    def test_migration_is_idempotent(self) -> None:
+        StateStore.open(self.tmp)
+        store = StateStore.open(self.tmp)
+        self.assertEqual(store.latest("yara").version, "4.5.0")
+
+
+if __name__ == "__main__":
+    unittest.main()